@@ -0,0 +1,131 @@
+"""
+Load test for live race-update alerting using the session replay engine.
+
+Generates a synthetic race (position swaps, laps, pit stops and a safety car
+period) or loads a recorded one, then replays it through the live-update
+pipeline and the subscriber notification path at the given speed. Delivery
+goes to a local stand-in channel with configurable latency, so nothing is
+sent. Reports events/sec, alerts and detection latency.
+
+Usage:
+    python benchmarks/bench_replay.py --speed 1000 --laps 57 --subscribers 500 --latency 0.005
+    python benchmarks/bench_replay.py --session-dir tests/fixtures/replay_session --speed 100
+"""
+import argparse
+import logging
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+import pytz
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import delivery  # noqa: E402
+import race_notification_sender  # noqa: E402
+from live_updates import LiveUpdatePipeline, subscriber_notifier  # noqa: E402
+from replay import load_session, replay  # noqa: E402
+from subscribers import SubscriberStore  # noqa: E402
+
+DRIVER_NUMBERS = [1, 4, 5, 10, 12, 14, 16, 18, 22, 23, 27, 30, 31, 43, 44, 55, 63, 81, 87, 6]
+LAP_SECONDS = 90
+
+
+class StandInSink(delivery.DeliverySink):
+    """Delivery channel that only waits, standing in for Pushover"""
+
+    name = 'pushover'
+
+    def __init__(self, latency):
+        super().__init__()
+        self.latency = latency
+        self.sent = 0
+
+    def send(self, message, title, address):
+        time.sleep(self.latency)
+        self.sent += 1
+        return 200
+
+
+def synthetic_session(laps, seed=1):
+    """Builds (moment, stream, record) tuples for a race of the given length."""
+    rng = random.Random(seed)
+    start = datetime(2025, 5, 25, 13, 0, tzinfo=pytz.UTC)
+    order = list(DRIVER_NUMBERS)
+    records = [(start, 'position', {'driver_number': number, 'position': index + 1})
+               for index, number in enumerate(order)]
+    safety_car_lap = laps // 3
+
+    for lap in range(1, laps + 1):
+        lap_start = start + timedelta(seconds=(lap - 1) * LAP_SECONDS)
+        records.extend((lap_start, 'laps', {'driver_number': number, 'lap_number': lap}) for number in order)
+        if lap == safety_car_lap:
+            records.append((lap_start + timedelta(seconds=5), 'race_control',
+                            {'category': 'SafetyCar', 'message': 'SAFETY CAR DEPLOYED', 'lap_number': lap}))
+        if lap == safety_car_lap + 3:
+            records.append((lap_start, 'race_control',
+                            {'category': 'SafetyCar', 'message': 'SAFETY CAR IN THIS LAP', 'lap_number': lap}))
+
+        # A handful of position changes per lap, each reported as two position records
+        for _ in range(rng.randint(2, 8)):
+            index = rng.randrange(1, len(order))
+            moment = lap_start + timedelta(seconds=rng.uniform(0, LAP_SECONDS - 1))
+            order[index - 1], order[index] = order[index], order[index - 1]
+            records.append((moment, 'position', {'driver_number': order[index - 1], 'position': index}))
+            records.append((moment + timedelta(milliseconds=200), 'position',
+                            {'driver_number': order[index], 'position': index + 1}))
+
+        if lap in (laps // 2, laps // 2 + 1):
+            for number in order[lap % 2::2]:
+                records.append((lap_start + timedelta(seconds=rng.uniform(60, 80)), 'pit',
+                                {'driver_number': number, 'lap_number': lap, 'pit_duration': rng.uniform(20, 26)}))
+
+    records.sort(key=lambda row: row[0])
+    return records
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a race through live-update alerting")
+    parser.add_argument('--session-dir', help="recorded session to replay instead of a synthetic race")
+    parser.add_argument('--speed', type=float, default=1000.0, help="replay speed, 1 to 1000 times real time")
+    parser.add_argument('--laps', type=int, default=57, help="laps in the synthetic race")
+    parser.add_argument('--subscribers', type=int, default=100, help="subscribers matched for every alert")
+    parser.add_argument('--latency', type=float, default=0.005, help="stand-in delivery latency in seconds")
+    args = parser.parse_args(argv)
+
+    logging.getLogger().setLevel(logging.ERROR)
+    drivers = {}
+    if args.session_dir:
+        drivers, records = load_session(args.session_dir)
+    else:
+        records = synthetic_session(args.laps)
+
+    store = SubscriberStore()
+    for index in range(args.subscribers):
+        store.add(f"sub-{index}", f"user-{index:06d}",
+                  drivers=[DRIVER_NUMBERS[index % len(DRIVER_NUMBERS)]] if index % 2 else None)
+    sink = StandInSink(args.latency)
+    delivery.register_sink(sink)
+
+    pipeline = LiveUpdatePipeline(notify=subscriber_notifier('race', 'monaco'), drivers=drivers)
+    try:
+        with patch.object(race_notification_sender, 'load_subscribers', return_value=store):
+            report = replay(records, pipeline, speed=args.speed)
+    finally:
+        delivery.reset_sinks()
+
+    print(f"session:               {len(records)} records, {report.session_seconds / 60:.1f} minutes of racing")
+    print(f"replay:                {args.speed:g}x in {report.elapsed:.2f} s")
+    print(f"throughput:            {report.events_per_second:.0f} events/s")
+    print(f"alerts:                {dict(report.alerts)}, {sink.sent} deliveries")
+    print(f"detection latency:     p50 {report.latency_p50 * 1000:.1f} ms / p99 {report.latency_p99 * 1000:.1f} ms "
+          f"(wall time, including notification)")
+    print(f"max lag behind clock:  {report.max_lag * 1000:.1f} ms")
+    return report
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+Micro-benchmark for race page parsing in schedule_web_scrape.
+
+Compares the previous approach (four find_all walks plus per-call regex and
+strptime format building) with extract_sessions/parse_sessions. Uses race
+pages recorded with `python cli.py --record scrape` when available, otherwise
+the fixture page from tests/fixtures.
+
+Usage: python benchmarks/bench_scrape_dates.py [iterations]
+"""
+import glob
+import json
+import os
+import re
+import sys
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bs4 import BeautifulSoup  # noqa: E402
+
+import offline  # noqa: E402
+from schedule_web_scrape import SESSION_FIELDS, extract_sessions, parse_sessions  # noqa: E402
+
+CLASSES = {field: classes for (_, classes), field in SESSION_FIELDS.items()}
+
+
+def legacy_parse_date(year, month, day, time_text):
+    patterns = {
+        "year": (r"\d{4}", "%Y"),
+        "month": (r"[a-zA-Z]{3}", "%b"),
+        "day": (r"\d{1,2}", "%d"),
+        "time": (r"\d{2}:\d{2}", "%H:%M")
+    }
+    matches = {}
+    for param_name, param_value in [("year", str(year)), ("month", month), ("day", day), ("time", time_text)]:
+        match = re.search(patterns[param_name][0], param_value)
+        if not match:
+            raise ValueError(f"Invalid {param_name} value: {param_value}")
+        matches[param_name] = match.group()
+    date_format = " ".join([patterns[p][1] for p in ["year", "month", "day", "time"]])
+    date_string = f"{matches['year']} {matches['month']} {matches['day']} {matches['time']}"
+    return datetime.strptime(date_string, date_format)
+
+
+def legacy_rows(soup):
+    days = soup.find_all("p", class_=CLASSES["day"])
+    months = soup.find_all(class_=CLASSES["month"])
+    times = soup.find_all("p", class_=CLASSES["time"])
+    events = soup.find_all("span", class_=CLASSES["event"])
+    return [(events[i].text.strip(), days[i].text.strip(), months[i].text.strip(), times[i].text.strip())
+            for i in range(len(events))]
+
+
+def load_pages():
+    pages = []
+    for path in glob.glob(os.path.join(offline.FIXTURES_DIR, "GET_www.formula1.com_en_racing_*.json")):
+        with open(path, encoding='utf-8') as f:
+            body = json.load(f)['body']
+        if CLASSES["event"] in body:
+            pages.append(body)
+    if pages:
+        return pages, "recorded"
+    with open(os.path.join(ROOT, "tests", "fixtures", "race_schedule.html"), encoding='utf-8') as f:
+        return [f.read()], "fixture"
+
+
+def timed(fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1000
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    pages, source = load_pages()
+    soups = [BeautifulSoup(page, "html.parser") for page in pages]
+    rows = [extract_sessions(soup) for soup in soups]
+    print(f"{len(pages)} {source} page(s), {sum(map(len, rows))} sessions, {iterations} iterations")
+
+    legacy_extract = timed(lambda: [legacy_rows(soup) for soup in soups], iterations)
+    single_pass = timed(lambda: [extract_sessions(soup) for soup in soups], iterations)
+    print(f"extract  legacy 4x find_all: {legacy_extract:.3f} ms   single pass: {single_pass:.3f} ms")
+
+    legacy_dates = timed(lambda: [legacy_parse_date(2025, m, d, t) for page in rows for _, d, m, t in page],
+                         iterations * 10)
+    batch_dates = timed(lambda: [parse_sessions(2025, page) for page in rows], iterations * 10)
+    print(f"dates    legacy parse_date:  {legacy_dates:.3f} ms   batch parse: {batch_dates:.3f} ms")
+
+    legacy_total = timed(lambda: [legacy_rows(BeautifulSoup(page, "html.parser")) for page in pages], iterations)
+    new_total = timed(lambda: [extract_sessions(BeautifulSoup(page, "html.parser")) for page in pages], iterations)
+    print(f"page incl. HTML parse:       {legacy_total:.3f} ms   {new_total:.3f} ms")
+
+
+if __name__ == '__main__':
+    main()
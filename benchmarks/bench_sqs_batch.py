@@ -0,0 +1,56 @@
+"""
+Compares per-event invocation of race_notification_sender.lambda_handler with
+sqs_batch_handler. Pushover is replaced by a fixed-latency stand-in, and every
+per-event invocation pays a simulated cold start.
+
+Usage: python benchmarks/bench_sqs_batch.py [events] [send_latency_ms] [cold_start_ms]
+"""
+import json
+import os
+import sys
+import time
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import race_notification_sender  # noqa: E402
+
+
+def main():
+    events = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    send_latency = (int(sys.argv[2]) if len(sys.argv) > 2 else 100) / 1000
+    cold_start = (int(sys.argv[3]) if len(sys.argv) > 3 else 250) / 1000
+
+    event = {
+        'event_name': 'Race',
+        'event_time': '2025-05-25T13:00:00Z',
+        'circuit': 'Monaco',
+        'laps': 78,
+    }
+
+    def fake_send(message, title):
+        time.sleep(send_latency)
+        return 200
+
+    with patch.object(race_notification_sender, 'send_notification', side_effect=fake_send):
+        start = time.perf_counter()
+        for _ in range(events):
+            time.sleep(cold_start)
+            race_notification_sender.lambda_handler(event, None)
+        per_event = time.perf_counter() - start
+
+        records = [{'messageId': str(index), 'body': json.dumps(event)} for index in range(events)]
+        start = time.perf_counter()
+        for offset in range(0, events, 10):
+            if offset == 0:
+                time.sleep(cold_start)
+            race_notification_sender.sqs_batch_handler({'Records': records[offset:offset + 10]}, None)
+        batched = time.perf_counter() - start
+
+    print(f"events: {events}, send latency: {send_latency * 1000:.0f} ms, cold start: {cold_start * 1000:.0f} ms")
+    print(f"per-event invocations: {per_event:.2f} s ({events / per_event:.1f} events/s)")
+    print(f"batches of 10:         {batched:.2f} s ({events / batched:.1f} events/s)")
+
+
+if __name__ == '__main__':
+    main()
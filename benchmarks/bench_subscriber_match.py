@@ -0,0 +1,90 @@
+"""
+Compares recipient resolution through SubscriberStore's inverted index with a
+linear scan over every subscriber.
+
+Usage: python benchmarks/bench_subscriber_match.py [subscribers] [queries]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from subscribers import SubscriberStore  # noqa: E402
+
+EVENT_TYPES = ['practice', 'sprint_qualifying', 'sprint', 'qualifying', 'race']
+DRIVERS = [1, 4, 5, 6, 10, 12, 14, 16, 18, 22, 23, 27, 30, 31, 43, 44, 55, 63, 81, 87]
+MEETINGS = ['australia', 'china', 'japan', 'bahrain', 'saudi-arabia', 'miami', 'monaco', 'spain', 'canada',
+            'austria', 'great-britain', 'belgium', 'hungary', 'netherlands', 'italy', 'singapore', 'mexico']
+
+
+def random_subset(rng, values, empty_chance):
+    # Most subscribers leave a field unfiltered
+    if rng.random() < empty_chance:
+        return []
+    return rng.sample(values, rng.randint(1, 3))
+
+
+def linear_match(records, event_type, driver_number, meeting):
+    matched = set()
+    for record in records:
+        if event_type is not None and record['event_types'] and event_type not in record['event_types']:
+            continue
+        if driver_number is not None and record['drivers'] and driver_number not in record['drivers']:
+            continue
+        if meeting is not None and record['meetings'] and meeting not in record['meetings']:
+            continue
+        matched.add(record['id'])
+    return matched
+
+
+# Chance that a subscriber leaves (event types, drivers, meetings) unfiltered
+PROFILES = {
+    'broad': (0.4, 0.7, 0.8),
+    'selective': (0.1, 0.2, 0.3),
+}
+
+
+def run(profile, subscribers, queries):
+    rng = random.Random(42)
+    event_chance, driver_chance, meeting_chance = PROFILES[profile]
+
+    start = time.perf_counter()
+    store = SubscriberStore()
+    for index in range(subscribers):
+        store.add(index, f"user-{index}",
+                  event_types=random_subset(rng, EVENT_TYPES, event_chance),
+                  drivers=random_subset(rng, DRIVERS, driver_chance),
+                  meetings=random_subset(rng, MEETINGS, meeting_chance))
+    build = time.perf_counter() - start
+
+    workload = [(rng.choice(EVENT_TYPES), rng.choice(DRIVERS + [None]), rng.choice(MEETINGS))
+                for _ in range(queries)]
+    records = store.to_list()
+
+    start = time.perf_counter()
+    indexed_results = [store.match(*query) for query in workload]
+    indexed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    linear_results = [linear_match(records, *query) for query in workload]
+    linear = time.perf_counter() - start
+
+    assert indexed_results == linear_results
+    average = sum(map(len, indexed_results)) / queries
+    print(f"[{profile}] subscribers: {subscribers}, queries: {queries}, average recipients: {average:.0f}")
+    print(f"index build:   {build:.2f} s")
+    print(f"inverted index: {indexed / queries * 1000:.2f} ms/query")
+    print(f"linear scan:    {linear / queries * 1000:.2f} ms/query ({linear / indexed:.1f}x slower)")
+
+
+def main():
+    subscribers = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    queries = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    for profile in PROFILES:
+        run(profile, subscribers, queries)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""
+Local stand-in for the Pushover messages API.
+
+Accepts the same form POST as https://api.pushover.net/1/messages.json and
+simulates latency, random server errors and rate limiting, returning the
+X-Limit-App-* headers Pushover sends and Retry-After on 429s.
+"""
+import json
+import random
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakePushoverServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, latency=0.05, jitter=0.0, error_rate=0.0, rate_limit=None, app_limit=10000,
+                 address=('127.0.0.1', 0)):
+        """
+        Args:
+            latency: Base response latency in seconds
+            jitter: Extra uniformly distributed latency in seconds
+            error_rate: Fraction of requests answered with a 500
+            rate_limit: Maximum accepted requests per second, None for unlimited
+            app_limit: Monthly message limit reported in X-Limit-App-Limit
+        """
+        super().__init__(address, PushoverHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.app_limit = app_limit
+
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.delivered = 0
+        self.status_counts = {}
+        self.window_start = time.monotonic()
+        self.window_count = 0
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/1/messages.json"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def decide(self):
+        """Returns (status, retry_after) for the next request and updates the counters."""
+        with self.lock:
+            self.requests += 1
+            now = time.monotonic()
+            if now - self.window_start >= 1:
+                self.window_start, self.window_count = now, 0
+
+            if self.rate_limit is not None and self.window_count >= self.rate_limit:
+                status, retry_after = 429, 1
+            elif random.random() < self.error_rate:
+                status, retry_after = 500, None
+            else:
+                self.window_count += 1
+                self.delivered += 1
+                status, retry_after = 200, None
+
+            self.status_counts[status] = self.status_counts.get(status, 0) + 1
+            return status, retry_after
+
+
+class PushoverHandler(BaseHTTPRequestHandler):
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        form = urllib.parse.parse_qs(self.rfile.read(length).decode('utf-8'))
+
+        time.sleep(self.server.latency + random.uniform(0, self.server.jitter))
+
+        if not form.get('token') or not form.get('user'):
+            status, retry_after = 400, None
+        else:
+            status, retry_after = self.server.decide()
+
+        body = {'status': 1 if status == 200 else 0, 'request': f"fake-{self.server.requests}"}
+        if status != 200:
+            body['errors'] = [f"simulated {status}"]
+        encoded = json.dumps(body).encode('utf-8')
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(encoded)))
+        self.send_header('X-Limit-App-Limit', str(self.server.app_limit))
+        self.send_header('X-Limit-App-Remaining', str(max(self.server.app_limit - self.server.delivered, 0)))
+        self.send_header('X-Limit-App-Reset', str(int(time.time()) + 30 * 86400))
+        if retry_after is not None:
+            self.send_header('Retry-After', str(retry_after))
+        self.end_headers()
+        self.wfile.write(encoded)
+
+    def log_message(self, format, *args):
+        pass
@@ -0,0 +1,149 @@
+"""
+Load test for race_notification_sender subscriber fan-out.
+
+Starts a local fake Pushover server and sends M events to N subscribers
+through the sender Lambda's own path (deliver, matching a SubscriberStore),
+then reports throughput, latency percentiles, retries and how long the last
+subscriber waited for each event.
+
+Usage:
+    python benchmarks/load_test_sender.py --subscribers 500 --events 3 --latency 0.2 --error-rate 0.01
+"""
+import argparse
+import logging
+import os
+import statistics
+import sys
+import threading
+import time
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import delivery  # noqa: E402
+import race_notification_sender  # noqa: E402
+from subscribers import SubscriberStore  # noqa: E402
+from fake_pushover import FakePushoverServer  # noqa: E402
+
+# Scheduled executions fire 5 minutes before the session
+NOTIFICATION_WINDOW_SECONDS = 300
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(int(round(fraction * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def run(subscribers, events, workers, server):
+    settings = {
+        'PUSHOVER_TOKEN': 'load-test-token',
+        'PUSHOVER_USER_KEY': 'load-test-user',
+        'PUSHOVER_URL': server.url,
+    }
+    store = SubscriberStore()
+    for index in range(subscribers):
+        store.add(f"sub-{index}", f"user-{index:06d}")
+    event = {
+        'event_name': 'Race',
+        'event_time': '2025-05-25T13:00:00Z',
+        'circuit': 'Monaco',
+        'laps': 78,
+    }
+
+    latencies = []
+    attempts = []
+    lock = threading.Lock()
+    sink = delivery.PushoverSink(max_workers=workers)
+    live_send, live_post = sink.send, sink.session.post
+
+    def timed_send(message, title, address):
+        start = time.perf_counter()
+        status = live_send(message, title, address)
+        with lock:
+            latencies.append(time.perf_counter() - start)
+        return status
+
+    def counted_post(*args, **kwargs):
+        # Every attempt the sink makes, so retries are counted even when the server never answers
+        with lock:
+            attempts.append(1)
+        return live_post(*args, **kwargs)
+
+    sink.send = timed_send
+    sink.session.post = counted_post
+    delivery.register_sink(sink)
+
+    last_subscriber = []
+    failed = 0
+    with patch.object(delivery, 'settings', settings), \
+            patch.object(race_notification_sender, 'load_subscribers', return_value=store):
+        message, title = race_notification_sender.build_message(event)
+        total_start = time.perf_counter()
+        for _ in range(events):
+            event_start = time.perf_counter()
+            statuses = race_notification_sender.send_rendered(event, message, title)
+            last_subscriber.append(time.perf_counter() - event_start)
+            failed += sum(1 for status in statuses.values() if status != 200)
+        elapsed = time.perf_counter() - total_start
+
+    sends = subscribers * events
+    return {
+        'sends': sends,
+        'failed': failed,
+        'elapsed': elapsed,
+        'throughput': (sends - failed) / elapsed if elapsed else 0.0,
+        'p50': percentile(latencies, 0.50),
+        'p99': percentile(latencies, 0.99),
+        'mean': statistics.fmean(latencies) if latencies else 0.0,
+        'retries': len(attempts) - len(latencies),
+        'last_subscriber_max': max(last_subscriber, default=0.0),
+        'status_counts': dict(server.status_counts),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test subscriber fan-out against a fake Pushover server")
+    parser.add_argument('--subscribers', type=int, default=200)
+    parser.add_argument('--events', type=int, default=3)
+    parser.add_argument('--workers', type=int, default=delivery.MAX_SINK_WORKERS,
+                        help="concurrent sends (and pooled connections) for the Pushover channel")
+    parser.add_argument('--latency', type=float, default=0.05, help="server latency in seconds")
+    parser.add_argument('--jitter', type=float, default=0.02, help="extra random latency in seconds")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fraction of requests answered with 500")
+    parser.add_argument('--rate-limit', type=int, default=None, help="accepted requests per second before 429s")
+    args = parser.parse_args(argv)
+
+    logging.getLogger().setLevel(logging.ERROR)
+    server = FakePushoverServer(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                                rate_limit=args.rate_limit).start()
+    try:
+        report = run(args.subscribers, args.events, args.workers, server)
+    finally:
+        delivery.reset_sinks()
+        server.stop()
+
+    print(f"subscribers x events:   {args.subscribers} x {args.events} = {report['sends']} sends "
+          f"({args.workers} workers)")
+    print(f"elapsed:                {report['elapsed']:.2f} s")
+    print(f"throughput:             {report['throughput']:.1f} notifications/s")
+    print(f"latency p50 / p99:      {report['p50'] * 1000:.0f} ms / {report['p99'] * 1000:.0f} ms "
+          f"(mean {report['mean'] * 1000:.0f} ms, including retries)")
+    print(f"retries:                {report['retries']}")
+    print(f"failed after retries:   {report['failed']}")
+    print(f"server responses:       {report['status_counts']}")
+    print(f"last subscriber (max):  {report['last_subscriber_max']:.2f} s after the event fired")
+    if report['failed']:
+        verdict = f"FAILED: {report['failed']} of {report['sends']} sends were not delivered"
+    elif report['last_subscriber_max'] > NOTIFICATION_WINDOW_SECONDS:
+        verdict = f"FAILED: the last subscriber was outside the {NOTIFICATION_WINDOW_SECONDS // 60}-minute window"
+    else:
+        verdict = f"OK: every subscriber within the {NOTIFICATION_WINDOW_SECONDS // 60}-minute window"
+    print(f"verdict:                {verdict}")
+    return report
+
+
+if __name__ == '__main__':
+    main()
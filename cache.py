@@ -0,0 +1,66 @@
+import json
+import logging
+import os
+import time
+
+from dynaconf import settings
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+
+
+def cache_path(name: str):
+    """
+    Builds the on-disk path for a cache entry.
+
+    Args:
+        name: File name of the cache entry (e.g., 'drivers_1256.json')
+
+    Returns:
+        str: Absolute path inside the configured cache directory
+    """
+    cache_dir = settings.get('CACHE_DIR', '/tmp/f1-notification-cache')
+    return os.path.join(cache_dir, name)
+
+
+def load_json(name: str, max_age=None):
+    """
+    Loads a JSON cache entry from disk.
+
+    Args:
+        name: File name of the cache entry
+        max_age: Optional maximum age in seconds, older entries are treated as missing
+
+    Returns:
+        The decoded JSON data, or None if the entry is missing, stale or corrupt
+    """
+    path = cache_path(name)
+    try:
+        if max_age is not None and time.time() - os.path.getmtime(path) > max_age:
+            logging.info(f"Cache entry {name} is stale")
+            return None
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logging.warning(f"Error reading cache entry {name}: {e}")
+        return None
+
+
+def save_json(name: str, data):
+    """
+    Writes a JSON cache entry to disk atomically.
+
+    Args:
+        name: File name of the cache entry
+        data: JSON serialisable data
+    """
+    path = cache_path(name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
@@ -0,0 +1,203 @@
+import json
+import logging
+import os
+import re
+
+import requests
+from bs4 import BeautifulSoup
+from dynaconf import settings
+
+from cache import load_json, save_json
+from fetch_scheduler import formula1_fetcher
+from models import circuit_slug
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+
+CIRCUIT_METADATA_CACHE = "circuit_metadata.json"
+
+# Copy of the store shipped with the deployment package, written by this module's __main__
+BUNDLED_METADATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), CIRCUIT_METADATA_CACHE)
+
+# Sanity bounds for scraped values (Spa is the shortest race at ~44 laps, Monaco the longest at 78)
+MIN_LAPS, MAX_LAPS = 30, 100
+MIN_LENGTH_KM, MAX_LENGTH_KM = 3.0, 7.5
+
+LENGTH_PATTERN = re.compile(r"(\d+\.\d+)")
+LAP_RECORD_PATTERN = re.compile(r"\d+:\d{2}\.\d{3}")
+
+# In-memory copy of the store for warm Lambda containers
+_store = None
+
+
+def parse_circuit_page(content):
+    """
+    Extracts circuit metadata from a formula1.com circuit page.
+
+    Args:
+        content: Raw HTML of the race_url + "/circuit" page
+
+    Returns:
+        dict: Circuit metadata with 'laps', 'length_km' and 'lap_record'
+
+    Raises:
+        ValueError: If the page layout is not recognised or a value fails validation
+    """
+    soup = BeautifulSoup(content, "html.parser")
+    stats = soup.find_all("h2",
+                          class_="f1-heading tracking-normal text-fs-22px tablet:text-fs-32px leading-tight normal-case font-bold non-italic f1-heading__body font-formulaOne")
+
+    # Stats are laid out as: first grand prix, laps, circuit length, race distance, lap record
+    if len(stats) < 3:
+        raise ValueError(f"Expected at least 3 circuit stats, found {len(stats)}")
+
+    lap_text = stats[1].text.strip()
+    if not lap_text.isdigit():
+        raise ValueError(f"Laps is not a number: {lap_text}")
+
+    length_match = LENGTH_PATTERN.search(stats[2].text)
+    if not length_match:
+        raise ValueError(f"Circuit length is not a number: {stats[2].text.strip()}")
+
+    lap_record = None
+    if len(stats) > 4:
+        record_match = LAP_RECORD_PATTERN.search(stats[4].text)
+        lap_record = record_match.group() if record_match else None
+
+    circuit = {
+        "laps": int(lap_text),
+        "length_km": float(length_match.group(1)),
+        "lap_record": lap_record,
+    }
+    validate_circuit(circuit)
+    return circuit
+
+
+def validate_circuit(circuit: dict):
+    """
+    Checks scraped circuit metadata against sanity bounds.
+
+    Raises:
+        ValueError: If laps or length is out of range
+    """
+    if not MIN_LAPS <= circuit["laps"] <= MAX_LAPS:
+        raise ValueError(f"Laps is out of range: {circuit['laps']}")
+    if not MIN_LENGTH_KM <= circuit["length_km"] <= MAX_LENGTH_KM:
+        raise ValueError(f"Circuit length is out of range: {circuit['length_km']} km")
+
+
+def scrape_circuit(race_url: str):
+    try:
+        response = formula1_fetcher.fetch(race_url + "/circuit")
+        response.raise_for_status()
+        return parse_circuit_page(response.content)
+    except (requests.RequestException, ValueError) as e:
+        logging.warning(f"Error scraping circuit data for {race_url}: {e}, skipping")
+        return None
+
+
+def _save_store(circuits, failed):
+    global _store
+
+    _store = {"season": int(settings['YEAR']), "circuits": circuits, "failed": sorted(failed)}
+    save_json(CIRCUIT_METADATA_CACHE, _store)
+    return _store
+
+
+def refresh_circuit_metadata(race_urls):
+    """
+    Scrapes the given circuit pages and merges them into the season's store.
+
+    Circuits that can't be scraped are recorded as failed for the season, so
+    the scheduling path does not try their pages again on every run; the
+    pre-warm job retries them through update_circuit_metadata.
+
+    Args:
+        race_urls: Race URLs as returned by get_race_urls
+
+    Returns:
+        dict: The store, {'season': year, 'circuits': {slug: metadata}, 'failed': [slug, ...]}
+    """
+    circuits = dict(load_circuit_metadata())
+    failed = set(_store.get("failed", ()))
+    scraped = 0
+    for url, circuit in zip(race_urls, formula1_fetcher.fetch_all(race_urls, scrape_circuit)):
+        slug = circuit_slug(url)
+        if circuit:
+            circuits[slug] = circuit
+            failed.discard(slug)
+            scraped += 1
+        else:
+            failed.add(slug)
+
+    logging.info(f"Stored metadata for {scraped} of {len(race_urls)} circuits")
+    return _save_store(circuits, failed)
+
+
+def update_circuit_metadata(race_url: str):
+    """
+    Re-scrapes one circuit page and updates its entry in the season's store.
+
+    Keeps the stored entry if the page can't be scraped or fails validation.
+
+    Returns:
+        dict: The circuit's metadata, or None if there is none
+    """
+    circuits = load_circuit_metadata()
+    circuit = scrape_circuit(race_url)
+    if circuit is None:
+        return circuits.get(circuit_slug(race_url))
+
+    slug = circuit_slug(race_url)
+    _save_store(dict(circuits, **{slug: circuit}), set(_store.get("failed", ())) - {slug})
+    return circuit
+
+
+def _load_bundled():
+    try:
+        with open(BUNDLED_METADATA_PATH, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def load_circuit_metadata(race_urls=None):
+    """
+    Returns circuit metadata keyed by circuit slug for the configured season.
+
+    The store is read from memory, or else from the bundled copy overlaid with
+    the disk cache. When race_urls are given, only circuits missing from the
+    store (a new season or a race added mid-season) are scraped, once: pages
+    that failed this season are left to the pre-warm job.
+    """
+    global _store
+
+    season = int(settings['YEAR'])
+    if _store is None or _store.get("season") != season:
+        circuits, failed = {}, set()
+        for store in (_load_bundled(), load_json(CIRCUIT_METADATA_CACHE)):
+            if store and store.get("season") == season:
+                circuits.update(store["circuits"])
+                failed.update(store.get("failed", ()))
+        _store = {"season": season, "circuits": circuits, "failed": sorted(failed - set(circuits))}
+
+    known = set(_store["circuits"]) | set(_store["failed"])
+    missing = [url for url in race_urls or () if circuit_slug(url) not in known]
+    if missing:
+        logging.info(f"No circuit metadata for {len(missing)} circuits in {season}, scraping their pages")
+        return refresh_circuit_metadata(missing)["circuits"]
+
+    if not _store["circuits"]:
+        logging.warning(f"No circuit metadata for {season}")
+    return _store["circuits"]
+
+
+if __name__ == "__main__":
+    from schedule_web_scrape import get_race_urls
+
+    store = refresh_circuit_metadata(get_race_urls())
+    with open(BUNDLED_METADATA_PATH, 'w', encoding='utf-8') as f:
+        json.dump({"season": store["season"], "circuits": store["circuits"]}, f, indent=2)
+    logging.info(f"Wrote bundled circuit metadata to {BUNDLED_METADATA_PATH}")
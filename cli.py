@@ -0,0 +1,261 @@
+"""
+Command line entry point for running the pipeline stages locally.
+
+Examples:
+    python cli.py --profile scrape
+    python cli.py --offline --trace-memory schedule
+    python cli.py --profile --sampler send --event event.json
+    python cli.py --record fetch-meetings
+    python cli.py --offline replay tests/fixtures/replay_session --speed 1000 --notify
+    python cli.py results 1256 --session Race
+"""
+import argparse
+import collections
+import contextlib
+import cProfile
+import json
+import logging
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+
+import offline
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+
+SAMPLE_EVENT = {
+    "event_name": "Race",
+    "event_time": "2021-01-01T00:00:00Z",
+    "notification_time": "2021-01-01T00:05:00Z",
+    "circuit": "Circuit 1",
+    "laps": "10"
+}
+
+
+def run_scrape(args):
+    from schedule_web_scrape import scrape_race_data
+    return scrape_race_data()
+
+
+def run_schedule(args):
+    from race_notification_scheduler import lambda_handler
+    return lambda_handler({}, None)
+
+
+def run_send(args):
+    from race_notification_sender import lambda_handler
+    event = SAMPLE_EVENT
+    if args.event:
+        with open(args.event, encoding='utf-8') as f:
+            event = json.load(f)
+    return lambda_handler(event, None)
+
+
+def run_fetch_meetings(args):
+    from main import main
+    return main(send=args.send)
+
+
+def run_results(args):
+    from main import send_final_results
+    return send_final_results(args.meeting_key, args.session)
+
+
+def run_prewarm(args):
+    from prewarm import prewarm
+    return prewarm()
+
+
+def run_replay(args):
+    from live_updates import LiveUpdatePipeline, results_notifier, subscriber_notifier
+    from replay import load_session, record_session, replay
+
+    if args.fetch:
+        record_session(args.fetch, args.session_dir)
+    drivers, records = load_session(args.session_dir)
+    notify = subscriber_notifier(args.event_type, args.meeting) if args.notify else None
+    if args.results_meeting_key:
+        notify = results_notifier(args.results_meeting_key, args.results_session, notify)
+    report = replay(records, LiveUpdatePipeline(notify=notify, drivers=drivers), speed=args.speed)
+    print(json.dumps(report.summary(), indent=2))
+    return report
+
+
+class ThreadedProfile:
+    """
+    cProfile for the calling thread and every thread started while it is enabled.
+
+    cProfile only sees the thread that enabled it, and the scrape, schedule and
+    send stages do their work in fetch_all and dispatch pool threads, so each
+    new thread gets its own profiler and the stats are merged at the end.
+    """
+
+    def __init__(self):
+        self.profiles = [cProfile.Profile()]
+        self._lock = threading.Lock()
+
+    def _profile_thread(self, frame, event, arg):
+        # First profile event of a new thread: replace this hook with a profiler of its own
+        profile = cProfile.Profile()
+        with self._lock:
+            self.profiles.append(profile)
+        profile.enable()
+
+    def enable(self):
+        threading.setprofile(self._profile_thread)
+        self.profiles[0].enable()
+
+    def disable(self):
+        self.profiles[0].disable()
+        threading.setprofile(None)
+
+    def stats(self):
+        with self._lock:
+            return pstats.Stats(*self.profiles)
+
+
+class SamplingProfiler:
+    """Samples the stack of every other thread at a fixed interval from a background thread."""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.samples = collections.Counter()
+        self.threads = set()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                self.threads.add(ident)
+                code = frame.f_code
+                self.samples[f"{code.co_filename}:{frame.f_lineno} ({code.co_name})"] += 1
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def print_stats(self, limit: int):
+        total = sum(self.samples.values()) or 1
+        print(f"{total} samples from {len(self.threads)} threads every {self.interval * 1000:.0f} ms")
+        for location, count in self.samples.most_common(limit):
+            print(f"{count / total:7.1%}  {location}")
+
+
+@contextlib.contextmanager
+def profiled(mode, limit, output=None):
+    if mode == 'cprofile':
+        profiler = ThreadedProfile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            stats = profiler.stats()
+            if output:
+                stats.dump_stats(output)
+                logging.info(f"Wrote profile to {output}")
+            stats.sort_stats('cumulative').print_stats(limit)
+    elif mode == 'sample':
+        with SamplingProfiler() as profiler:
+            yield
+        profiler.print_stats(limit)
+    else:
+        yield
+
+
+@contextlib.contextmanager
+def traced_memory(enabled, limit):
+    if not enabled:
+        yield
+        return
+    tracemalloc.start()
+    try:
+        yield
+    finally:
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"Memory: current {current / 1024:.1f} KiB, peak {peak / 1024:.1f} KiB")
+        for stat in snapshot.statistics('lineno')[:limit]:
+            print(stat)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="F1 notification pipeline runner")
+    parser.add_argument('--profile', action='store_true', help="profile the run with cProfile")
+    parser.add_argument('--sampler', action='store_true',
+                        help="with --profile, sample the stack instead of tracing every call")
+    parser.add_argument('--profile-output', help="write raw cProfile stats to this file")
+    parser.add_argument('--trace-memory', action='store_true', help="report the top allocators with tracemalloc")
+    parser.add_argument('--top', type=int, default=20, help="number of profile/memory entries to print")
+    fixtures = parser.add_mutually_exclusive_group()
+    fixtures.add_argument('--offline', action='store_true', help="serve HTTP from recorded fixtures")
+    fixtures.add_argument('--record', action='store_true', help="record HTTP responses as fixtures")
+    parser.add_argument('--fixtures-dir', default=offline.FIXTURES_DIR, help="fixture directory")
+
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('scrape', help="scrape the race schedule").set_defaults(func=run_scrape)
+    subparsers.add_parser('schedule', help="run the scheduler lambda").set_defaults(func=run_schedule)
+    send = subparsers.add_parser('send', help="run the sender lambda")
+    send.add_argument('--event', help="JSON file with the event to send (defaults to a sample event)")
+    send.set_defaults(func=run_send)
+    fetch_meetings = subparsers.add_parser('fetch-meetings', help="fetch OpenF1 meetings and drivers")
+    fetch_meetings.add_argument('--send', action='store_true',
+                                help="send the rendered meeting notification instead of only logging it")
+    fetch_meetings.set_defaults(func=run_fetch_meetings)
+    subparsers.add_parser('prewarm', help="refresh the caches for an upcoming race weekend").set_defaults(
+        func=run_prewarm)
+    replay = subparsers.add_parser('replay', help="replay a recorded OpenF1 session through the live-update pipeline")
+    replay.add_argument('session_dir', help="directory with the recorded session's JSON files")
+    replay.add_argument('--speed', type=float, default=100.0, help="replay speed, 1 to 1000 times real time")
+    replay.add_argument('--fetch', type=int, metavar='SESSION_KEY',
+                        help="download the OpenF1 session into session_dir first")
+    replay.add_argument('--notify', action='store_true',
+                        help="send alerts to matching subscribers (combine with --offline to only log them)")
+    replay.add_argument('--event-type', default='race', help="event type alerts are matched against")
+    replay.add_argument('--meeting', help="meeting slug alerts are matched against")
+    replay.add_argument('--results-meeting-key', type=int, metavar='MEETING_KEY',
+                        help="send the final classification of this OpenF1 meeting at the chequered flag")
+    replay.add_argument('--results-session', default='Race', help="session whose results are sent")
+    replay.set_defaults(func=run_replay)
+    results = subparsers.add_parser('results', help="send a session's final classification once OpenF1 has it")
+    results.add_argument('meeting_key', type=int, help="OpenF1 meeting key")
+    results.add_argument('--session', default='Race', help="session name, e.g. Race or Sprint")
+    results.set_defaults(func=run_results)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    fixture_context = contextlib.nullcontext()
+    if args.offline or args.record:
+        fixture_context = offline.fixtures(args.fixtures_dir, record=args.record)
+
+    profile_mode = None
+    if args.profile:
+        profile_mode = 'sample' if args.sampler else 'cprofile'
+
+    start = time.perf_counter()
+    with fixture_context, traced_memory(args.trace_memory, args.top), \
+            profiled(profile_mode, args.top, args.profile_output):
+        result = args.func(args)
+    logging.info(f"{args.command} finished in {time.perf_counter() - start:.2f} s")
+    return result
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,270 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+import requests
+from botocore.config import Config
+from botocore.exceptions import ClientError, ConnectTimeoutError, ReadTimeoutError
+from dynaconf import settings
+from requests.adapters import HTTPAdapter
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger()
+
+PUSHOVER_URL = 'https://api.pushover.net/1/messages.json'
+
+# Pushover answers 429 when rate limited and 5xx on transient errors, both are worth retrying
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+MAX_RETRIES = 3
+RETRY_BACKOFF_SECONDS = 0.5
+MAX_RETRY_AFTER_SECONDS = 30
+
+# Per-request timeout for channels without one in DELIVERY_TIMEOUTS
+DEFAULT_TIMEOUT_SECONDS = 5
+
+# Overall time per delivery, retries included, for channels without one in DELIVERY_DEADLINES
+DEFAULT_DEADLINE_SECONDS = 15
+
+# Concurrent sends (and pooled connections) per channel
+MAX_SINK_WORKERS = 10
+
+# Reported for a delivery that timed out, failed to connect or named an unknown channel
+TIMEOUT_STATUS = 504
+ERROR_STATUS = 500
+UNKNOWN_CHANNEL_STATUS = 400
+
+# SNS rejects subjects longer than 100 characters
+MAX_SNS_SUBJECT_LENGTH = 100
+
+
+class DeliverySink:
+    """
+    A notification channel (Pushover, SNS, webhook, ...).
+
+    Subclasses implement send() for one address. Each sink owns its worker
+    pool and connection pool, so a slow or failing channel only ever ties up
+    its own workers and never delays deliveries on the other channels.
+    """
+
+    name = None
+    # Exceptions raised by the transport when the per-channel timeout expires
+    timeout_errors = ()
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT_SECONDS, max_workers=MAX_SINK_WORKERS,
+                 deadline=DEFAULT_DEADLINE_SECONDS):
+        """
+        Args:
+            timeout: Per-request timeout in seconds
+            max_workers: Concurrent sends, also the connection pool size
+            deadline: Overall seconds per delivery from the moment its send starts, retries included
+        """
+        self.timeout = timeout
+        self.deadline = max(deadline, timeout)
+        self.max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def send(self, message, title, address):
+        """
+        Sends one notification.
+
+        Returns:
+            int: HTTP status code of the delivery
+        """
+        raise NotImplementedError
+
+    def send_safely(self, message, title, address):
+        """Like send(), but reports timeouts and errors as a status code instead of raising."""
+        try:
+            return self.send(message, title, address)
+        except self.timeout_errors as e:
+            logger.error(f"{self.name} delivery timed out after {self.timeout} s: {e}")
+            return TIMEOUT_STATUS
+        except Exception as e:
+            logger.error(f"{self.name} delivery failed: {e}")
+            return ERROR_STATUS
+
+    def submit(self, message, title, address):
+        """Queues a send on this channel's worker pool and returns its future."""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix=f"{self.name}-sink")
+        return self._executor.submit(self.send_safely, message, title, address)
+
+    def close(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+
+class HttpSink(DeliverySink):
+    """Base for HTTP channels: one pooled requests.Session sized to the worker pool."""
+
+    timeout_errors = (requests.Timeout, requests.ConnectionError)
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT_SECONDS, max_workers=MAX_SINK_WORKERS,
+                 deadline=DEFAULT_DEADLINE_SECONDS):
+        super().__init__(timeout, max_workers, deadline)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def close(self):
+        super().close()
+        self.session.close()
+
+
+class PushoverSink(HttpSink):
+    """Pushover messages API, addressed by user key."""
+
+    name = 'pushover'
+
+    def send(self, message, title, address):
+        payload = {
+            'token': settings['PUSHOVER_TOKEN'],
+            'user': address,
+            'title': title,
+            'message': message,
+        }
+
+        pushover_url = settings.get('PUSHOVER_URL', PUSHOVER_URL)
+        deadline_at = time.monotonic() + self.deadline
+        for attempt in range(MAX_RETRIES + 1):
+            timeout = min(self.timeout, max(deadline_at - time.monotonic(), 0.1))
+            response = self.session.post(pushover_url, data=payload, timeout=timeout)
+            if response.status_code not in RETRYABLE_STATUS_CODES or attempt == MAX_RETRIES:
+                break
+
+            # Honour Retry-After when the server sends one, otherwise back off exponentially
+            retry_after = response.headers.get('Retry-After')
+            delay = RETRY_BACKOFF_SECONDS * 2 ** attempt
+            if retry_after and str(retry_after).isdigit():
+                delay = min(int(retry_after), MAX_RETRY_AFTER_SECONDS)
+            if time.monotonic() + delay + self.timeout > deadline_at:
+                # Another attempt would outlive the channel's deadline
+                logger.warning(f"Pushover returned {response.status_code}, no time left to retry")
+                break
+            logger.warning(f"Pushover returned {response.status_code}, retrying in {delay} seconds")
+            time.sleep(delay)
+
+        if response.status_code == 200:
+            logger.info("Notification sent successfully")
+        else:
+            logger.error(f"Failed to send notification: {response.text}")
+
+        return response.status_code
+
+
+class WebhookSink(HttpSink):
+    """Generic webhook, addressed by URL. Posts {"title": ..., "message": ...} as JSON."""
+
+    name = 'webhook'
+
+    def send(self, message, title, address):
+        response = self.session.post(address, json={'title': title, 'message': message}, timeout=self.timeout)
+        if response.status_code >= 400:
+            logger.error(f"Webhook {address} returned {response.status_code}: {response.text}")
+        return response.status_code
+
+
+class SnsSink(DeliverySink):
+    """Amazon SNS, addressed by topic ARN or E.164 phone number."""
+
+    name = 'sns'
+    timeout_errors = (ConnectTimeoutError, ReadTimeoutError)
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT_SECONDS, max_workers=MAX_SINK_WORKERS,
+                 deadline=DEFAULT_DEADLINE_SECONDS):
+        super().__init__(timeout, max_workers, deadline)
+        self._client = None
+
+    @property
+    def client(self):
+        # Created on first use so the sink can be registered without AWS credentials
+        with self._lock:
+            if self._client is None:
+                self._client = boto3.client('sns', config=Config(
+                    connect_timeout=self.timeout,
+                    read_timeout=self.timeout,
+                    max_pool_connections=self.max_workers,
+                    retries={'max_attempts': 2},
+                ))
+        return self._client
+
+    def send(self, message, title, address):
+        target = {'TopicArn': address} if address.startswith('arn:') else {'PhoneNumber': address}
+        try:
+            response = self.client.publish(Message=message, Subject=title[:MAX_SNS_SUBJECT_LENGTH], **target)
+        except ClientError as e:
+            logger.error(f"SNS publish to {address} failed: {e}")
+            return e.response.get('ResponseMetadata', {}).get('HTTPStatusCode', ERROR_STATUS)
+        return response['ResponseMetadata']['HTTPStatusCode']
+
+
+SINK_TYPES = {sink.name: sink for sink in (PushoverSink, SnsSink, WebhookSink)}
+
+# Created on first use and kept for the life of the Lambda container
+_sinks = {}
+_sinks_lock = threading.Lock()
+
+
+def register_sink(sink: DeliverySink):
+    """Adds or replaces the sink used for sink.name, e.g. a custom channel or a local stand-in."""
+    with _sinks_lock:
+        previous = _sinks.get(sink.name)
+        _sinks[sink.name] = sink
+    if previous is not None and previous is not sink:
+        previous.close()
+
+
+def get_sink(name: str):
+    """
+    Returns the sink for a channel, creating it with its DELIVERY_TIMEOUTS and DELIVERY_DEADLINES entries.
+
+    Raises:
+        KeyError: If no sink is registered or built in for the channel
+    """
+    with _sinks_lock:
+        if name not in _sinks:
+            timeouts = settings.get('DELIVERY_TIMEOUTS') or {}
+            deadlines = settings.get('DELIVERY_DEADLINES') or {}
+            _sinks[name] = SINK_TYPES[name](timeout=float(timeouts.get(name, DEFAULT_TIMEOUT_SECONDS)),
+                                            deadline=float(deadlines.get(name, DEFAULT_DEADLINE_SECONDS)))
+        return _sinks[name]
+
+
+def reset_sinks():
+    """Closes and forgets every sink, so the next get_sink() builds them from settings again."""
+    with _sinks_lock:
+        sinks = list(_sinks.values())
+        _sinks.clear()
+    for sink in sinks:
+        sink.close()
+
+
+def dispatch(message, title, deliveries):
+    """
+    Sends one message to many (channel, address) pairs in parallel.
+
+    Every channel works through its own pool, so all channels start at once
+    and each is bounded only by its own timeouts. Each delivery's deadline
+    runs from when its send starts, so a large fan-out queues behind the
+    channel's workers instead of losing its tail, and every delivery that
+    is reported has actually been attempted.
+
+    Returns:
+        list: Status code per delivery, in the same order as deliveries
+    """
+    futures = []
+    for channel, address in deliveries:
+        try:
+            futures.append(get_sink(channel).submit(message, title, address))
+        except KeyError:
+            logger.error(f"Unknown delivery channel {channel} for {address}")
+            futures.append(None)
+    return [future.result() if future is not None else UNKNOWN_CHANNEL_STATUS for future in futures]
@@ -0,0 +1,211 @@
+import email.utils
+import logging
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import requests
+from dynaconf import settings
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+
+# Responses that mean the host wants us to slow down
+THROTTLE_STATUS_CODES = {403, 429, 503}
+
+# Longest Retry-After pause honoured, so a CDN asking for an hour can't hold a Lambda until it times out
+MAX_RETRY_AFTER_SECONDS = 30
+
+
+class _HostState:
+    def __init__(self, rate, burst, concurrency):
+        self.rate = rate
+        self.tokens = float(burst)
+        self.last_refill = time.monotonic()
+        self.concurrency = float(concurrency)
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.last_decrease = 0.0
+
+
+class FetchScheduler:
+    """
+    Polite per-host fetcher for formula1.com and friends.
+
+    Each host gets a token bucket (requests per second) and an AIMD concurrency
+    limit. Successful, fast responses add one slot per window of completed
+    requests and nudge the rate back up; throttling responses (403/429/503) or
+    slow responses halve both. Retry-After pauses the host entirely.
+    """
+
+    def __init__(self, rate=2.0, burst=2, min_rate=0.2, max_rate=10.0, min_concurrency=1, max_concurrency=8,
+                 initial_concurrency=2, decrease_factor=0.5, latency_target=3.0, max_retries=3, timeout=10):
+        """
+        Args:
+            rate: Initial requests per second per host
+            burst: Token bucket capacity
+            min_rate: Floor for multiplicative rate decreases
+            max_rate: Ceiling for additive rate increases
+            min_concurrency: Floor for multiplicative decreases
+            max_concurrency: Ceiling for additive increases, also the fetch_all pool size
+            initial_concurrency: Starting concurrency per host
+            decrease_factor: Multiplier applied to rate and concurrency on throttling
+            latency_target: Responses slower than this (seconds) count as congestion
+            max_retries: Retries for throttled requests before returning the response
+            timeout: Per-request timeout in seconds
+        """
+        self.initial_rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max(max_rate, rate)
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.initial_concurrency = initial_concurrency
+        self.decrease_factor = decrease_factor
+        self.latency_target = latency_target
+        self.max_retries = max_retries
+        self.timeout = timeout
+
+        self._hosts = {}
+        self._condition = threading.Condition()
+
+    def _host(self, host):
+        # Under the lock, so threads starting together in fetch_all share one state per host
+        with self._condition:
+            if host not in self._hosts:
+                self._hosts[host] = _HostState(self.initial_rate, self.burst, self.initial_concurrency)
+            return self._hosts[host]
+
+    def _acquire(self, state):
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                state.tokens = min(self.burst, state.tokens + (now - state.last_refill) * state.rate)
+                state.last_refill = now
+
+                waits = []
+                if now < state.paused_until:
+                    waits.append(state.paused_until - now)
+                if state.tokens < 1:
+                    waits.append((1 - state.tokens) / state.rate)
+
+                if not waits and state.in_flight < int(state.concurrency):
+                    state.tokens -= 1
+                    state.in_flight += 1
+                    return
+
+                # Slot waits are woken by _release, time based waits by the timeout
+                self._condition.wait(timeout=max(waits) if waits else None)
+
+    def _release(self, state, status_code, latency, retry_after):
+        with self._condition:
+            state.in_flight -= 1
+            now = time.monotonic()
+
+            if retry_after:
+                state.paused_until = max(state.paused_until, now + retry_after)
+
+            congested = status_code in THROTTLE_STATUS_CODES or latency > self.latency_target
+            if congested:
+                # At most one decrease per latency window so a burst of 429s doesn't collapse to the floor
+                if now - state.last_decrease > self.latency_target:
+                    state.concurrency = max(self.min_concurrency, state.concurrency * self.decrease_factor)
+                    state.rate = max(self.min_rate, state.rate * self.decrease_factor)
+                    state.last_decrease = now
+                    logging.warning(f"Throttled ({status_code}, {latency:.2f} s), concurrency "
+                                    f"{state.concurrency:.2f}, rate {state.rate:.2f}/s")
+            elif status_code < 400:
+                # Additive increase: one extra slot per window of successful requests
+                state.concurrency = min(self.max_concurrency, state.concurrency + 1 / state.concurrency)
+                state.rate = min(self.max_rate, state.rate + 0.1)
+
+            self._condition.notify_all()
+
+    def fetch(self, url, **kwargs):
+        """
+        Fetches a URL with requests.get once the host has a free slot and token.
+
+        Throttled responses are retried up to max_retries times. The final
+        response is returned as-is so callers keep using raise_for_status().
+        """
+        state = self._host(urlparse(url).netloc)
+        kwargs.setdefault('timeout', self.timeout)
+
+        for attempt in range(self.max_retries + 1):
+            self._acquire(state)
+            start = time.monotonic()
+            response = None
+            try:
+                response = requests.get(url, **kwargs)
+            finally:
+                status_code = response.status_code if response is not None else 599
+                retry_after = parse_retry_after(response.headers.get('Retry-After')) if response is not None else None
+                self._release(state, status_code, time.monotonic() - start, retry_after)
+
+            if response.status_code not in THROTTLE_STATUS_CODES:
+                return response
+            logging.info(f"{url} returned {response.status_code}, attempt {attempt + 1} of {self.max_retries + 1}")
+        return response
+
+    def fetch_all(self, urls, fn=None):
+        """
+        Fetches many URLs concurrently, as far as each host's limits allow.
+
+        Args:
+            urls: URLs to fetch
+            fn: Optional callable applied to each URL instead of fetch, e.g. a
+                scrape function that calls fetch itself
+
+        Returns:
+            list: Results in the same order as urls
+        """
+        urls = list(urls)
+        if not urls:
+            return []
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(urls))) as executor:
+            return list(executor.map(fn or self.fetch, urls))
+
+    def stats(self, host):
+        """Returns the current concurrency, rate and pause for a host."""
+        with self._condition:
+            state = self._host(host)
+            return {
+                'concurrency': state.concurrency,
+                'rate': state.rate,
+                'in_flight': state.in_flight,
+                'paused_for': max(0.0, state.paused_until - time.monotonic()),
+            }
+
+
+def parse_retry_after(value):
+    """
+    Parses a Retry-After header given in seconds or as an HTTP date.
+
+    Returns:
+        float: Seconds to wait, at most MAX_RETRY_AFTER_SECONDS, or None if the
+        header is missing or invalid
+    """
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            retry_at = email.utils.parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        seconds = retry_at.timestamp() - time.time()
+    if math.isnan(seconds):
+        return None
+    return min(MAX_RETRY_AFTER_SECONDS, max(0.0, seconds))
+
+
+# Shared by the schedule and circuit scrapers so limits apply across both
+formula1_fetcher = FetchScheduler(
+    rate=float(settings.get('FETCH_RATE', 2.0)),
+    max_concurrency=int(settings.get('FETCH_MAX_CONCURRENCY', 8)),
+)
@@ -0,0 +1,308 @@
+import logging
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Optional
+
+import pytz
+
+from race_notification_sender import send_to_matching
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+
+# Position changes involving a car this soon after its pit stop are pit cycles, not overtakes
+PIT_LANE_WINDOW = timedelta(seconds=60)
+
+# Field holding each OpenF1 stream's timestamp
+TIME_FIELDS = {
+    'position': 'date',
+    'laps': 'date_start',
+    'pit': 'date',
+    'race_control': 'date',
+}
+
+
+def parse_time(value: str):
+    """
+    Parses an OpenF1 timestamp (e.g., '2025-05-25T13:03:35.292000+00:00') as a UTC-aware datetime.
+    """
+    moment = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    return moment if moment.tzinfo else moment.replace(tzinfo=pytz.UTC)
+
+
+def record_time(stream: str, record: dict):
+    return parse_time(record[TIME_FIELDS[stream]])
+
+
+@dataclass(slots=True, frozen=True)
+class LiveAlert:
+    """A live race update worth sending to subscribers."""
+    kind: str
+    title: str
+    message: str
+    occurred_at: datetime
+    driver_number: Optional[int] = None
+
+
+class RaceState:
+    """What the pipeline knows about the session so far, shared by the detectors."""
+
+    def __init__(self, drivers=None):
+        self.drivers = drivers or {}
+        self.positions = {}
+        # Last driver to leave each position, the car passed when its record arrives before the passer's
+        self.previous_holders = {}
+        self.laps = {}
+        self.last_pit = {}
+        self.neutralised = None
+        self.finished = False
+
+    def name(self, driver_number):
+        driver = self.drivers.get(driver_number, {})
+        return driver.get('full_name') or f"#{driver_number}"
+
+    def acronym(self, driver_number):
+        driver = self.drivers.get(driver_number, {})
+        return driver.get('name_acronym') or f"#{driver_number}"
+
+    @property
+    def lead_lap(self):
+        return max(self.laps.values(), default=0)
+
+    def driver_at(self, position):
+        return next((number for number, held in self.positions.items() if held == position), None)
+
+    def passed_at(self, position):
+        """
+        Returns the driver who held position until a pass, or None.
+
+        The two position records of a pass can arrive in either order: the
+        holder still at position, or the last holder who has dropped behind it.
+        """
+        holder = self.driver_at(position)
+        if holder is not None:
+            return holder
+        previous = self.previous_holders.get(position)
+        if previous is not None and self.positions.get(previous, 0) > position:
+            return previous
+        return None
+
+    def pitting(self, driver_number, moment):
+        last_pit = self.last_pit.get(driver_number)
+        return last_pit is not None and moment - last_pit <= PIT_LANE_WINDOW
+
+    def update(self, stream, record, moment):
+        if stream == 'position':
+            previous = self.positions.get(record['driver_number'])
+            if previous is not None and previous != record['position']:
+                self.previous_holders[previous] = record['driver_number']
+            self.positions[record['driver_number']] = record['position']
+        elif stream == 'laps' and record.get('lap_number') is not None:
+            self.laps[record['driver_number']] = record['lap_number']
+        elif stream == 'pit':
+            self.last_pit[record['driver_number']] = moment
+        elif stream == 'race_control':
+            self.neutralised = neutralisation(record, self.neutralised)
+            self.finished = self.finished or chequered_flag(record)
+
+
+def neutralisation(record, current):
+    """
+    Returns the neutralisation in force after a race control message: 'SC', 'VSC', 'RED' or None.
+    """
+    message = (record.get('message') or '').upper()
+    if record.get('category') == 'SafetyCar':
+        if 'VIRTUAL SAFETY CAR DEPLOYED' in message:
+            return 'VSC'
+        if 'SAFETY CAR DEPLOYED' in message:
+            return 'SC'
+        if 'ENDING' in message or 'IN THIS LAP' in message:
+            return None
+    elif record.get('category') == 'Flag':
+        if record.get('flag') == 'RED':
+            return 'RED'
+        if record.get('flag') == 'GREEN' and current == 'RED':
+            return None
+    return current
+
+
+def chequered_flag(record):
+    return record.get('category') == 'Flag' and (record.get('flag') or '').upper() == 'CHEQUERED'
+
+
+class OvertakeDetector:
+    """
+    Alerts when a driver takes a position from the car that held it.
+
+    The first position of each driver is the baseline. A pass is reported on
+    the passer's record, whichever of the two cars' records arrives first.
+    Gains under a safety car or red flag, and passes on cars that have just
+    pitted, are ignored.
+    """
+
+    streams = ('position',)
+
+    def detect(self, stream, record, moment, state):
+        driver_number, position = record['driver_number'], record['position']
+        previous = state.positions.get(driver_number)
+        if previous is None or position >= previous or state.neutralised:
+            return []
+
+        overtaken = state.passed_at(position)
+        if overtaken is None or overtaken == driver_number:
+            return []
+        if state.pitting(overtaken, moment) or state.pitting(driver_number, moment):
+            return []
+
+        return [LiveAlert(
+            kind='overtake',
+            title=f"F1 OVERTAKE: {state.acronym(driver_number)} P{position}",
+            message=f"Lap {state.lead_lap}: {state.name(driver_number)} passes {state.name(overtaken)} for P{position}",
+            occurred_at=moment,
+            driver_number=driver_number,
+        )]
+
+
+class PitDetector:
+    """Alerts on every pit stop."""
+
+    streams = ('pit',)
+
+    def detect(self, stream, record, moment, state):
+        driver_number = record['driver_number']
+        duration = record.get('pit_duration')
+        message = f"Lap {record.get('lap_number') or state.lead_lap}: {state.name(driver_number)} pits"
+        if duration is not None:
+            message += f" ({float(duration):.1f} s)"
+        return [LiveAlert(
+            kind='pit',
+            title=f"F1 PIT STOP: {state.acronym(driver_number)}",
+            message=message,
+            occurred_at=moment,
+            driver_number=driver_number,
+        )]
+
+
+class SafetyCarDetector:
+    """Alerts when a safety car, virtual safety car or red flag is deployed."""
+
+    streams = ('race_control',)
+
+    TITLES = {
+        'SC': 'F1 SAFETY CAR',
+        'VSC': 'F1 VIRTUAL SAFETY CAR',
+        'RED': 'F1 RED FLAG',
+    }
+
+    def detect(self, stream, record, moment, state):
+        deployed = neutralisation(record, state.neutralised)
+        if deployed is None or deployed == state.neutralised:
+            return []
+        return [LiveAlert(
+            kind='safety_car',
+            title=self.TITLES[deployed],
+            message=f"Lap {record.get('lap_number') or state.lead_lap}: {record.get('message', deployed)}",
+            occurred_at=moment,
+        )]
+
+
+class ChequeredFlagDetector:
+    """Alerts once when the chequered flag ends the session."""
+
+    streams = ('race_control',)
+
+    def detect(self, stream, record, moment, state):
+        if state.finished or not chequered_flag(record):
+            return []
+        return [LiveAlert(
+            kind='chequered_flag',
+            title='F1 CHEQUERED FLAG',
+            message=f"Lap {record.get('lap_number') or state.lead_lap}: {record.get('message', 'CHEQUERED FLAG')}",
+            occurred_at=moment,
+        )]
+
+
+def default_detectors():
+    return [OvertakeDetector(), PitDetector(), SafetyCarDetector(), ChequeredFlagDetector()]
+
+
+class LiveUpdatePipeline:
+    """
+    Runs OpenF1 live records through the detectors and notifies on each alert.
+
+    Detectors see the state from before the record, then the record is
+    applied to the state.
+    """
+
+    def __init__(self, detectors=None, notify=None, drivers=None):
+        """
+        Args:
+            detectors: Objects with a 'streams' tuple and detect(stream, record, moment, state)
+            notify: Called with each LiveAlert, e.g. subscriber_notifier()
+            drivers: Driver lookup keyed by driver_number, as built by main.build_driver_lookup
+        """
+        self.state = RaceState(drivers)
+        self.notify = notify
+        self._detectors = {}
+        for detector in detectors if detectors is not None else default_detectors():
+            for stream in detector.streams:
+                self._detectors.setdefault(stream, []).append(detector)
+
+    def process(self, stream, record, moment=None):
+        """
+        Handles one record from an OpenF1 stream ('position', 'laps', 'pit' or 'race_control').
+
+        Returns:
+            list: The LiveAlerts it raised
+        """
+        moment = moment or record_time(stream, record)
+        alerts = []
+        for detector in self._detectors.get(stream, ()):
+            alerts.extend(detector.detect(stream, record, moment, self.state))
+        self.state.update(stream, record, moment)
+
+        for alert in alerts:
+            logging.info(f"{alert.title}: {alert.message}")
+            if self.notify is None:
+                continue
+            try:
+                self.notify(alert)
+            except Exception as e:
+                # A failed notification must not stop detection for the rest of the session
+                logging.error(f"Error sending {alert.kind} alert: {str(e)}")
+        return alerts
+
+
+def subscriber_notifier(event_type: str = 'race', meeting: str = None):
+    """
+    Returns a notify callback that sends alerts to the matching subscribers.
+
+    Driver alerts reach subscribers following that driver (or every driver).
+    """
+    def notify(alert):
+        return send_to_matching(alert.message, alert.title, event_type, alert.driver_number, meeting)
+    return notify
+
+
+def results_notifier(meeting_key: int, session_name: str = 'Race', notify=None):
+    """
+    Returns a notify callback that sends the final classification at the chequered flag.
+
+    The results are fetched (and retried until OpenF1 publishes them) on their
+    own thread, so detection carries on meanwhile. Every alert is also passed
+    on to notify, e.g. subscriber_notifier().
+    """
+    def on_alert(alert):
+        thread = None
+        if alert.kind == 'chequered_flag':
+            from main import send_final_results
+            thread = threading.Thread(target=send_final_results, args=(meeting_key, session_name),
+                                      name=f"final-results-{meeting_key}")
+            thread.start()
+        if notify is not None:
+            notify(alert)
+        return thread
+    return on_alert
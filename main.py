@@ -1,11 +1,15 @@
 import json
 import logging
+import time
 from datetime import datetime
 
 import http.client
 import pytz
 import requests
 from dynaconf import settings
+
+from cache import load_json, save_json
+from race_notification_sender import send_notification
 from schedule_web_scrape import scrape_race_data
 
 logging.basicConfig(
@@ -13,6 +17,9 @@ logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 
+# Driver lookup tables keyed by meeting_key, then driver_number
+_driver_lookups = dict()
+
 
 def get_driver_data(meeting_key: int):
     request_url = f'https://api.openf1.org/v1/drivers?meeting_key={meeting_key}'
@@ -27,10 +34,78 @@ def get_driver_data(meeting_key: int):
         return None
 
 
+def get_meetings(year, refresh: bool = False):
+    """
+    Returns the OpenF1 meetings for a season, from the disk cache unless refresh is set.
+    """
+    cache_name = f"meetings_{year}.json"
+    if not refresh:
+        cached = load_json(cache_name)
+        if cached is not None:
+            return cached
+
+    response = requests.get(f'https://api.openf1.org/v1/meetings?year={year}')
+    logging.info(f"Fetching meetings data from {response.url}: year {year}")
+    response.raise_for_status()
+    meetings = response.json()
+    save_json(cache_name, meetings)
+    return meetings
+
+
+def get_meeting_sessions(meeting_key: int, refresh: bool = False):
+    """
+    Returns every OpenF1 session of a meeting, from the disk cache unless refresh is set.
+    """
+    cache_name = f"sessions_{meeting_key}.json"
+    if not refresh:
+        cached = load_json(cache_name)
+        if cached is not None:
+            return cached
+
+    request_url = f'https://api.openf1.org/v1/sessions?meeting_key={meeting_key}'
+    response = requests.get(request_url)
+    logging.info(f"Fetching session data for meeting key {meeting_key} from {response.url}")
+    response.raise_for_status()
+    sessions = response.json()
+    save_json(cache_name, sessions)
+    return sessions
+
+
 def get_session_data(meeting_key: int, session_name: str):
-    request_url = f'https://api.openf1.org/v1/sessions?meeting_key={meeting_key}&session_name={session_name}'
+    # One cached request per meeting serves every session name
+    return [session for session in get_meeting_sessions(meeting_key) if session.get('session_name') == session_name]
+
+
+def build_driver_lookup(meeting_key: int, refresh: bool = False):
+    """
+    Returns the driver lookup table for a meeting, keyed by driver_number.
+
+    The table is built once from get_driver_data and kept both in memory and on
+    disk, so results can be joined against it without per-driver requests.
+    refresh rebuilds it from get_driver_data, e.g. once the entry list is final.
+    """
+    if meeting_key in _driver_lookups and not refresh:
+        return _driver_lookups[meeting_key]
+
+    cache_name = f"drivers_{meeting_key}.json"
+    cached = None if refresh else load_json(cache_name)
+    if cached is not None:
+        # JSON object keys are always strings
+        lookup = {int(number): driver for number, driver in cached.items()}
+    else:
+        driver_data = get_driver_data(meeting_key) or []
+        lookup = {driver['driver_number']: driver for driver in driver_data if driver.get('driver_number') is not None}
+        if lookup:
+            save_json(cache_name, lookup)
+
+    _driver_lookups[meeting_key] = lookup
+    return lookup
+
+
+def get_session_results(session_key: int):
+    request_url = f'https://api.openf1.org/v1/session_result?session_key={session_key}'
     response = requests.get(request_url)
-    logging.info(f"Fetching {session_name} session data for meeting key {meeting_key} from {response.url}")
+    logging.info(f"Fetching results for session key {session_key} from {response.url}")
     response.raise_for_status()
     return response.json()
 
@@ -42,23 +117,6 @@ def convert_to_local_time(utc_time):
     return local_time.strftime('%Y-%m-%d %I:%M %p')
 
 
-def send_notification(message, title):
-    payload = {
-        'token': settings['PUSHOVER_TOKEN'],
-        'user': settings['PUSHOVER_USER_KEY'],
-        'title': title,
-        'message': message
-    }
-
-    # uncomment to send notification
-    """
-    response = requests.post(pushover_url, data=payload)
-    response.raise_for_status()
-    """
-    logging.info("Notification sent successfully.")
-    return payload
-
-
 def meeting_message(meeting_data):
     date_start = convert_to_local_time(meeting_data['date_start'])
     message = (
@@ -78,37 +136,106 @@ def grand_prix_message(session_data, weather_data):
     )
 
 
-def main():
-    # Fetch meetings data
-    response = requests.get(f'https://api.openf1.org/v1/meetings?year={settings["YEAR"]}')
-    logging.info(f"Fetching meetings data from {response.url}: year {settings['YEAR']}")
-    response.raise_for_status()
+def final_results_message(session_data, results, driver_lookup):
+    # Classified drivers first, then DNF/DNS/DSQ in the order OpenF1 returns them
+    classified = sorted(results, key=lambda result: (result.get('position') is None, result.get('position') or 0))
+
+    lines = [f"{session_data['country_name']} {session_data['session_name']} Results"]
+    for result in classified:
+        driver = driver_lookup.get(result['driver_number'], {})
+        name = driver.get('full_name', f"#{result['driver_number']}")
+        team = driver.get('team_name', 'Unknown Team')
+
+        if result.get('dsq'):
+            position = 'DSQ'
+        elif result.get('dns'):
+            position = 'DNS'
+        elif result.get('dnf') or result.get('position') is None:
+            position = 'DNF'
+        else:
+            position = f"P{result['position']}"
+
+        lines.append(f"{position} {name} ({team})")
+    return "\n".join(lines)
+
+
+def wait_for_session_results(session_key: int):
+    """
+    Fetches a session's classification, retrying while OpenF1 has not published it yet.
+
+    session_result is usually empty for a short while after the chequered flag,
+    so the request is repeated every RESULTS_RETRY_SECONDS, up to
+    RESULTS_MAX_ATTEMPTS times.
 
+    Returns:
+        list: The results, or an empty list if they never appeared
+    """
+    attempts = int(settings.get('RESULTS_MAX_ATTEMPTS', 6))
+    delay = float(settings.get('RESULTS_RETRY_SECONDS', 10))
+    for attempt in range(1, attempts + 1):
+        results = get_session_results(session_key)
+        if results:
+            return results
+        if attempt < attempts:
+            logging.info(f"No results for session key {session_key} yet, retrying in {delay} seconds")
+            time.sleep(delay)
+    return []
+
+
+def send_final_results(meeting_key: int, session_name: str = 'Race'):
+    # Build (or load) the lookup table before fetching the classification
+    driver_lookup = build_driver_lookup(meeting_key)
+
+    sessions = get_session_data(meeting_key, session_name)
+    if not sessions:
+        logging.warning(f"No {session_name} session found for meeting key {meeting_key}")
+        return None
+    session_data = sessions[0]
+
+    # One request for the whole classification, repeated until it is published
+    results = wait_for_session_results(session_data['session_key'])
+    if not results:
+        logging.warning(f"No {session_name} results published for meeting key {meeting_key}, not sending")
+        return None
+    message = final_results_message(session_data, results, driver_lookup)
+    title = f"F1 RESULTS: {session_data['country_name']} {session_name}"
+    return send_notification(message, title)
+
+
+def main(send: bool = False):
+    """
+    Fetches the season's meetings and driver lookups, then renders a meeting notification.
+
+    The notification is only logged unless send is True, so a development or
+    profiling run never notifies anyone.
+    """
+    # Fetch meetings data
     try:
-        meeting_data = response.json()
+        meeting_data = get_meetings(settings['YEAR'])
     except ValueError as e:
         logging.error(f"Error parsing meetings data JSON: {e}")
         return
 
-    # Process each meeting
-    driver_dict = dict()
+    # Build the driver lookup table for each meeting
     for meeting in meeting_data:
         meeting_key = meeting.get('meeting_key')
         if not meeting_key:
             logging.warning("Missing 'meeting_key' in meeting data.")
             continue
 
-        driver_data = get_driver_data(meeting_key)
-        if driver_data:
-            driver_dict[meeting_key] = driver_data
+        build_driver_lookup(meeting_key)
 
     logging.info(f"Successfully fetched meetings data. Total meetings: {len(meeting_data)}")
-    print(send_notification(meeting_data[1])['message'])
+    message, title = meeting_message(meeting_data[1]), meeting_data[1]['meeting_name']
+    if not send:
+        logging.info(f"Dry run, not sending {title}:\n{message}")
+        return
+    status_code = send_notification(message, title)
+    logging.info(f"Meeting notification returned {status_code}")
 
 
 # Entry point
 if __name__ == '__main__':
     main()
 
-# TODO fix bug with scheduler lambda - datetime not str
-# TODO write different messages - like over take, sprint start time, final results
\ No newline at end of file
+# TODO write different messages - like over take, sprint start time
\ No newline at end of file
@@ -0,0 +1,108 @@
+import hashlib
+import json
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import List, Optional
+
+import pytz
+
+from subscribers import event_type
+
+
+def circuit_slug(race_url: str):
+    """
+    Returns the circuit slug for a race URL (e.g., '.../racing/2025/monaco' -> 'monaco').
+    """
+    return race_url.rstrip('/').split('/')[-1]
+
+
+@dataclass(slots=True, frozen=True)
+class SessionEvent:
+    """One session of a race weekend, with a timezone-aware UTC start time."""
+    name: str
+    start: datetime
+
+    def __post_init__(self):
+        if self.start.tzinfo is None:
+            raise ValueError(f"Session start must be timezone-aware: {self.name} at {self.start}")
+
+    @property
+    def event_type(self):
+        return event_type(self.name)
+
+
+@dataclass(slots=True)
+class RaceWeekend:
+    """A race weekend as scraped from formula1.com."""
+    url: str
+    sessions: List[SessionEvent] = field(default_factory=list)
+    laps: Optional[int] = None
+
+    @property
+    def slug(self):
+        return circuit_slug(self.url)
+
+    @property
+    def circuit(self):
+        return self.slug.replace('-', ' ').title()
+
+
+def race_fingerprint(race: RaceWeekend):
+    """
+    Hashes a race's normalized session list (name and UTC start, in start order).
+
+    Two scrapes of an unchanged schedule give the same fingerprint regardless
+    of page order, so comparing fingerprints is enough to skip the race.
+    """
+    normalized = "\n".join(
+        f"{session.name}|{to_timestamp(session.start)}"
+        for session in sorted(race.sessions, key=lambda session: (session.start, session.name))
+    )
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
+def to_timestamp(moment: datetime):
+    return int(moment.timestamp())
+
+
+def from_timestamp(timestamp):
+    return datetime.fromtimestamp(int(timestamp), pytz.UTC)
+
+
+def session_payload(race: RaceWeekend, session: SessionEvent, notification_time: datetime):
+    """
+    Builds the event passed through Step Functions to the notification Lambda.
+
+    Times travel as integer epoch seconds, so nothing is formatted or parsed
+    as ISO strings on the way.
+    """
+    return {
+        "event_name": session.name,
+        "event_type": session.event_type,
+        "meeting": race.slug,
+        "event_ts": to_timestamp(session.start),
+        "notification_ts": to_timestamp(notification_time),
+        "circuit": race.circuit,
+        "laps": race.laps if race.laps is not None else 'N/A',
+    }
+
+
+def session_from_payload(event: dict):
+    """
+    Rebuilds the SessionEvent from a notification payload.
+
+    Accepts the epoch 'event_ts' written by session_payload as well as the
+    older ISO 'event_time' field.
+    """
+    if 'event_ts' in event:
+        return SessionEvent(event['event_name'], from_timestamp(event['event_ts']))
+
+    start = datetime.fromisoformat(event['event_time'].replace('Z', '+00:00'))
+    if start.tzinfo is None:
+        start = start.replace(tzinfo=pytz.UTC)
+    return SessionEvent(event['event_name'], start)
+
+
+def dumps(payload):
+    """Compact JSON for Step Functions input (no whitespace between tokens)."""
+    return json.dumps(payload, separators=(',', ':'))
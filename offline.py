@@ -0,0 +1,133 @@
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+
+import boto3
+import requests
+
+import cache
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "http")
+
+
+class FixtureResponse:
+    """The subset of requests.Response the scraper, scheduler and sender use."""
+
+    def __init__(self, url, status_code, body, headers=None):
+        self.url = url
+        self.status_code = status_code
+        self.text = body
+        self.content = body.encode('utf-8')
+        self.headers = headers or {}
+
+    def json(self):
+        return json.loads(self.text)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} Error for url: {self.url}", response=self)
+
+
+class OfflineStepFunctions:
+    """Stand-in Step Functions client that logs executions instead of starting them."""
+
+    def start_execution(self, stateMachineArn, name, input):
+        logging.info(f"[offline] start_execution {name}: {input}")
+        return {'executionArn': f"{stateMachineArn}:{name}"}
+
+    def stop_execution(self, executionArn, **kwargs):
+        logging.info(f"[offline] stop_execution {executionArn}")
+        return {}
+
+
+class OfflineSns:
+    """Stand-in SNS client that logs publishes instead of sending them."""
+
+    def publish(self, Message, **kwargs):
+        logging.info(f"[offline] sns publish {kwargs.get('TopicArn') or kwargs.get('PhoneNumber')}")
+        return {'MessageId': 'offline', 'ResponseMetadata': {'HTTPStatusCode': 200}}
+
+
+def fixture_path(method: str, url: str, fixtures_dir: str = FIXTURES_DIR):
+    """
+    Returns the fixture file for a request, e.g. 'GET_api.openf1.org_v1_meetings_3f2a9c1d.json'.
+    """
+    readable = re.sub(r"[^A-Za-z0-9.]+", "_", url.split("://", 1)[-1])[:80]
+    digest = hashlib.sha1(f"{method} {url}".encode('utf-8')).hexdigest()[:8]
+    return os.path.join(fixtures_dir, f"{method}_{readable}_{digest}.json")
+
+
+def _full_url(url, params):
+    return requests.Request('GET', url, params=params).prepare().url
+
+
+@contextlib.contextmanager
+def fixtures(fixtures_dir: str = FIXTURES_DIR, record: bool = False):
+    """
+    Serves HTTP requests from recorded fixtures instead of the network.
+
+    With record=True GET requests go to the network as usual and every response
+    is written to fixtures_dir, so a later offline run replays the same data.
+    POSTs (notifications, including those from the pooled delivery sessions),
+    SNS and Step Functions calls are replaced by logging stand-ins in both modes.
+    The disk cache is swapped for an empty temporary one, so a warm page or
+    OpenF1 cache can neither stop a recording nor stand in for the fixtures.
+    """
+    live_get, live_post, live_client = requests.get, requests.post, boto3.client
+    live_cache_path = cache.cache_path
+    cache_dir = tempfile.mkdtemp(prefix='f1-fixtures-cache-')
+    live_session_post = requests.Session.post
+
+    def offline_get(url, params=None, **kwargs):
+        url = _full_url(url, params)
+        path = fixture_path('GET', url, fixtures_dir)
+        if record:
+            response = live_get(url, **kwargs)
+            os.makedirs(fixtures_dir, exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump({'url': url, 'status_code': response.status_code,
+                           'headers': dict(response.headers), 'body': response.text}, f)
+            return response
+
+        try:
+            with open(path, encoding='utf-8') as f:
+                fixture = json.load(f)
+        except FileNotFoundError:
+            raise requests.ConnectionError(f"No recorded fixture for GET {url} ({path})")
+        return FixtureResponse(fixture['url'], fixture['status_code'], fixture['body'], fixture.get('headers'))
+
+    def offline_post(url, data=None, **kwargs):
+        # Notifications are never sent or recorded, just acknowledged
+        logging.info(f"[offline] POST {url}")
+        return FixtureResponse(url, 200, '{"status":1}')
+
+    def offline_session_post(session, url, data=None, **kwargs):
+        return offline_post(url, data, **kwargs)
+
+    def offline_client(service_name, *args, **kwargs):
+        if service_name == 'stepfunctions':
+            return OfflineStepFunctions()
+        if service_name == 'sns':
+            return OfflineSns()
+        return live_client(service_name, *args, **kwargs)
+
+    requests.get, requests.post, boto3.client = offline_get, offline_post, offline_client
+    requests.Session.post = offline_session_post
+    cache.cache_path = lambda name: os.path.join(cache_dir, name)
+    try:
+        yield
+    finally:
+        requests.get, requests.post, boto3.client = live_get, live_post, live_client
+        requests.Session.post = live_session_post
+        cache.cache_path = live_cache_path
+        shutil.rmtree(cache_dir, ignore_errors=True)
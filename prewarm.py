@@ -0,0 +1,140 @@
+import json
+import logging
+from datetime import datetime, timedelta
+
+import pytz
+import requests
+from dynaconf import settings
+
+from circuit_metadata import update_circuit_metadata
+from fetch_scheduler import formula1_fetcher
+from main import build_driver_lookup, get_meeting_sessions, get_meetings
+from schedule_web_scrape import get_race_urls, scrape_dates, scrape_race_data
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+
+# OpenF1 meetings start with the first practice session, allow for a day either way
+MEETING_MATCH_WINDOW = timedelta(days=1)
+
+
+def upcoming_weekends(races, now, lead):
+    """
+    Returns the race weekends that start within lead of now or are under way.
+
+    Args:
+        races: RaceWeekend objects from scrape_race_data
+        now: Current time
+        lead: How long before the first session a weekend counts as upcoming
+    """
+    return [
+        race for race in races
+        if race.sessions
+        and min(session.start for session in race.sessions) - lead <= now <= max(
+            session.start for session in race.sessions)
+    ]
+
+
+def match_meeting(meetings, race):
+    """
+    Returns the OpenF1 meeting that starts closest to the weekend's first session, within a day.
+    """
+    first_start = min(session.start for session in race.sessions)
+    best = None
+    for meeting in meetings:
+        try:
+            date_start = datetime.fromisoformat(meeting['date_start'].replace('Z', '+00:00'))
+        except (AttributeError, KeyError, ValueError):
+            continue
+        if date_start.tzinfo is None:
+            date_start = date_start.replace(tzinfo=pytz.UTC)
+        distance = abs(date_start - first_start)
+        if distance <= MEETING_MATCH_WINDOW and (best is None or distance < best[0]):
+            best = (distance, meeting)
+    return best[1] if best else None
+
+
+def refresh_race_page(race_url: str):
+    try:
+        return scrape_dates(race_url, refresh=True)
+    except requests.RequestException as e:
+        # The previous copy stays in the page cache
+        logging.error(f"Error refreshing {race_url}: {e}")
+        return None
+
+
+def prewarm(now=None):
+    """
+    Refreshes every cache an upcoming race weekend needs.
+
+    The known schedule is read through the page cache, so this run only goes to
+    formula1.com for pages that have expired. For each weekend starting within
+    PREWARM_LEAD_HOURS it then re-fetches the season and race pages, the
+    circuit page, and the OpenF1 meetings, sessions and drivers, so the
+    scheduler and sender run from warm caches during the weekend.
+
+    Returns:
+        dict: The weekends and OpenF1 meetings that were refreshed
+    """
+    now = now or datetime.now(pytz.UTC)
+    lead = timedelta(hours=float(settings.get('PREWARM_LEAD_HOURS', 48)))
+
+    weekends = upcoming_weekends(scrape_race_data(), now, lead)
+    summary = {'weekends': [race.slug for race in weekends], 'meetings': []}
+    if not weekends:
+        logging.info(f"No race weekend within {lead}, nothing to pre-warm")
+        return summary
+
+    logging.info(f"Pre-warming caches for {', '.join(summary['weekends'])}")
+    get_race_urls(refresh=True)
+    formula1_fetcher.fetch_all([race.url for race in weekends], refresh_race_page)
+    for race in weekends:
+        update_circuit_metadata(race.url)
+
+    try:
+        meetings = get_meetings(settings['YEAR'], refresh=True)
+    except (requests.RequestException, ValueError) as e:
+        logging.error(f"Error refreshing OpenF1 meetings: {e}")
+        return summary
+
+    for race in weekends:
+        meeting = match_meeting(meetings, race)
+        if meeting is None:
+            logging.warning(f"No OpenF1 meeting found for {race.slug}")
+            continue
+        meeting_key = meeting['meeting_key']
+        try:
+            get_meeting_sessions(meeting_key, refresh=True)
+            build_driver_lookup(meeting_key, refresh=True)
+        except (requests.RequestException, ValueError) as e:
+            logging.error(f"Error refreshing OpenF1 data for meeting {meeting_key}: {e}")
+            continue
+        summary['meetings'].append(meeting_key)
+
+    logging.info(f"Pre-warmed {len(weekends)} weekends and {len(summary['meetings'])} OpenF1 meetings")
+    return summary
+
+
+def lambda_handler(event, context):
+    cache_dir = settings.get('CACHE_DIR', '/tmp/f1-notification-cache')
+    if cache_dir.startswith('/tmp'):
+        # Another Lambda never sees this container's /tmp
+        logging.warning(f"CACHE_DIR {cache_dir} is local to this container, point it at the shared EFS mount")
+    try:
+        summary = prewarm()
+        return {
+            'statusCode': 200,
+            'body': json.dumps(summary)
+        }
+    except Exception as e:
+        logging.error(f"Error pre-warming caches: {str(e)}")
+        return {
+            'statusCode': 500,
+            'body': json.dumps(f'Error: {str(e)}')
+        }
+
+
+if __name__ == '__main__':
+    print(json.dumps(prewarm(), indent=2))
@@ -3,17 +3,268 @@ import logging
 
 import boto3
 import pytz
+from botocore.exceptions import ClientError
 from datetime import datetime, timedelta
+from dynaconf import settings
+from cache import load_json, save_json
+from models import dumps, from_timestamp, race_fingerprint, session_payload, to_timestamp
+from race_notification_sender import send_session_moved
 from schedule_web_scrape import scrape_race_data
+from subscribers import load_subscribers
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger()
 
+# Chained-wait state machine defined in F1MultiReminderScheduler.json
+STATE_MACHINE_ARN = 'arn:aws:states:region:account-id:stateMachine:F1MultiReminderStateMachine'
+
+DEFAULT_REMINDER_OFFSETS = [5]
+
+# Wait state TimestampPath format (RFC 3339, UTC)
+STEP_FUNCTIONS_TIMESTAMP_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+
+# Per-race fingerprints, session times and executions from the last run.
+# Kept in S3 (SCHEDULE_STATE_BUCKET) in production, the local cache otherwise.
+SCHEDULE_STATE_CACHE = "schedule_state.json"
+
+# Room left on the 80 character execution name for a '-<epoch seconds>' suffix
+MAX_EXECUTION_NAME = 80
+RESTART_SUFFIX_LENGTH = 11
+
+
+def reminder_offsets(event_type: str):
+    """
+    Returns the configured reminder offsets in minutes for an event type, largest first.
+    """
+    offsets = settings.get('REMINDER_OFFSETS') or {}
+    configured = offsets.get(event_type) or offsets.get('default') or DEFAULT_REMINDER_OFFSETS
+    return sorted({int(minutes) for minutes in configured}, reverse=True)
+
+
+def reminder_schedule(event_time, offsets, now):
+    """
+    Pre-computes the absolute time of each of a session's reminders.
+
+    Args:
+        event_time: Session start time
+        offsets: Minutes before the start, largest first
+        now: Current time
+
+    Returns:
+        list: {'timestamp', 'minutes_before'} per reminder still in the future,
+        earliest first. Timestamps are UTC ISO 8601 strings for the state
+        machine's TimestampPath, so time spent sending one reminder never
+        delays the next.
+    """
+    reminders = []
+    for minutes in offsets:
+        reminder_time = event_time - timedelta(minutes=minutes)
+        if reminder_time <= now:
+            continue
+        reminders.append({
+            "timestamp": reminder_time.astimezone(pytz.UTC).strftime(STEP_FUNCTIONS_TIMESTAMP_FORMAT),
+            "minutes_before": minutes,
+        })
+    return reminders
+
+
+def execution_arn(execution_name: str):
+    """Derives the ARN of an execution of STATE_MACHINE_ARN from its name."""
+    return f"{STATE_MACHINE_ARN.replace(':stateMachine:', ':execution:')}:{execution_name}"
+
+
+def load_schedule_state():
+    """
+    Loads the per-race schedule state from the last run.
+
+    Reads s3://SCHEDULE_STATE_BUCKET/schedule_state.json when the bucket is
+    configured, otherwise the local cache, which only lives as long as one
+    Lambda container.
+
+    Raises:
+        RuntimeError: If REQUIRE_DURABLE_STATE is set (production) but no bucket is configured
+    """
+    bucket = settings.get('SCHEDULE_STATE_BUCKET')
+    if not bucket:
+        if settings.get('REQUIRE_DURABLE_STATE', False):
+            # Without the previous state moved sessions keep their old reminders running
+            raise RuntimeError("SCHEDULE_STATE_BUCKET must be set when REQUIRE_DURABLE_STATE is enabled")
+        return load_json(SCHEDULE_STATE_CACHE) or {}
+
+    try:
+        response = boto3.client('s3').get_object(Bucket=bucket, Key=SCHEDULE_STATE_CACHE)
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') not in ('NoSuchKey', '404'):
+            raise
+        logger.info(f"No schedule state in s3://{bucket}/{SCHEDULE_STATE_CACHE} yet")
+        return {}
+    return json.loads(response['Body'].read())
+
+
+def save_schedule_state(schedule_state):
+    """Saves the per-race schedule state where load_schedule_state reads it."""
+    bucket = settings.get('SCHEDULE_STATE_BUCKET')
+    if not bucket:
+        save_json(SCHEDULE_STATE_CACHE, schedule_state)
+        return
+    boto3.client('s3').put_object(Bucket=bucket, Key=SCHEDULE_STATE_CACHE, Body=dumps(schedule_state),
+                                  ContentType='application/json')
+
+
+def start_reminders(stepfunctions, race, session, reminders, notification_time, now):
+    """Starts the reminder execution for a session and returns its ARN."""
+    # Create event info to pass to the notification Lambda
+    event_info = session_payload(race, session, notification_time)
+
+    # Generate a unique name for this execution (Step Functions requirement)
+    base_name = f"f1-notification-{session.name.replace(' ', '-')}-{session.start.strftime('%Y%m%d%H%M')}"
+    execution_name = base_name[:MAX_EXECUTION_NAME]  # Step Functions has 80 char limit on name
+    execution_input = dumps({
+        "event": event_info,
+        "reminders": reminders
+    })
+
+    # Execute the state machine (which waits and notifies once per reminder)
+    logger.info(f"Scheduling {len(reminders)} reminders for {session.name}, first at {notification_time.isoformat()}")
+    try:
+        response = stepfunctions.start_execution(
+            stateMachineArn=STATE_MACHINE_ARN,
+            name=execution_name,
+            input=execution_input
+        )
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') != 'ExecutionAlreadyExists':
+            raise
+
+        # Still running: started by an earlier run whose state was lost
+        arn = execution_arn(execution_name)
+        status = stepfunctions.describe_execution(executionArn=arn)['status']
+        if status == 'RUNNING':
+            logger.info(f"Execution already running: {execution_name}")
+            return arn
+
+        # Stopped when the session moved away and has now moved back: start a fresh one
+        logger.info(f"Execution {execution_name} is {status}, starting a new one")
+        response = stepfunctions.start_execution(
+            stateMachineArn=STATE_MACHINE_ARN,
+            name=f"{base_name[:MAX_EXECUTION_NAME - RESTART_SUFFIX_LENGTH]}-{to_timestamp(now)}",
+            input=execution_input
+        )
+
+    logger.info(f"Step Functions execution started: {response['executionArn']}")
+    return response['executionArn']
+
+
+def handle_moved_sessions(stepfunctions, race, previous, executions, now):
+    """
+    Stops the executions of sessions whose start changed and notifies subscribers.
+
+    Returns:
+        int: Number of sessions that moved
+    """
+    moved = 0
+    current = {session.name: session for session in race.sessions}
+    for name, old_timestamp in previous['sessions'].items():
+        session = current.get(name)
+        if session is not None and to_timestamp(session.start) == old_timestamp:
+            continue
+
+        # The old reminders are wrong (moved) or orphaned (removed)
+        execution = executions.pop(name, None)
+        if execution and execution.get('arn'):
+            logger.info(f"Stopping reminders for {name} at {race.slug}: {execution['arn']}")
+            try:
+                stepfunctions.stop_execution(executionArn=execution['arn'], cause="Session moved")
+            except ClientError as e:
+                logger.warning(f"Error stopping execution {execution['arn']}: {e}")
+
+        if session is None:
+            logger.info(f"Session removed from schedule: {name} at {race.slug}")
+            continue
+
+        moved += 1
+        old_start = from_timestamp(old_timestamp)
+        logger.info(f"Session moved: {name} at {race.slug} from {old_start.isoformat()} to {session.start.isoformat()}")
+        if session.start > now:
+            try:
+                status = send_session_moved(race, session, old_start)
+            except Exception as e:
+                # Rescheduling and saving the state must still go ahead
+                logger.error(f"Error notifying that {name} at {race.slug} moved: {str(e)}")
+                continue
+            if status != 200:
+                logger.error(f"Session moved notification for {name} at {race.slug} failed with {status}")
+    return moved
+
+
+def schedule_race(stepfunctions, race, executions, now, horizon_seconds, subscriber_store):
+    """
+    Starts reminder executions for a race's sessions that are not scheduled yet.
+
+    Args:
+        executions: Session name -> {'start', 'arn'} of running executions, updated in place
+
+    Returns:
+        tuple: (number of executions started, timestamp when the race next needs a pass or None)
+    """
+    scheduled_events = 0
+    next_due = None
+
+    # Process each event in the race weekend
+    for session in race.sessions:
+        event_time = session.start
+        event_name = session.name
+
+        # Skip past events
+        if event_time <= now:
+            logger.info(f"Skipping past event: {event_name} at {event_time.isoformat()}")
+            continue
+
+        # Skip sessions whose reminders are already running
+        if executions.get(event_name, {}).get('start') == to_timestamp(event_time):
+            continue
+
+        # Calculate every reminder still ahead of us, earliest first
+        reminders = reminder_schedule(event_time, reminder_offsets(session.event_type), now)
+
+        # Skip if every notification time has already passed
+        if not reminders:
+            logger.info(f"Skipping event with past notification time: {event_name}")
+            continue
+
+        # Wait time until the first reminder
+        notification_time = event_time - timedelta(minutes=reminders[0]['minutes_before'])
+        wait_seconds = (notification_time - now).total_seconds()
+
+        # Only schedule sessions whose first reminder is within the horizon
+        # Later reminders are sent by the same execution
+        if wait_seconds > horizon_seconds:
+            logger.info(f"Skipping event too far in future: {event_name}, would wait {wait_seconds / 3600} hours")
+            due = to_timestamp(notification_time) - int(horizon_seconds)
+            next_due = due if next_due is None else min(next_due, due)
+            continue
+
+        if len(subscriber_store) and not subscriber_store.match(session.event_type, meeting=race.slug):
+            logger.info(f"Skipping event with no subscribers: {event_name} at {race.slug}")
+            # Subscriptions may change, look again on the next run
+            next_due = to_timestamp(now)
+            continue
+
+        arn = start_reminders(stepfunctions, race, session, reminders, notification_time, now)
+        executions[event_name] = {"start": to_timestamp(event_time), "arn": arn}
+        scheduled_events += 1
+
+    return scheduled_events, next_due
+
 
 def lambda_handler(event, context):
+    # Fingerprints and executions from the last run, keyed by circuit slug
+    schedule_state = load_schedule_state()
+
     # Scrape current race data
     logger.info("Scraping F1 race schedule data")
-    race_data = scrape_race_data()
+    # Race pages are re-read after a few minutes, not the page cache's hours, so moved sessions are noticed
+    race_data = scrape_race_data(race_page_max_age=float(settings.get('SCHEDULE_PAGE_CACHE_MINUTES', 10)) * 60)
 
     # Get current time in UTC
     now = datetime.now(pytz.UTC)
@@ -22,73 +273,44 @@ def lambda_handler(event, context):
     # Initialize Step Functions client
     stepfunctions = boto3.client('stepfunctions')
 
+    # Subscriber preferences, sessions nobody follows are not scheduled
+    subscriber_store = load_subscribers()
+
+    horizon_seconds = float(settings.get('SCHEDULE_HORIZON_HOURS', 24)) * 3600
+
     # Track events we've scheduled
     scheduled_events = 0
+    unchanged_races = 0
+    moved_sessions = 0
 
     # Process each race
     for race in race_data:
-        # Extract circuit info from URL
-        circuit = race.get('url', '').split('/')[-1].replace('-', ' ').title()
-        laps = race.get('laps', 'N/A')
-
-        # Process each event in the race weekend
-        for event in race['dates']:
-            event_time_iso = event['date']
-            event_time = datetime.fromisoformat(event_time_iso)
-            if event_time.tzinfo is None:
-                event_time = event_time.replace(tzinfo=pytz.UTC)
-
-            event_name = event['event']
-
-            # Skip past events
-            if event_time <= now:
-                logger.info(f"Skipping past event: {event_name} at {event_time.isoformat()}")
-                continue
+        fingerprint = race_fingerprint(race)
+        previous = schedule_state.get(race.slug)
 
-            # Calculate notification time (5 minutes before event)
-            notification_time = event_time - timedelta(minutes=5)
+        # Unchanged race with nothing entering the horizon yet: a hash comparison is all it costs
+        if previous and previous['fingerprint'] == fingerprint and (
+                previous['next_due'] is None or previous['next_due'] > to_timestamp(now)):
+            unchanged_races += 1
+            continue
 
-            # Skip if notification time has already passed
-            if notification_time <= now:
-                logger.info(f"Skipping event with past notification time: {event_name}")
-                continue
+        executions = dict(previous['executions']) if previous else {}
+        if previous and previous['fingerprint'] != fingerprint:
+            moved_sessions += handle_moved_sessions(stepfunctions, race, previous, executions, now)
 
-            # Calculate wait time in seconds
-            wait_seconds = (notification_time - now).total_seconds()
+        started, next_due = schedule_race(stepfunctions, race, executions, now, horizon_seconds, subscriber_store)
+        scheduled_events += started
 
-            # Only schedule events in the next 24 hours
-            # Step Functions has limitations on wait times and we want to be efficient
-            if wait_seconds > 86400:  # 24 hours in seconds
-                logger.info(f"Skipping event too far in future: {event_name}, would wait {wait_seconds / 3600} hours")
-                continue
+        schedule_state[race.slug] = {
+            "fingerprint": fingerprint,
+            "sessions": {session.name: to_timestamp(session.start) for session in race.sessions},
+            "executions": executions,
+            "next_due": next_due,
+        }
 
-            # Create event info to pass to the notification Lambda
-            event_info = {
-                "event_name": event_name,
-                "event_time": event_time.isoformat(),
-                "notification_time": notification_time.isoformat(),
-                "circuit": circuit,
-                "laps": laps
-            }
-
-            # Generate a unique name for this execution (Step Functions requirement)
-            execution_name = f"f1-notification-{event_name.replace(' ', '-')}-{event_time.strftime('%Y%m%d%H%M')}"
-
-            # Execute the state machine (which will wait and then notify)
-            logger.info(f"Scheduling notification for {event_name} at {notification_time.isoformat()}")
-            response = stepfunctions.start_execution(
-                stateMachineArn='arn:aws:states:region:account-id:stateMachine:F1NotificationStateMachine',
-                name=execution_name[:80],  # Step Functions has 80 char limit on name
-                input=json.dumps({
-                    "event": event_info,
-                    "wait_seconds": int(wait_seconds)
-                })
-            )
-
-            logger.info(f"Step Functions execution started: {response['executionArn']}")
-            scheduled_events += 1
-
-    logger.info(f"Scheduled {scheduled_events} event notifications")
+    save_schedule_state(schedule_state)
+    logger.info(f"Scheduled {scheduled_events} event notifications, {moved_sessions} sessions moved, "
+                f"{unchanged_races} races unchanged")
 
     return {
         'statusCode': 200,
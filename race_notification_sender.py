@@ -1,66 +1,159 @@
 import json
 import logging
-import os
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 
-import requests
 from dynaconf import settings
 
+from cache import load_json, save_json
+from delivery import dispatch, get_sink
+from models import session_from_payload
+from subscribers import event_type, load_subscribers
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger()
 
+# Upper bound on concurrent records handled for a single SQS batch
+MAX_BATCH_WORKERS = 10
+
+# Successful deliveries of a failed SQS record are remembered for its retries,
+# up to SQS's default 4 day message retention
+DELIVERY_LOG_MAX_AGE = 4 * 24 * 3600
+
+# Reminder offset assumed for events scheduled before offsets were configurable
+DEFAULT_MINUTES_BEFORE = 5
+
+
+def send_notification(message, title, user_key=None):
+    """
+    Sends one Pushover notification, to PUSHOVER_USER_KEY unless a user key is given.
+
+    Connection errors and timeouts are reported as a status code, not raised.
+    """
+    return get_sink('pushover').send_safely(message, title, user_key or settings['PUSHOVER_USER_KEY'])
+
+
+def unwrap_event(payload):
+    """
+    Returns the event from a bare event or an {"event": ..., "minutes_before": ...}
+    envelope, as sent by the reminder state machine's Map iterations and SQS.
+    """
+    if 'event' not in payload:
+        return payload
+    event = dict(payload['event'])
+    if 'minutes_before' in payload:
+        event['minutes_before'] = payload['minutes_before']
+    return event
+
+
+def format_lead_time(minutes):
+    """Formats a reminder offset, e.g. 5 -> '5 MINUTES', 60 -> '1 HOUR', 1440 -> '1 DAY'."""
+    for unit, size in (('DAY', 1440), ('HOUR', 60)):
+        if minutes >= size and minutes % size == 0:
+            count = minutes // size
+            return f"{count} {unit}" + ("S" if count > 1 else "")
+    return f"{minutes} MINUTE" + ("S" if minutes != 1 else "")
+
+
+def build_message(event):
+    # Extract event details
+    session = session_from_payload(event)
+    event_name = session.name
+    event_time = session.start
+    circuit = event.get('circuit', 'Unknown Circuit')
+    laps = event.get('laps', 'N/A')
+    minutes_before = int(event.get('minutes_before', DEFAULT_MINUTES_BEFORE))
+
+    # Format the event time in a readable format
+    formatted_time = event_time.strftime('%Y-%m-%d %I:%M %p UTC')
+
+    # Create notification message
+    message = (
+        f"⚠️ {event_name} STARTING IN {format_lead_time(minutes_before)} ⚠️\n\n"
+        f"Event: {event_name}\n"
+        f"Start Time: {formatted_time}\n"
+        f"Circuit: {circuit}\n"
+        f"Laps: {laps}"
+    )
+    if minutes_before <= 60:
+        title = f"F1 STARTING SOON: {event_name}"
+    else:
+        title = f"F1 REMINDER: {event_name} in {format_lead_time(minutes_before).lower()}"
+    return message, title
+
 
-def send_notification(message, title):
-    # Get environment variables
-    pushover_token = os.environ.get('PUSHOVER_TOKEN')
-    pushover_user_key = os.environ.get('PUSHOVER_USER_KEY')
+def fan_out(message, title, event_type, driver_number=None, meeting=None, skip=()):
+    """
+    Sends a message to every channel of every subscriber whose preferences match.
 
-    pushover_token = settings['PUSHOVER_TOKEN']
-    pushover_user_key = settings['PUSHOVER_USER_KEY']
+    Without a subscriber store the notification goes to PUSHOVER_USER_KEY.
 
-    payload = {
-        'token': pushover_token,
-        'user': pushover_user_key,
-        'title': title,
-        'message': message,
-    }
+    Args:
+        skip: (channel, address) pairs already delivered, e.g. on an SQS retry
 
-    pushover_url = 'https://api.pushover.net/1/messages.json'
-    response = requests.post(pushover_url, data=payload)
+    Returns:
+        dict: Status code per (channel, address) that was sent to
+    """
+    store = load_subscribers()
+    if not len(store):
+        fallback = ('pushover', settings.get('PUSHOVER_USER_KEY'))
+        return {} if fallback in skip else {fallback: send_notification(message, title)}
 
-    if response.status_code == 200:
-        logger.info("Notification sent successfully")
-    else:
-        logger.error(f"Failed to send notification: {response.text}")
+    recipients = store.match(event_type, driver_number, meeting)
+    deliveries = [delivery for delivery in store.deliveries(recipients) if delivery not in skip]
+    logger.info(f"Resolved {len(recipients)} recipients ({len(deliveries)} deliveries) for {title}")
+    return dict(zip(deliveries, dispatch(message, title, deliveries)))
+
+
+def first_failure(statuses):
+    """Returns 200 if every send succeeded, otherwise the first failing status code."""
+    return next((status for status in statuses if status != 200), 200)
 
-    return response.status_code
+
+def send_to_matching(message, title, event_type, driver_number=None, meeting=None):
+    """
+    Sends a message to every channel of every subscriber whose preferences match.
+
+    Returns:
+        int: 200 if every send succeeded, otherwise the first failing status code
+    """
+    return first_failure(fan_out(message, title, event_type, driver_number, meeting).values())
+
+
+def deliver(event):
+    """Renders an event and sends it to every subscriber whose preferences match."""
+    message, title = build_message(event)
+    return first_failure(send_rendered(event, message, title).values())
+
+
+def send_rendered(event, message, title, skip=()):
+    return fan_out(message, title, event_type(event['event_name']), event.get('driver_number'),
+                   event.get('meeting'), skip)
+
+
+def build_moved_message(circuit, session, old_start):
+    message = (
+        f"🔄 {session.name} HAS MOVED 🔄\n\n"
+        f"Event: {session.name}\n"
+        f"Circuit: {circuit}\n"
+        f"Was: {old_start.strftime('%Y-%m-%d %I:%M %p UTC')}\n"
+        f"Now: {session.start.strftime('%Y-%m-%d %I:%M %p UTC')}"
+    )
+    title = f"F1 SCHEDULE CHANGE: {session.name}"
+    return message, title
+
+
+def send_session_moved(race, session, old_start):
+    """Notifies subscribers of the session that its start time has changed."""
+    message, title = build_moved_message(race.circuit, session, old_start)
+    return send_to_matching(message, title, session.event_type, meeting=race.slug)
 
 
 def lambda_handler(event, context):
     logger.info(f"Received event: {json.dumps(event)}")
 
     try:
-        # Extract event details
-        event_name = event['event_name']
-        event_time = datetime.fromisoformat(event['event_time'].replace('Z', '+00:00'))
-        circuit = event.get('circuit', 'Unknown Circuit')
-        laps = event.get('laps', 'N/A')
-
-        # Format the event time in a readable format
-        formatted_time = event_time.strftime('%Y-%m-%d %I:%M %p UTC')
-
-        # Create notification message
-        message = (
-            f"⚠️ {event_name} STARTING IN 5 MINUTES ⚠️\n\n"
-            f"Event: {event_name}\n"
-            f"Start Time: {formatted_time}\n"
-            f"Circuit: {circuit}\n"
-            f"Laps: {laps}"
-        )
-
         # Send notification
-        title = f"F1 STARTING SOON: {event_name}"
-        status_code = send_notification(message, title)
+        status_code = deliver(unwrap_event(event))
 
         return {
             'statusCode': status_code,
@@ -75,6 +168,75 @@ def lambda_handler(event, context):
         }
 
 
+def delivery_log_name(message_id):
+    """Returns the cache entry holding the deliveries already made for an SQS message."""
+    return f"delivered_{message_id}.json"
+
+
+def process_record(record):
+    """
+    Renders and sends one SQS record.
+
+    Returns:
+        bool: False only if a delivery failed and the record should be retried.
+        The deliveries that succeeded are kept in the cache (keyed by message
+        id), so the retry only sends the failed ones. Records that can't be
+        parsed or rendered would fail the same way on every retry, so they are
+        logged and consumed.
+    """
+    try:
+        event = unwrap_event(json.loads(record['body']))
+        message, title = build_message(event)
+    except Exception as e:
+        logger.error(f"Dropping malformed record {record.get('messageId')}: {str(e)}")
+        return True
+
+    # Deliveries that succeeded on an earlier attempt at this record are not sent again
+    log_name = delivery_log_name(record.get('messageId'))
+    delivered = {tuple(pair) for pair in load_json(log_name, max_age=DELIVERY_LOG_MAX_AGE) or []}
+    try:
+        statuses = send_rendered(event, message, title, skip=delivered)
+    except Exception as e:
+        logger.error(f"Error delivering record {record.get('messageId')}: {str(e)}")
+        return False
+
+    failed = [pair for pair, status in statuses.items() if status != 200]
+    if not failed:
+        return True
+
+    delivered.update(pair for pair, status in statuses.items() if status == 200)
+    save_json(log_name, sorted(delivered))
+    logger.warning(f"{len(failed)} of {len(statuses)} deliveries failed for record {record.get('messageId')}, "
+                   f"retrying only those")
+    return False
+
+
+def sqs_batch_handler(event, context):
+    """
+    Handles a batch of SQS records in one invocation.
+
+    Records are rendered and sent concurrently. Only the records whose delivery
+    failed are reported back, so the event source mapping (with
+    ReportBatchItemFailures enabled) retries just those; malformed records are
+    logged and dropped.
+    """
+    records = event.get('Records', [])
+    logger.info(f"Received batch of {len(records)} records")
+    if not records:
+        return {'batchItemFailures': []}
+
+    with ThreadPoolExecutor(max_workers=min(MAX_BATCH_WORKERS, len(records))) as executor:
+        delivered = list(executor.map(process_record, records))
+
+    failures = [
+        {'itemIdentifier': record['messageId']}
+        for record, ok in zip(records, delivered)
+        if not ok
+    ]
+    logger.info(f"Delivered {len(records) - len(failures)} of {len(records)} notifications")
+    return {'batchItemFailures': failures}
+
+
 if __name__ == '__main__':
     package = (
         {
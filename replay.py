@@ -0,0 +1,192 @@
+import heapq
+import json
+import logging
+import os
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import timedelta
+from operator import itemgetter
+from typing import List
+
+import requests
+
+from live_updates import TIME_FIELDS, record_time
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+
+OPENF1_URL = 'https://api.openf1.org/v1'
+
+# Replay speeds, as multiples of real time
+MIN_SPEED, MAX_SPEED = 1, 1000
+
+
+def record_session(session_key: int, session_dir: str):
+    """
+    Downloads a session's OpenF1 streams and drivers into session_dir, one JSON file per endpoint.
+    """
+    os.makedirs(session_dir, exist_ok=True)
+    for endpoint in (*TIME_FIELDS, 'drivers'):
+        response = requests.get(f'{OPENF1_URL}/{endpoint}?session_key={session_key}')
+        logging.info(f"Fetching {endpoint} for session key {session_key} from {response.url}")
+        response.raise_for_status()
+        with open(os.path.join(session_dir, f"{endpoint}.json"), 'w', encoding='utf-8') as f:
+            json.dump(response.json(), f)
+
+
+def load_session(session_dir: str):
+    """
+    Loads a recorded session from the JSON files written by record_session.
+
+    Missing streams are skipped, so a directory with only race_control.json
+    replays just the safety car messages.
+
+    Returns:
+        tuple: (drivers keyed by driver_number, [(moment, stream, record), ...] in time order)
+    """
+    streams = []
+    for stream, time_field in TIME_FIELDS.items():
+        path = os.path.join(session_dir, f"{stream}.json")
+        try:
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            logging.warning(f"No {stream} recording in {session_dir}")
+            continue
+        rows = [(record_time(stream, record), stream, record) for record in data if record.get(time_field)]
+        rows.sort(key=itemgetter(0))
+        streams.append(rows)
+
+    try:
+        with open(os.path.join(session_dir, 'drivers.json'), encoding='utf-8') as f:
+            drivers = {driver['driver_number']: driver for driver in json.load(f)}
+    except FileNotFoundError:
+        drivers = {}
+
+    # Each stream is already sorted, a k-way merge keeps the whole session in order
+    return drivers, list(heapq.merge(*streams, key=itemgetter(0)))
+
+
+class VirtualClock:
+    """
+    Session time that runs speed times faster than the wall clock.
+
+    Starts at the given session moment when created.
+    """
+
+    def __init__(self, start, speed=1.0, monotonic=time.monotonic, sleep=time.sleep):
+        """
+        Args:
+            start: Session time at the moment the clock is created
+            speed: Session seconds per wall-clock second, between MIN_SPEED and MAX_SPEED
+            monotonic: Wall-clock source, replaceable in tests
+            sleep: Sleep function, replaceable in tests
+        """
+        if not MIN_SPEED <= speed <= MAX_SPEED:
+            raise ValueError(f"Replay speed must be between {MIN_SPEED}x and {MAX_SPEED}x, got {speed}")
+        self.start = start
+        self.speed = speed
+        self._monotonic = monotonic
+        self._sleep = sleep
+        self._wall_start = monotonic()
+
+    def now(self):
+        return self.start + timedelta(seconds=(self._monotonic() - self._wall_start) * self.speed)
+
+    def wall_until(self, moment):
+        """Wall-clock seconds until the clock reaches moment, negative once it has passed."""
+        return (moment - self.start).total_seconds() / self.speed - (self._monotonic() - self._wall_start)
+
+    def sleep_until(self, moment):
+        delay = self.wall_until(moment)
+        if delay > 0:
+            self._sleep(delay)
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(int(round(fraction * (len(ordered) - 1))), len(ordered) - 1)]
+
+
+@dataclass(slots=True)
+class ReplayReport:
+    """Throughput and detection latency of one replay."""
+    speed: float
+    events: int = 0
+    elapsed: float = 0.0
+    session_seconds: float = 0.0
+    alerts: Counter = field(default_factory=Counter)
+    latencies: List[float] = field(default_factory=list)
+    max_lag: float = 0.0
+
+    @property
+    def events_per_second(self):
+        return self.events / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def latency_p50(self):
+        return percentile(self.latencies, 0.50)
+
+    @property
+    def latency_p99(self):
+        return percentile(self.latencies, 0.99)
+
+    def summary(self):
+        return {
+            'speed': self.speed,
+            'events': self.events,
+            'elapsed': round(self.elapsed, 3),
+            'session_seconds': round(self.session_seconds, 1),
+            'events_per_second': round(self.events_per_second, 1),
+            'alerts': dict(self.alerts),
+            'latency_p50_ms': round(self.latency_p50 * 1000, 2),
+            'latency_p99_ms': round(self.latency_p99 * 1000, 2),
+            'max_lag_ms': round(self.max_lag * 1000, 2),
+        }
+
+
+def replay(records, pipeline, speed=1.0, clock=None):
+    """
+    Streams recorded records through a LiveUpdatePipeline on a virtual clock.
+
+    Each record is released when the virtual clock reaches its timestamp.
+    Detection latency is the wall time from that moment until the pipeline
+    (detection plus notification) has handled the alert; lag is how late a
+    record was released because the pipeline fell behind the clock.
+
+    Args:
+        records: (moment, stream, record) tuples in time order, as from load_session
+        pipeline: LiveUpdatePipeline to feed
+        speed: Replay speed, between MIN_SPEED and MAX_SPEED times real time
+
+    Returns:
+        ReplayReport: Events/sec, alerts per kind and latency percentiles
+    """
+    report = ReplayReport(speed=speed)
+    if not records:
+        return report
+
+    clock = clock or VirtualClock(records[0][0], speed)
+    wall_start = time.monotonic()
+    for moment, stream, record in records:
+        clock.sleep_until(moment)
+        report.max_lag = max(report.max_lag, -clock.wall_until(moment))
+
+        alerts = pipeline.process(stream, record, moment)
+        if alerts:
+            latency = max(0.0, -clock.wall_until(moment))
+            for alert in alerts:
+                report.alerts[alert.kind] += 1
+                report.latencies.append(latency)
+        report.events += 1
+
+    report.elapsed = time.monotonic() - wall_start
+    report.session_seconds = (records[-1][0] - records[0][0]).total_seconds()
+    logging.info(f"Replayed {report.events} records in {report.elapsed:.2f} s at {speed}x: "
+                 f"{report.events_per_second:.0f} events/s, alerts {dict(report.alerts)}")
+    return report
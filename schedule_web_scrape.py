@@ -1,4 +1,5 @@
 import errno
+import hashlib
 import logging
 import pprint
 import re
@@ -10,16 +11,61 @@ from datetime import datetime
 from dynaconf import settings
 from bs4 import BeautifulSoup
 
+from cache import load_json, save_json
+from circuit_metadata import load_circuit_metadata
+from fetch_scheduler import formula1_fetcher
+from models import RaceWeekend, SessionEvent, circuit_slug
+
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 
 
-def get_race_urls():
+def page_cache_name(url: str):
+    """
+    Returns the cache entry name for a page (e.g., 'page_3f2a9c1d5e6b7a80.json').
+    """
+    return f"page_{hashlib.sha1(url.encode('utf-8')).hexdigest()[:16]}.json"
+
+
+def fetch_page(url: str, refresh: bool = False, max_age=None):
+    """
+    Returns a formula1.com page's HTML, from the page cache while it is fresh.
+
+    Cached pages expire after PAGE_CACHE_HOURS unless a shorter max_age is
+    given. The pre-warm job passes refresh=True ahead of a race weekend.
+
+    Args:
+        url: Page URL
+        refresh: Fetch the page even if the cached copy is fresh
+        max_age: Optional maximum age of the cached copy in seconds
+
+    Raises:
+        requests.RequestException: If the page has to be fetched and the request fails
+    """
+    name = page_cache_name(url)
+    if max_age is None:
+        max_age = float(settings.get('PAGE_CACHE_HOURS', 12)) * 3600
+    if not refresh:
+        cached = load_json(name, max_age=max_age)
+        if cached is not None:
+            return cached['content']
+
+    response = formula1_fetcher.fetch(url)  # Rate limited, retries throttled responses
+    response.raise_for_status()  # Will raise an exception for 4XX/5XX responses
+    content = response.content.decode('utf-8', errors='replace')
+    save_json(name, {'url': url, 'content': content})
+    return content
+
+
+def get_race_urls(refresh: bool = False):
     """
     Scrapes the Formula 1 website to get URLs for all races in the 2025 season.
 
+    Args:
+        refresh: Fetch the season page even if the cached copy is fresh
+
     Returns:
         list: A list of URLs for each race in the 2025 F1 season.
     """
@@ -27,8 +73,7 @@ def get_race_urls():
 
     # Add error handling for the request
     try:
-        response = requests.get(url, timeout=10)  # Added timeout for better error handling
-        response.raise_for_status()  # Will raise an exception for 4XX/5XX responses
+        content = fetch_page(url, refresh)
     except requests.RequestException as e:
         logging.error(f"Error fetching F1 race data: {e}")
         return []  # Return empty list instead of potentially undefined variable
@@ -36,7 +81,7 @@ def get_race_urls():
     race_urls = []
 
     # Parse the HTML content
-    soup = BeautifulSoup(response.content, "html.parser")
+    soup = BeautifulSoup(content, "html.parser")
 
     # Find race links by their CSS class
     # This targets the clickable race card elements on the F1 website
@@ -57,6 +102,27 @@ def get_race_urls():
     return race_urls
 
 
+# Validation patterns, compiled once
+YEAR_PATTERN = re.compile(r"\d{4}")
+MONTH_PATTERN = re.compile(r"[a-zA-Z]{3}")
+DAY_PATTERN = re.compile(r"\d{1,2}")
+TIME_PATTERN = re.compile(r"(\d{2}):(\d{2})")
+
+MONTHS = {name: number for number, name in enumerate(
+    ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"], start=1)}
+
+# (tag name, class attribute) of each field on a session card; None matches any tag
+SESSION_FIELDS = {
+    ("span", "f1-heading tracking-normal text-fs-18px leading-tight normal-case font-bold non-italic f1-heading__body font-formulaOne block mb-xxs"): "event",
+    ("p", "f1-heading tracking-normal text-fs-18px leading-none normal-case font-normal non-italic f1-heading__body font-formulaOne"): "day",
+    (None, "rounded-xl py-0.5 px-2 mt-1 leading-none inline-block bg-lightGray text-grey-70"): "month",
+    ("p", "f1-text font-titillium tracking-normal font-normal non-italic normal-case leading-none f1-text__micro text-fs-15px"): "time",
+}
+SESSION_FIELD_NAMES = ("event", "day", "month", "time")
+# Element wrapping one session card
+SESSION_CARD_TAG = "li"
+
+
 def parse_date(year: str, month: str, day: str, time: str):
     """
     Converts date strings into a datetime object after validation.
@@ -73,101 +139,118 @@ def parse_date(year: str, month: str, day: str, time: str):
     Raises:
         ValueError: If any component fails validation
     """
-    # Define validation patterns and format codes
-    patterns = {
-        "year": (r"\d{4}", "%Y"),
-        "month": (r"[a-zA-Z]{3}", "%b"),
-        "day": (r"\d{1,2}", "%d"),
-        "time": (r"\d{2}:\d{2}", "%H:%M")
-    }
-
-    # Store validated components
-    matches = {}
-
-    # Validate each component
-    for param_name, param_value in [("year", str(year)), ("month", month), ("day", day), ("time", time)]:
-        regex_pattern, _ = patterns[param_name]
-        match = re.search(regex_pattern, param_value)
-        temp = day
-
-        if not match:
-            raise ValueError(f"Invalid {param_name} value: {param_value}")
-
-        matches[param_name] = match.group()
-
-    # Build format string for datetime parsing
-    date_format = " ".join([patterns[p][1] for p in ["year", "month", "day", "time"]])
+    year_match = YEAR_PATTERN.search(str(year))
+    if not year_match:
+        raise ValueError(f"Invalid year value: {year}")
+    month_match = MONTH_PATTERN.search(month)
+    if not month_match or month_match.group().lower() not in MONTHS:
+        raise ValueError(f"Invalid month value: {month}")
+    day_match = DAY_PATTERN.search(day)
+    if not day_match:
+        raise ValueError(f"Invalid day value: {day}")
+    time_match = TIME_PATTERN.search(time)
+    if not time_match:
+        raise ValueError(f"Invalid time value: {time}")
+
+    # datetime() validates ranges (e.g. 31 Feb, 25:00) the same way strptime did
+    return datetime(int(year_match.group()), MONTHS[month_match.group().lower()], int(day_match.group()),
+                    int(time_match.group(1)), int(time_match.group(2)))
+
+
+def extract_sessions(soup):
+    """
+    Extracts (event, day, month, time) tuples from a race page in one document pass.
 
-    # Combine components into single string
-    date_string = f"{matches['year']} {matches['month']} {matches['day']} {matches['time']}"
+    Fields are grouped under the session card (<li>) that contains them, so a
+    card missing a field is dropped on its own instead of borrowing fields
+    from its neighbours.
 
-    # Parse and return datetime object
-    return datetime.strptime(date_string, date_format)
+    Returns:
+        list: Aligned (event, day, month, time) string tuples, in page order
+    """
+    def session_field(tag):
+        classes = " ".join(tag.get("class", ()))
+        return (tag.name, classes) in SESSION_FIELDS or (None, classes) in SESSION_FIELDS
+
+    # Keyed by the card element's id() so cards keep their page order
+    cards = {}
+    for tag in soup.find_all(session_field):
+        classes = " ".join(tag.get("class", ()))
+        field = SESSION_FIELDS.get((tag.name, classes)) or SESSION_FIELDS[(None, classes)]
+        card = tag.find_parent(SESSION_CARD_TAG) or tag.parent
+        cards.setdefault(id(card), {}).setdefault(field, tag.get_text(strip=True))
+
+    sessions = []
+    for card in cards.values():
+        if len(card) == len(SESSION_FIELD_NAMES):
+            sessions.append(tuple(card[name] for name in SESSION_FIELD_NAMES))
+        else:
+            logging.warning(f"Incomplete session card, skipping: {card}")
+    return sessions
+
+
+def parse_sessions(year, rows):
+    """
+    Validates and converts extracted session rows in one batch.
 
+    Args:
+        year: Season year
+        rows: (event, day, month, time) tuples from extract_sessions
 
-def scrape_dates(race_url: str):
-    time_response = requests.get(race_url)
-    time_response.raise_for_status()
+    Returns:
+        list: SessionEvent objects with UTC start times, invalid rows are skipped
+    """
+    sessions = []
+    for event, day, month, time in rows:
+        try:
+            start = parse_date(year, month, day, time)
+        except ValueError as e:
+            logging.warning(f"Error parsing date for {event}: {e}, skipping")
+            continue
+        # Session times are treated as UTC throughout the pipeline
+        sessions.append(SessionEvent(event, start.replace(tzinfo=pytz.UTC)))
+    return sessions
 
-    time_soup = BeautifulSoup(time_response.content, "html.parser")
 
-    all_days = time_soup.find_all("p",
-                                  class_="f1-heading tracking-normal text-fs-18px leading-none normal-case font-normal non-italic f1-heading__body font-formulaOne")
-    all_months = time_soup.find_all(
-        class_="rounded-xl py-0.5 px-2 mt-1 leading-none inline-block bg-lightGray text-grey-70")
-    all_times = time_soup.find_all("p",
-                                   class_="f1-text font-titillium tracking-normal font-normal non-italic normal-case leading-none f1-text__micro text-fs-15px")
+def parse_schedule_page(content, year):
+    soup = BeautifulSoup(content, "html.parser")
+    return parse_sessions(year, extract_sessions(soup))
 
-    events = time_soup.find_all("span",
-                                class_="f1-heading tracking-normal text-fs-18px leading-tight normal-case font-bold non-italic f1-heading__body font-formulaOne block mb-xxs")
 
-    event_types = []
+def scrape_dates(race_url: str, refresh: bool = False, max_age=None):
+    content = fetch_page(race_url, refresh, max_age)
 
-    for index in range(len(events)):
-        try:
-            time = parse_date(settings['YEAR'], all_months[index].text.strip(), all_days[index].text.strip(),
-                              all_times[index].text.strip())
-            event_info = {
-                "event": events[index].text.strip(),
-                "date": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
-            }
-            event_types.append(event_info)
-        except ValueError as e:
-            logging.warning(f"Error parsing date: {e}, skipping")
-            if not event_types:
-                return None
-
-    return event_types
-
-
-def scrape_laps(race_url: str):
-    lap_response = requests.get(race_url + "/circuit")
-    lap_response.raise_for_status()
-    lap_soup = BeautifulSoup(lap_response.content, "html.parser")
-    lap_data = lap_soup.find_all("h2",
-                                 class_="f1-heading tracking-normal text-fs-22px tablet:text-fs-32px leading-tight normal-case font-bold non-italic f1-heading__body font-formulaOne")
-    lap_text = lap_data[1].text.strip()
-    if not lap_text.isdigit():
-        logging.warning(f"Laps is not a number: {lap_text}, skipping")
+    sessions = parse_schedule_page(content, settings['YEAR'])
+    if not sessions:
+        logging.warning(f"No sessions found on {race_url}")
         return None
-    laps = int(lap_data[1].text.strip())
+    return sessions
 
-    if 100 < laps < 30:
-        logging.warning(f"Laps is out of range: {laps}, skipping")
-        return None
 
-    logging.info(f"Found {laps} laps")
-    return laps
+def scrape_race_data(refresh: bool = False, race_page_max_age=None):
+    """
+    Scrapes every race weekend of the season.
 
+    Args:
+        refresh: Fetch the season and race pages even if the cached copies are fresh
+        race_page_max_age: Optional maximum age in seconds of cached race pages,
+            which hold the session times. The scheduler keeps this short so a
+            moved session is seen on its next run.
 
-def scrape_race_data():
+    Returns:
+        list: RaceWeekend objects for the races with sessions
+    """
     race_info = []
-    race_urls = get_race_urls()
-    for url in race_urls:
-        race_schedules = scrape_dates(url)
-        race_laps = scrape_laps(url)
+    race_urls = get_race_urls(refresh)
+    # Circuit pages are only scraped when the season's store is missing
+    circuits = load_circuit_metadata(race_urls)
+
+    # Race pages come from the page cache, or are fetched concurrently within formula1.com's adaptive limits
+    all_schedules = formula1_fetcher.fetch_all(race_urls, lambda url: scrape_dates(url, refresh, race_page_max_age))
+    for url, race_schedules in zip(race_urls, all_schedules):
+        circuit = circuits.get(circuit_slug(url), {})
         if race_schedules:
-            race_info.append({"url": url, "dates": race_schedules, "laps": race_laps})
+            race_info.append(RaceWeekend(url, race_schedules, circuit.get("laps")))
 
     logging.info(f"Found {len(race_info)} grand prix data")
     pprint.pprint(race_info)
@@ -0,0 +1,187 @@
+import json
+import logging
+import os
+from collections import defaultdict
+
+from dynaconf import settings
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger()
+
+# Preference fields a subscriber can filter on, None/empty means "everything"
+FIELDS = ('event_types', 'drivers', 'meetings')
+
+# Longest prefix first so 'Sprint Qualifying' is not matched as 'Sprint'
+EVENT_TYPE_PREFIXES = (
+    ('sprint qualifying', 'sprint_qualifying'),
+    ('sprint shootout', 'sprint_qualifying'),
+    ('sprint', 'sprint'),
+    ('qualifying', 'qualifying'),
+    ('practice', 'practice'),
+    ('race', 'race'),
+    ('grand prix', 'race'),
+)
+
+
+def event_type(event_name: str):
+    """
+    Normalises a session name to an event type (e.g., 'Practice 2' -> 'practice').
+    """
+    name = event_name.strip().lower()
+    for prefix, normalized in EVENT_TYPE_PREFIXES:
+        if name.startswith(prefix):
+            return normalized
+    return name.replace(' ', '_')
+
+
+class SubscriberStore:
+    """
+    Subscriber preferences with an inverted index per preference field.
+
+    Each field maps a value (event type, driver number or meeting slug) to the
+    set of subscriber ids that asked for it. Subscribers with no filter on a
+    field are kept in a wildcard set, the rest in a filtered set. Matching
+    combines one candidate set per field with C-level set operations instead
+    of scanning every subscriber.
+    """
+
+    def __init__(self):
+        self.subscribers = {}
+        self._index = {field: defaultdict(set) for field in FIELDS}
+        self._wildcard = {field: set() for field in FIELDS}
+        self._filtered = {field: set() for field in FIELDS}
+
+    def __len__(self):
+        return len(self.subscribers)
+
+    def add(self, subscriber_id, user_key, event_types=None, drivers=None, meetings=None, **extra):
+        if subscriber_id in self.subscribers:
+            self.remove(subscriber_id)
+
+        record = dict(extra, id=subscriber_id, user_key=user_key,
+                      event_types=sorted(set(event_types or [])),
+                      drivers=sorted(set(drivers or [])),
+                      meetings=sorted(set(meetings or [])))
+        self.subscribers[subscriber_id] = record
+
+        for field in FIELDS:
+            if record[field]:
+                self._filtered[field].add(subscriber_id)
+                for value in record[field]:
+                    self._index[field][value].add(subscriber_id)
+            else:
+                self._wildcard[field].add(subscriber_id)
+
+    def remove(self, subscriber_id):
+        record = self.subscribers.pop(subscriber_id, None)
+        if record is None:
+            return
+        for field in FIELDS:
+            self._wildcard[field].discard(subscriber_id)
+            self._filtered[field].discard(subscriber_id)
+            for value in record[field]:
+                self._index[field][value].discard(subscriber_id)
+                if not self._index[field][value]:
+                    del self._index[field][value]
+
+    def match(self, event_type=None, driver_number=None, meeting=None):
+        """
+        Returns the ids of subscribers whose preferences accept the event.
+
+        Fields passed as None do not constrain the match, so a session start
+        (no driver) reaches subscribers that only follow specific drivers.
+        """
+        constraints = [
+            (field, value)
+            for field, value in zip(FIELDS, (event_type, driver_number, meeting))
+            if value is not None
+        ]
+        if not constraints:
+            return set(self.subscribers)
+
+        # Start from the smallest candidate set
+        def candidate_size(constraint):
+            field, value = constraint
+            return len(self._index[field].get(value, ())) + len(self._wildcard[field])
+
+        constraints.sort(key=candidate_size)
+        field, value = constraints[0]
+        candidates = self._index[field].get(value, set()) | self._wildcard[field]
+
+        for field, value in constraints[1:]:
+            # Keep candidates without a filter on this field, plus those whose filter includes value
+            specific = self._index[field].get(value, set())
+            candidates = (candidates - self._filtered[field]) | (candidates & specific)
+            if not candidates:
+                break
+        return candidates
+
+    def user_keys(self, subscriber_ids):
+        return [self.subscribers[sid]['user_key'] for sid in subscriber_ids]
+
+    def deliveries(self, subscriber_ids):
+        """
+        Returns the (channel, address) pairs to notify for the subscribers.
+
+        A subscriber's 'channels' maps a channel name to an address, e.g.
+        {"pushover": "<user key>", "webhook": "https://..."}. Without it the
+        subscriber is notified on Pushover at their user_key.
+        """
+        deliveries = []
+        for sid in subscriber_ids:
+            record = self.subscribers[sid]
+            channels = record.get('channels') or {'pushover': record['user_key']}
+            deliveries.extend((channel, address) for channel, address in channels.items() if address)
+        return deliveries
+
+    def to_list(self):
+        return list(self.subscribers.values())
+
+    @classmethod
+    def from_list(cls, records):
+        store = cls()
+        for record in records:
+            store.add(record['id'], **{key: value for key, value in record.items() if key != 'id'})
+        return store
+
+
+# Loaded once per Lambda container
+_store = None
+
+
+def load_subscribers(path=None):
+    """
+    Loads the subscriber store from the JSON file configured as SUBSCRIBERS_FILE.
+
+    Returns an empty store if the file does not exist, in which case callers
+    fall back to the single PUSHOVER_USER_KEY. Only the configured file is
+    kept for the container; a store loaded from an explicit path is not.
+    """
+    global _store
+
+    path_given = path is not None
+    if _store is not None and not path_given:
+        return _store
+
+    path = path or settings.get('SUBSCRIBERS_FILE', 'subscribers.json')
+    try:
+        with open(path, encoding='utf-8') as f:
+            store = SubscriberStore.from_list(json.load(f))
+        logger.info(f"Loaded {len(store)} subscribers from {path}")
+    except FileNotFoundError:
+        store = SubscriberStore()
+    except (OSError, ValueError, KeyError) as e:
+        logger.error(f"Error loading subscribers from {path}: {e}")
+        store = SubscriberStore()
+
+    if not path_given:
+        _store = store
+    return store
+
+
+def save_subscribers(store, path=None):
+    path = path or settings.get('SUBSCRIBERS_FILE', 'subscribers.json')
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(store.to_list(), f)
+    os.replace(tmp_path, path)
@@ -0,0 +1,19 @@
+import pytest
+
+import cache
+import delivery
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache(tmp_path, monkeypatch):
+    """Keep every test's disk cache in its own temporary directory"""
+    cache_dir = tmp_path / 'cache'
+    monkeypatch.setattr(cache, 'cache_path', lambda name: str(cache_dir / name))
+    return cache_dir
+
+
+@pytest.fixture(autouse=True)
+def fresh_delivery_sinks():
+    """Drop sinks registered by a test so the next one starts from the built-in channels"""
+    yield
+    delivery.reset_sinks()
@@ -0,0 +1,157 @@
+import pytest
+from unittest.mock import patch, MagicMock
+
+import circuit_metadata
+from circuit_metadata import (circuit_slug, load_circuit_metadata, parse_circuit_page, update_circuit_metadata,
+                              validate_circuit)
+
+STAT_CLASS = "f1-heading tracking-normal text-fs-22px tablet:text-fs-32px leading-tight normal-case font-bold non-italic f1-heading__body font-formulaOne"
+
+
+def circuit_page(*stats):
+    return "<html><body>" + "".join(f'<h2 class="{STAT_CLASS}">{stat}</h2>' for stat in stats) + "</body></html>"
+
+
+@pytest.fixture(autouse=True)
+def reset_store():
+    circuit_metadata._store = None
+    yield
+    circuit_metadata._store = None
+
+
+def test_circuit_slug():
+    assert circuit_slug('https://www.formula1.com/en/racing/2025/monaco') == 'monaco'
+    assert circuit_slug('https://www.formula1.com/en/racing/2025/great-britain/') == 'great-britain'
+
+
+def test_parse_circuit_page():
+    """Test laps, length and lap record are extracted from the stats headings"""
+    page = circuit_page('1950', '78', '3.337km', '260.286km', '1:12.909<span>Lewis Hamilton (2021)</span>')
+
+    assert parse_circuit_page(page) == {'laps': 78, 'length_km': 3.337, 'lap_record': '1:12.909'}
+
+
+def test_parse_circuit_page_without_lap_record():
+    page = circuit_page('2026', '57', '5.412km')
+
+    assert parse_circuit_page(page)['lap_record'] is None
+
+
+@pytest.mark.parametrize('laps, length', [(12, 5.0), (150, 5.0), (57, 0.5), (57, 12.0)])
+def test_validate_circuit_out_of_range(laps, length):
+    """Test out of range laps and lengths are rejected"""
+    with pytest.raises(ValueError):
+        validate_circuit({'laps': laps, 'length_km': length, 'lap_record': None})
+
+
+def test_parse_circuit_page_not_a_number():
+    with pytest.raises(ValueError):
+        parse_circuit_page(circuit_page('1950', 'TBC', '3.337km'))
+
+
+def test_load_uses_stored_season_without_scraping():
+    """Test the hot path never touches the circuit pages once the season is stored"""
+    store = {'season': 2025, 'circuits': {'monaco': {'laps': 78, 'length_km': 3.337, 'lap_record': None}}}
+    with patch('circuit_metadata.settings', {'YEAR': 2025}), \
+            patch('circuit_metadata.load_json', return_value=store), \
+            patch('circuit_metadata.requests.get') as mock_get:
+        circuits = load_circuit_metadata(['https://www.formula1.com/en/racing/2025/monaco'])
+        load_circuit_metadata(['https://www.formula1.com/en/racing/2025/monaco'])
+
+    assert circuits['monaco']['laps'] == 78
+    mock_get.assert_not_called()
+
+
+def test_load_refreshes_for_new_season():
+    """Test circuit pages are scraped and persisted when the stored season is stale"""
+    response = MagicMock(status_code=200, headers={})
+    response.content = circuit_page('1950', '78', '3.337km')
+    with patch('circuit_metadata.settings', {'YEAR': 2026}), \
+            patch('circuit_metadata.load_json', return_value={'season': 2025, 'circuits': {}}), \
+            patch('circuit_metadata._load_bundled', return_value=None), \
+            patch('circuit_metadata.save_json') as mock_save, \
+            patch('requests.get', return_value=response) as mock_get:
+        circuits = load_circuit_metadata(['https://www.formula1.com/en/racing/2026/monaco'])
+
+    mock_get.assert_called_once_with('https://www.formula1.com/en/racing/2026/monaco/circuit', timeout=10)
+    assert circuits == {'monaco': {'laps': 78, 'length_km': 3.337, 'lap_record': None}}
+    assert mock_save.call_args[0][1]['season'] == 2026
+
+
+def test_update_circuit_metadata_merges_one_circuit():
+    """Test re-scraping one circuit keeps every other stored circuit"""
+    store = {'season': 2025, 'circuits': {'monza': {'laps': 53, 'length_km': 5.793, 'lap_record': None}}}
+    response = MagicMock(status_code=200, headers={})
+    response.content = circuit_page('1950', '78', '3.337km')
+    with patch('circuit_metadata.settings', {'YEAR': 2025}), \
+            patch('circuit_metadata.load_json', return_value=store), \
+            patch('circuit_metadata._load_bundled', return_value=None), \
+            patch('circuit_metadata.save_json') as mock_save, \
+            patch('requests.get', return_value=response):
+        circuit = update_circuit_metadata('https://www.formula1.com/en/racing/2025/monaco')
+
+    assert circuit['laps'] == 78
+    assert set(mock_save.call_args[0][1]['circuits']) == {'monaco', 'monza'}
+
+
+def test_bundled_store_covers_season_without_scraping():
+    """Test a cold start with no disk cache reads the bundled store instead of scraping"""
+    with patch('circuit_metadata.settings', {'YEAR': 2025}), \
+            patch('circuit_metadata.requests.get') as mock_get:
+        circuits = load_circuit_metadata(['https://www.formula1.com/en/racing/2025/monaco',
+                                          'https://www.formula1.com/en/racing/2025/las-vegas'])
+
+    assert circuits['monaco']['laps'] == 78
+    assert circuits['las-vegas']['laps'] == 50
+    mock_get.assert_not_called()
+
+
+def test_load_scrapes_only_missing_circuits():
+    """Test a race added mid-season is scraped without re-scraping the stored circuits"""
+    store = {'season': 2025, 'circuits': {'monza': {'laps': 53, 'length_km': 5.793, 'lap_record': None}}}
+    response = MagicMock(status_code=200, headers={})
+    response.content = circuit_page('2026', '57', '5.474km')
+    with patch('circuit_metadata.settings', {'YEAR': 2025}), \
+            patch('circuit_metadata.load_json', return_value=store), \
+            patch('circuit_metadata._load_bundled', return_value=None), \
+            patch('circuit_metadata.save_json') as mock_save, \
+            patch('requests.get', return_value=response) as mock_get:
+        circuits = load_circuit_metadata(['https://www.formula1.com/en/racing/2025/monza',
+                                          'https://www.formula1.com/en/racing/2025/madrid'])
+
+    mock_get.assert_called_once_with('https://www.formula1.com/en/racing/2025/madrid/circuit', timeout=10)
+    assert set(circuits) == {'monza', 'madrid'}
+    assert set(mock_save.call_args[0][1]['circuits']) == {'monza', 'madrid'}
+
+
+def test_failed_circuit_page_is_not_retried_on_the_scheduling_path():
+    """Test a circuit page that fails is remembered for the season instead of being scraped on every run"""
+    response = MagicMock(status_code=200, headers={})
+    response.content = circuit_page('1950', 'TBC', '3.337km')
+    with patch('circuit_metadata.settings', {'YEAR': 2025}), \
+            patch('circuit_metadata.load_json', return_value=None), \
+            patch('circuit_metadata._load_bundled', return_value=None), \
+            patch('circuit_metadata.save_json') as mock_save, \
+            patch('requests.get', return_value=response) as mock_get:
+        assert load_circuit_metadata(['https://www.formula1.com/en/racing/2025/monaco']) == {}
+        load_circuit_metadata(['https://www.formula1.com/en/racing/2025/monaco'])
+
+    assert mock_get.call_count == 1
+    assert mock_save.call_args[0][1]['failed'] == ['monaco']
+    assert mock_save.call_args[0][1]['circuits'] == {}
+
+
+def test_update_retries_failed_circuit():
+    """Test the pre-warm job's re-scrape stores a circuit that failed earlier in the season"""
+    store = {'season': 2025, 'circuits': {}, 'failed': ['monaco']}
+    response = MagicMock(status_code=200, headers={})
+    response.content = circuit_page('1950', '78', '3.337km')
+    with patch('circuit_metadata.settings', {'YEAR': 2025}), \
+            patch('circuit_metadata.load_json', return_value=store), \
+            patch('circuit_metadata._load_bundled', return_value=None), \
+            patch('circuit_metadata.save_json') as mock_save, \
+            patch('requests.get', return_value=response):
+        update_circuit_metadata('https://www.formula1.com/en/racing/2025/monaco')
+
+    assert mock_save.call_args[0][1]['failed'] == []
+    assert mock_save.call_args[0][1]['circuits']['monaco']['laps'] == 78
@@ -0,0 +1,101 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from unittest.mock import patch, MagicMock
+
+import requests
+
+import cli
+import offline
+
+
+def test_offline_replays_recorded_fixture(tmp_path):
+    """Test GET requests are served from a recorded fixture"""
+    url = 'https://api.openf1.org/v1/meetings?year=2025'
+    with open(offline.fixture_path('GET', url, str(tmp_path)), 'w') as f:
+        json.dump({'url': url, 'status_code': 200, 'body': '[{"meeting_key": 1}]'}, f)
+
+    with offline.fixtures(str(tmp_path)):
+        response = requests.get('https://api.openf1.org/v1/meetings', params={'year': 2025})
+
+    assert response.json() == [{'meeting_key': 1}]
+    assert requests.get.__module__ == 'requests.api'
+
+
+def test_offline_missing_fixture(tmp_path):
+    with offline.fixtures(str(tmp_path)):
+        with pytest.raises(requests.ConnectionError):
+            requests.get('https://www.formula1.com/en/racing/2025.html')
+
+
+def test_record_writes_fixture(tmp_path):
+    """Test recording stores the live response for later offline runs"""
+    live = MagicMock(status_code=200, text='<html></html>', headers={'Content-Type': 'text/html'})
+    url = 'https://www.formula1.com/en/racing/2025.html'
+    with patch('requests.get', return_value=live):
+        with offline.fixtures(str(tmp_path), record=True):
+            requests.get(url, timeout=10)
+
+    with offline.fixtures(str(tmp_path)):
+        assert requests.get(url).text == '<html></html>'
+
+
+def test_offline_never_posts(tmp_path):
+    with offline.fixtures(str(tmp_path)):
+        assert requests.post('https://api.pushover.net/1/messages.json', data={}).status_code == 200
+
+
+def test_cli_send_with_profile_and_memory(capsys):
+    """Test a subcommand runs under the profiler and memory tracer"""
+    with patch('race_notification_sender.send_notification', return_value=200):
+        result = cli.main(['--profile', '--trace-memory', '--top', '5', 'send'])
+
+    assert result['statusCode'] == 200
+    output = capsys.readouterr().out
+    assert 'function calls' in output
+    assert 'Memory: current' in output
+
+
+def test_cli_requires_subcommand():
+    with pytest.raises(SystemExit):
+        cli.main(['--profile'])
+
+
+def parse_in_worker():
+    return sum(len(str(index)) for index in range(200000))
+
+
+@pytest.mark.parametrize('mode, expected', [('cprofile', 'parse_in_worker'), ('sample', 'test_cli.py')])
+def test_profiled_sees_pool_threads(mode, expected, capsys):
+    """Test work done in pool threads, as in fetch_all and dispatch, shows up in the profile"""
+    with cli.profiled(mode, 50):
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            list(executor.map(lambda _: parse_in_worker(), range(4)))
+
+    assert expected in capsys.readouterr().out
+
+
+def test_cli_results():
+    with patch('main.send_final_results', return_value=200) as mock_results:
+        assert cli.main(['results', '1256', '--session', 'Sprint']) == 200
+
+    mock_results.assert_called_once_with(1256, 'Sprint')
+
+
+def test_fixtures_bypass_warm_page_cache(tmp_path):
+    """Test a warm page cache neither stops a recording nor stands in for the fixtures offline"""
+    from cache import save_json
+    from schedule_web_scrape import fetch_page, page_cache_name
+
+    url = 'https://www.formula1.com/en/racing/2025.html'
+    save_json(page_cache_name(url), {'url': url, 'content': 'cached page'})
+    live = MagicMock(status_code=200, text='<html>live</html>', content=b'<html>live</html>', headers={})
+    with patch('requests.get', return_value=live):
+        with offline.fixtures(str(tmp_path), record=True):
+            assert fetch_page(url) == '<html>live</html>'
+
+    with offline.fixtures(str(tmp_path / 'empty')):
+        with pytest.raises(requests.ConnectionError):
+            fetch_page(url)
+
+    assert fetch_page(url) == 'cached page'
@@ -0,0 +1,165 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import MagicMock, patch
+
+import pytest
+from botocore.exceptions import ClientError
+
+import delivery
+from delivery import PushoverSink, SnsSink, WebhookSink, dispatch, get_sink, register_sink
+
+
+class ChannelServer(ThreadingHTTPServer):
+    """Local stand-in for Pushover and webhook endpoints, with a slow path"""
+    daemon_threads = True
+
+    def __init__(self, slow_latency=1.0):
+        super().__init__(('127.0.0.1', 0), ChannelHandler)
+        self.slow_latency = slow_latency
+        self.lock = threading.Lock()
+        self.received = []
+        self.client_ports = set()
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.server_address[1]}{path}"
+
+
+class ChannelHandler(BaseHTTPRequestHandler):
+    # Keep-alive, so pooled connections are reused
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0))).decode('utf-8')
+        if self.path.startswith('/slow'):
+            time.sleep(self.server.slow_latency)
+        with self.server.lock:
+            self.server.received.append((self.path, body, time.monotonic()))
+            self.server.client_ports.add(self.client_address[1])
+
+        self.send_response(200)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'{}')
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = ChannelServer()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def pushover_settings(server):
+    with patch('delivery.settings', {'PUSHOVER_TOKEN': 'token', 'PUSHOVER_URL': server.url('/1/messages.json')}):
+        yield
+
+
+def test_webhook_posts_json(server):
+    sink = WebhookSink(timeout=1)
+
+    assert sink.send("Lights out", "F1", server.url('/hook')) == 200
+    path, body, _ = server.received[0]
+    assert path == '/hook'
+    assert json.loads(body) == {'title': 'F1', 'message': 'Lights out'}
+
+
+def test_slow_channel_does_not_delay_others(server, pushover_settings):
+    """Test a webhook that outlives its timeout is reported as 504 without holding up Pushover"""
+    register_sink(PushoverSink(timeout=1))
+    register_sink(WebhookSink(timeout=0.2))
+
+    start = time.monotonic()
+    statuses = dispatch("Lights out", "F1", [('webhook', server.url('/slow')), ('pushover', 'user-1'),
+                                             ('pushover', 'user-2')])
+    elapsed = time.monotonic() - start
+
+    assert statuses == [504, 200, 200]
+    assert elapsed < server.slow_latency
+    pushover_done = [received for path, _, received in server.received if path == '/1/messages.json']
+    assert len(pushover_done) == 2
+    assert max(pushover_done) - start < 0.2
+
+
+def test_pushover_connections_are_pooled(server, pushover_settings):
+    """Test many sends reuse at most one connection per worker"""
+    register_sink(PushoverSink(timeout=1, max_workers=4))
+
+    statuses = dispatch("Lights out", "F1", [('pushover', f"user-{index}") for index in range(40)])
+
+    assert statuses == [200] * 40
+    assert len(server.client_ports) <= 4
+
+
+def test_unknown_channel():
+    assert dispatch("Lights out", "F1", [('carrier-pigeon', 'loft-1')]) == [delivery.UNKNOWN_CHANNEL_STATUS]
+
+
+def test_sns_publishes_to_topic_or_phone():
+    sink = SnsSink()
+    sink._client = MagicMock()
+    sink._client.publish.return_value = {'ResponseMetadata': {'HTTPStatusCode': 200}}
+
+    assert sink.send("Lights out", "F1", 'arn:aws:sns:eu-west-1:123456789012:f1') == 200
+    assert sink.send("Lights out", "F1", '+15555550100') == 200
+
+    first, second = sink._client.publish.call_args_list
+    assert first.kwargs['TopicArn'] == 'arn:aws:sns:eu-west-1:123456789012:f1'
+    assert second.kwargs['PhoneNumber'] == '+15555550100'
+
+
+def test_sns_client_error_status():
+    sink = SnsSink()
+    sink._client = MagicMock()
+    sink._client.publish.side_effect = ClientError(
+        {'Error': {'Code': 'Throttling'}, 'ResponseMetadata': {'HTTPStatusCode': 429}}, 'Publish')
+
+    assert sink.send_safely("Lights out", "F1", '+15555550100') == 429
+
+
+def test_get_sink_uses_configured_timeout():
+    with patch('delivery.settings', {'DELIVERY_TIMEOUTS': {'webhook': 1.5}}):
+        assert get_sink('webhook').timeout == 1.5
+        assert get_sink('sns').timeout == delivery.DEFAULT_TIMEOUT_SECONDS
+
+
+def test_pushover_retries_stop_at_deadline():
+    """Test Retry-After sleeps that would outlive the channel deadline are not taken"""
+    rate_limited = MagicMock(status_code=429, text='rate limited', headers={'Retry-After': '30'})
+    sink = PushoverSink(timeout=1, deadline=10)
+    with patch('delivery.settings', {'PUSHOVER_TOKEN': 'token'}), \
+            patch.object(sink.session, 'post', return_value=rate_limited) as mock_post, \
+            patch('delivery.time.sleep') as mock_sleep:
+        assert sink.send("Lights out", "F1", 'user-1') == 429
+
+    mock_post.assert_called_once()
+    mock_sleep.assert_not_called()
+
+
+def test_queued_deliveries_are_not_cut_off_by_deadline():
+    """Test a fan-out queued behind the channel's workers for longer than its deadline is still delivered"""
+    class SlowSink(delivery.DeliverySink):
+        name = 'webhook'
+
+        def send(self, message, title, address):
+            time.sleep(0.05)
+            return 200
+
+    register_sink(SlowSink(timeout=0.05, max_workers=1, deadline=0.1))
+
+    statuses = dispatch("Lights out", "F1", [('webhook', f'https://example.com/hook/{index}') for index in range(5)])
+
+    assert statuses == [200] * 5
+
+
+def test_get_sink_uses_configured_deadline():
+    with patch('delivery.settings', {'DELIVERY_DEADLINES': {'pushover': 20}}):
+        assert get_sink('pushover').deadline == 20
+        assert get_sink('sns').deadline == delivery.DEFAULT_DEADLINE_SECONDS
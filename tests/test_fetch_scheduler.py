@@ -0,0 +1,151 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from fetch_scheduler import FetchScheduler, parse_retry_after
+
+
+class ThrottlingServer(ThreadingHTTPServer):
+    """Local stand-in for a CDN that answers 429 above a concurrency limit"""
+    daemon_threads = True
+
+    def __init__(self, max_in_flight=2, latency=0.02, retry_after='0.1', throttle_first=0):
+        super().__init__(('127.0.0.1', 0), ThrottlingHandler)
+        self.max_in_flight = max_in_flight
+        self.latency = latency
+        self.retry_after = retry_after
+        self.throttle_first = throttle_first
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.statuses = []
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.server_address[1]}{path}"
+
+
+class ThrottlingHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.in_flight += 1
+            server.peak_in_flight = max(server.peak_in_flight, server.in_flight)
+            throttled = server.in_flight > server.max_in_flight or len(server.statuses) < server.throttle_first
+            server.statuses.append(429 if throttled else 200)
+        try:
+            time.sleep(server.latency)
+            self.send_response(429 if throttled else 200)
+            if throttled:
+                self.send_header('Retry-After', server.retry_after)
+            self.send_header('Content-Length', '2')
+            self.end_headers()
+            self.wfile.write(b'ok')
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def make_server():
+    servers = []
+
+    def start(**kwargs):
+        server = ThrottlingServer(**kwargs)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_fetch_all_adapts_to_throttling(make_server):
+    """Test concurrency backs off under 429s and every page is eventually fetched"""
+    server = make_server(max_in_flight=2)
+    scheduler = FetchScheduler(rate=200, burst=8, initial_concurrency=8, max_concurrency=8,
+                               latency_target=0.05, max_retries=10)
+
+    responses = scheduler.fetch_all([server.url(f"/race/{index}") for index in range(16)])
+
+    assert [response.status_code for response in responses] == [200] * 16
+    assert 429 in server.statuses
+    host = f"127.0.0.1:{server.server_address[1]}"
+    assert scheduler.stats(host)['concurrency'] < 8
+
+
+def test_retry_after_pauses_host(make_server):
+    """Test a Retry-After response pauses the host before the retry"""
+    server = make_server(throttle_first=1, retry_after='0.3')
+    scheduler = FetchScheduler(rate=100, burst=5)
+
+    start = time.monotonic()
+    response = scheduler.fetch(server.url('/'))
+
+    assert response.status_code == 200
+    assert server.statuses == [429, 200]
+    assert time.monotonic() - start >= 0.3
+
+
+def test_additive_increase_on_success(make_server):
+    server = make_server(max_in_flight=100, latency=0)
+    scheduler = FetchScheduler(rate=50, burst=5, max_rate=100, initial_concurrency=1, max_concurrency=4)
+    host = f"127.0.0.1:{server.server_address[1]}"
+
+    for _ in range(10):
+        scheduler.fetch(server.url('/'))
+
+    stats = scheduler.stats(host)
+    assert 1 < stats['concurrency'] <= 4
+    assert stats['rate'] > 50
+
+
+def test_token_bucket_limits_rate(make_server):
+    """Test requests beyond the burst are spaced by the token bucket rate"""
+    server = make_server(max_in_flight=100, latency=0)
+    scheduler = FetchScheduler(rate=20, burst=1, max_rate=20, initial_concurrency=4)
+
+    start = time.monotonic()
+    scheduler.fetch_all([server.url('/')] * 6)
+
+    # The first request uses the burst token, the other five wait 1/20 s each
+    assert time.monotonic() - start >= 0.24
+
+
+@pytest.mark.parametrize('value, expected', [(None, None), ('', None), ('5', 5.0), ('0.5', 0.5), ('soon', None),
+                                             ('3600', 30.0), ('inf', 30.0), ('nan', None)])
+def test_parse_retry_after(value, expected):
+    assert parse_retry_after(value) == expected
+
+
+def test_parse_retry_after_http_date():
+    from email.utils import formatdate
+    assert 0 < parse_retry_after(formatdate(time.time() + 60, usegmt=True)) <= 60
+
+
+def test_parse_retry_after_distant_http_date_is_capped():
+    from email.utils import formatdate
+    assert parse_retry_after(formatdate(time.time() + 86400, usegmt=True)) == 30.0
+
+
+def test_concurrent_first_requests_share_host_state():
+    """Test threads starting together in fetch_all get the same per-host limits"""
+    scheduler = FetchScheduler()
+    barrier = threading.Barrier(8)
+
+    def host_state(_):
+        barrier.wait()
+        return scheduler._host('www.formula1.com')
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        states = list(executor.map(host_state, range(8)))
+
+    assert all(state is states[0] for state in states)
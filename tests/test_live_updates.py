@@ -0,0 +1,134 @@
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock, patch
+
+import pytest
+import pytz
+
+from live_updates import LiveAlert, LiveUpdatePipeline, neutralisation, parse_time, results_notifier, subscriber_notifier
+
+START = datetime(2025, 5, 25, 13, 0, tzinfo=pytz.UTC)
+DRIVERS = {
+    1: {'driver_number': 1, 'full_name': 'Max VERSTAPPEN', 'name_acronym': 'VER'},
+    4: {'driver_number': 4, 'full_name': 'Lando NORRIS', 'name_acronym': 'NOR'},
+}
+
+
+def at(seconds):
+    return (START + timedelta(seconds=seconds)).isoformat()
+
+
+@pytest.fixture
+def pipeline():
+    pipeline = LiveUpdatePipeline(drivers=DRIVERS)
+    pipeline.process('laps', {'date_start': at(0), 'driver_number': 1, 'lap_number': 5})
+    pipeline.process('position', {'date': at(0), 'driver_number': 1, 'position': 1})
+    pipeline.process('position', {'date': at(0), 'driver_number': 4, 'position': 2})
+    return pipeline
+
+
+def test_parse_time_defaults_to_utc():
+    assert parse_time('2025-05-25T13:00:00') == START
+    assert parse_time('2025-05-25T13:00:00Z') == START
+
+
+def test_first_positions_are_not_overtakes():
+    pipeline = LiveUpdatePipeline()
+
+    assert pipeline.process('position', {'date': at(0), 'driver_number': 1, 'position': 2}) == []
+
+
+def test_overtake(pipeline):
+    alerts = pipeline.process('position', {'date': at(10), 'driver_number': 4, 'position': 1})
+
+    assert len(alerts) == 1
+    assert alerts[0].kind == 'overtake'
+    assert alerts[0].driver_number == 4
+    assert alerts[0].title == 'F1 OVERTAKE: NOR P1'
+    assert alerts[0].message == 'Lap 5: Lando NORRIS passes Max VERSTAPPEN for P1'
+
+
+def test_overtake_reported_when_passed_car_record_arrives_first(pipeline):
+    """Test the pass is still reported when the car dropping to P2 is updated before the passer"""
+    assert pipeline.process('position', {'date': at(10), 'driver_number': 1, 'position': 2}) == []
+
+    alerts = pipeline.process('position', {'date': at(10), 'driver_number': 4, 'position': 1})
+
+    assert [alert.message for alert in alerts] == ['Lap 5: Lando NORRIS passes Max VERSTAPPEN for P1']
+
+
+def test_position_regained_by_same_car_is_not_an_overtake(pipeline):
+    pipeline.process('position', {'date': at(10), 'driver_number': 1, 'position': 3})
+
+    assert pipeline.process('position', {'date': at(20), 'driver_number': 1, 'position': 1}) == []
+
+
+def test_pass_on_car_in_pit_lane_is_not_an_overtake(pipeline):
+    """Test the leader losing P1 while pitting is not reported as an overtake"""
+    pit = pipeline.process('pit', {'date': at(5), 'driver_number': 1, 'lap_number': 5, 'pit_duration': 21.87})
+
+    assert pit[0].message == 'Lap 5: Max VERSTAPPEN pits (21.9 s)'
+    assert pipeline.process('position', {'date': at(30), 'driver_number': 4, 'position': 1}) == []
+
+
+def test_no_overtakes_under_safety_car(pipeline):
+    safety_car = pipeline.process('race_control', {'date': at(5), 'category': 'SafetyCar',
+                                                   'message': 'SAFETY CAR DEPLOYED', 'lap_number': 5})
+
+    assert [alert.title for alert in safety_car] == ['F1 SAFETY CAR']
+    assert pipeline.process('position', {'date': at(10), 'driver_number': 4, 'position': 1}) == []
+
+
+@pytest.mark.parametrize('record, current, expected', [
+    ({'category': 'SafetyCar', 'message': 'VIRTUAL SAFETY CAR DEPLOYED'}, None, 'VSC'),
+    ({'category': 'SafetyCar', 'message': 'VIRTUAL SAFETY CAR ENDING'}, 'VSC', None),
+    ({'category': 'SafetyCar', 'message': 'SAFETY CAR IN THIS LAP'}, 'SC', None),
+    ({'category': 'Flag', 'flag': 'RED', 'message': 'RED FLAG'}, 'SC', 'RED'),
+    ({'category': 'Flag', 'flag': 'GREEN', 'message': 'GREEN LIGHT - PIT EXIT OPEN'}, 'RED', None),
+    ({'category': 'Flag', 'flag': 'YELLOW', 'message': 'YELLOW IN TRACK SECTOR 4'}, None, None),
+])
+def test_neutralisation(record, current, expected):
+    assert neutralisation(record, current) == expected
+
+
+def test_safety_car_alerts_once(pipeline):
+    record = {'date': at(5), 'category': 'SafetyCar', 'message': 'SAFETY CAR DEPLOYED'}
+
+    assert len(pipeline.process('race_control', record)) == 1
+    assert pipeline.process('race_control', dict(record, date=at(6))) == []
+
+
+def test_failed_notification_does_not_stop_detection():
+    notify = MagicMock(side_effect=RuntimeError('Pushover is down'))
+    pipeline = LiveUpdatePipeline(notify=notify)
+
+    alerts = pipeline.process('pit', {'date': at(0), 'driver_number': 4, 'lap_number': 12})
+
+    assert len(alerts) == 1
+    notify.assert_called_once_with(alerts[0])
+
+
+def test_subscriber_notifier_matches_driver(pipeline):
+    alert = pipeline.process('position', {'date': at(10), 'driver_number': 4, 'position': 1})[0]
+
+    with patch('live_updates.send_to_matching', return_value=200) as mock_send:
+        subscriber_notifier('race', 'monaco')(alert)
+
+    mock_send.assert_called_once_with(alert.message, alert.title, 'race', 4, 'monaco')
+
+
+def test_chequered_flag_sends_final_results(pipeline):
+    """Test the chequered flag alerts once and triggers the final classification"""
+    notify = MagicMock()
+    on_alert = results_notifier(1256, 'Race', notify)
+    record = {'date': at(60), 'category': 'Flag', 'flag': 'CHEQUERED', 'message': 'CHEQUERED FLAG', 'lap_number': 78}
+
+    alerts = pipeline.process('race_control', record)
+    assert pipeline.process('race_control', dict(record, date=at(61))) == []
+
+    with patch('main.send_final_results', return_value=200) as mock_results:
+        on_alert(alerts[0]).join()
+        assert on_alert(LiveAlert('pit', 'F1 PIT STOP: NOR', 'Lap 5', START)) is None
+
+    assert [alert.kind for alert in alerts] == ['chequered_flag']
+    mock_results.assert_called_once_with(1256, 'Race')
+    assert notify.call_count == 2
@@ -1,6 +1,8 @@
 import pytest
+from unittest.mock import patch
 
-from main import convert_to_local_time
+import main
+from main import build_driver_lookup, convert_to_local_time, final_results_message, send_final_results
 
 def test_convert_to_local_time():
     """Test conversion of valid UTC time to local time (CST)"""
@@ -17,4 +19,151 @@ def test_convert_to_local_time_invalid_format():
 def test_send_notification():
     """Test sending notification"""
 
-    pass
\ No newline at end of file
+    pass
+
+@pytest.fixture
+def driver_data():
+    return [
+        {'driver_number': 1, 'full_name': 'Max VERSTAPPEN', 'team_name': 'Red Bull Racing'},
+        {'driver_number': 4, 'full_name': 'Lando NORRIS', 'team_name': 'McLaren'},
+        {'driver_number': 16, 'full_name': 'Charles LECLERC', 'team_name': 'Ferrari'},
+    ]
+
+
+@pytest.fixture(autouse=True)
+def clear_driver_lookups():
+    main._driver_lookups.clear()
+    yield
+    main._driver_lookups.clear()
+
+
+def test_build_driver_lookup_fetches_once(driver_data):
+    """Test the lookup table is built from a single driver request and kept in memory"""
+    with patch('main.load_json', return_value=None), \
+            patch('main.save_json') as mock_save, \
+            patch('main.get_driver_data', return_value=driver_data) as mock_get:
+        first = build_driver_lookup(1256)
+        second = build_driver_lookup(1256)
+
+    assert first is second
+    assert first[4]['full_name'] == 'Lando NORRIS'
+    mock_get.assert_called_once_with(1256)
+    mock_save.assert_called_once()
+
+
+def test_build_driver_lookup_from_disk(driver_data):
+    """Test the lookup table is loaded from disk with integer driver numbers"""
+    cached = {str(driver['driver_number']): driver for driver in driver_data}
+    with patch('main.load_json', return_value=cached), \
+            patch('main.get_driver_data') as mock_get:
+        lookup = build_driver_lookup(1256)
+
+    assert lookup[16]['team_name'] == 'Ferrari'
+    mock_get.assert_not_called()
+
+
+def test_final_results_message(driver_data):
+    """Test results are joined against the lookup table and ordered by position"""
+    lookup = {driver['driver_number']: driver for driver in driver_data}
+    session_data = {'country_name': 'Monaco', 'session_name': 'Race'}
+    results = [
+        {'driver_number': 16, 'position': 2},
+        {'driver_number': 1, 'position': None, 'dnf': True},
+        {'driver_number': 4, 'position': 1},
+    ]
+
+    message = final_results_message(session_data, results, lookup)
+
+    assert message.splitlines() == [
+        'Monaco Race Results',
+        'P1 Lando NORRIS (McLaren)',
+        'P2 Charles LECLERC (Ferrari)',
+        'DNF Max VERSTAPPEN (Red Bull Racing)',
+    ]
+
+
+def test_send_final_results_single_fetch(driver_data):
+    """Test the classification is fetched with one request for the whole session"""
+    session_data = {'session_key': 9999, 'country_name': 'Monaco', 'session_name': 'Race'}
+    results = [{'driver_number': 1, 'position': 1}]
+    with patch('main.load_json', return_value=None), \
+            patch('main.save_json'), \
+            patch('main.get_driver_data', return_value=driver_data), \
+            patch('main.get_session_data', return_value=[session_data]), \
+            patch('main.get_session_results', return_value=results) as mock_results, \
+            patch('main.send_notification', return_value=200) as mock_send:
+        status_code = send_final_results(1256)
+
+    mock_results.assert_called_once_with(9999)
+    assert status_code == 200
+    message, title = mock_send.call_args[0]
+    assert title == 'F1 RESULTS: Monaco Race'
+    assert 'P1 Max VERSTAPPEN (Red Bull Racing)' in message
+
+
+def test_get_session_data_uses_cached_meeting_sessions():
+    """Test every session name of a meeting is served from one cached request"""
+    sessions = [{'session_key': 1, 'session_name': 'Qualifying'}, {'session_key': 2, 'session_name': 'Race'}]
+    with patch('main.requests.get') as mock_get:
+        mock_get.return_value.json.return_value = sessions
+        assert main.get_session_data(1256, 'Race') == [sessions[1]]
+        assert main.get_session_data(1256, 'Qualifying') == [sessions[0]]
+
+    mock_get.assert_called_once_with('https://api.openf1.org/v1/sessions?meeting_key=1256')
+
+
+def test_build_driver_lookup_refresh(driver_data):
+    """Test refresh rebuilds the lookup even when it is already loaded"""
+    with patch('main.save_json'), \
+            patch('main.get_driver_data', return_value=driver_data) as mock_get:
+        build_driver_lookup(1256)
+        build_driver_lookup(1256, refresh=True)
+
+    assert mock_get.call_count == 2
+
+
+def test_send_final_results_waits_for_published_results(driver_data):
+    """Test an empty classification just after the flag is retried instead of sending a bare header"""
+    session_data = {'session_key': 9999, 'country_name': 'Monaco', 'session_name': 'Race'}
+    results = [{'driver_number': 1, 'position': 1}]
+    with patch('main.settings', {'RESULTS_MAX_ATTEMPTS': 3, 'RESULTS_RETRY_SECONDS': 10}), \
+            patch('main.build_driver_lookup', return_value={}), \
+            patch('main.get_session_data', return_value=[session_data]), \
+            patch('main.get_session_results', side_effect=[[], results]) as mock_results, \
+            patch('main.time.sleep') as mock_sleep, \
+            patch('main.send_notification', return_value=200) as mock_send:
+        assert send_final_results(1256) == 200
+
+    assert mock_results.call_count == 2
+    mock_sleep.assert_called_once_with(10)
+    assert 'P1' in mock_send.call_args[0][0]
+
+
+def test_send_final_results_skips_when_never_published():
+    session_data = {'session_key': 9999, 'country_name': 'Monaco', 'session_name': 'Race'}
+    with patch('main.settings', {'RESULTS_MAX_ATTEMPTS': 3, 'RESULTS_RETRY_SECONDS': 10}), \
+            patch('main.build_driver_lookup', return_value={}), \
+            patch('main.get_session_data', return_value=[session_data]), \
+            patch('main.get_session_results', return_value=[]) as mock_results, \
+            patch('main.time.sleep'), \
+            patch('main.send_notification') as mock_send:
+        assert send_final_results(1256) is None
+
+    assert mock_results.call_count == 3
+    mock_send.assert_not_called()
+
+
+@pytest.mark.parametrize('send, expected_sends', [(False, 0), (True, 1)])
+def test_main_only_sends_when_asked(send, expected_sends):
+    """Test the development entry point logs the meeting notification unless sending is requested"""
+    meetings = [
+        {'meeting_key': key, 'meeting_name': f'Meeting {key}', 'date_start': '2025-05-23T11:30:00+00:00',
+         'location': 'Monaco', 'country_name': 'Monaco'}
+        for key in (1, 2)
+    ]
+    with patch('main.get_meetings', return_value=meetings), \
+            patch('main.build_driver_lookup'), \
+            patch('main.send_notification', return_value=200) as mock_send:
+        main.main(send=send)
+
+    assert mock_send.call_count == expected_sends
@@ -0,0 +1,73 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+import pytz
+
+from models import RaceWeekend, SessionEvent, dumps, race_fingerprint, session_from_payload, session_payload
+
+
+@pytest.fixture
+def race():
+    start = datetime(2025, 5, 25, 13, 0, tzinfo=pytz.UTC)
+    return RaceWeekend('https://www.formula1.com/en/racing/2025/monaco', [SessionEvent('Race', start)], 78)
+
+
+def test_session_requires_timezone():
+    with pytest.raises(ValueError):
+        SessionEvent('Race', datetime(2025, 5, 25, 13, 0))
+
+
+def test_models_are_slotted(race):
+    """Test instances carry no per-object __dict__"""
+    assert not hasattr(race, '__dict__')
+    assert not hasattr(race.sessions[0], '__dict__')
+
+
+def test_race_weekend_circuit(race):
+    assert race.slug == 'monaco'
+    assert race.circuit == 'Monaco'
+
+
+def test_payload_round_trip(race):
+    """Test the session survives the Step Functions payload without ISO round trips"""
+    session = race.sessions[0]
+    payload = json.loads(dumps(session_payload(race, session, session.start - timedelta(minutes=5))))
+
+    assert payload['event_ts'] == int(session.start.timestamp())
+    assert payload['notification_ts'] == payload['event_ts'] - 300
+    assert payload['meeting'] == 'monaco'
+    assert payload['event_type'] == 'race'
+    assert session_from_payload(payload) == session
+
+
+def test_payload_without_laps():
+    race = RaceWeekend('https://www.formula1.com/en/racing/2025/miami')
+    session = SessionEvent('Sprint', datetime(2025, 5, 3, 16, 0, tzinfo=pytz.UTC))
+
+    assert session_payload(race, session, session.start)['laps'] == 'N/A'
+
+
+@pytest.mark.parametrize('event_time', ['2023-05-28T14:00:00Z', '2023-05-28T14:00:00+00:00', '2023-05-28T14:00:00'])
+def test_session_from_legacy_payload(event_time):
+    session = session_from_payload({'event_name': 'Race', 'event_time': event_time})
+
+    assert session.start == datetime(2023, 5, 28, 14, 0, tzinfo=pytz.UTC)
+
+
+def test_dumps_is_compact():
+    assert dumps({'event_name': 'Race', 'event_ts': 1}) == '{"event_name":"Race","event_ts":1}'
+
+
+def test_race_fingerprint_ignores_order(race):
+    practice = SessionEvent('Practice 1', datetime(2025, 5, 23, 11, 30, tzinfo=pytz.UTC))
+    forward = RaceWeekend(race.url, [practice, race.sessions[0]])
+    backward = RaceWeekend(race.url, [race.sessions[0], practice])
+
+    assert race_fingerprint(forward) == race_fingerprint(backward)
+
+
+def test_race_fingerprint_changes_when_session_moves(race):
+    moved = RaceWeekend(race.url, [SessionEvent('Race', race.sessions[0].start + timedelta(hours=1))], race.laps)
+
+    assert race_fingerprint(moved) != race_fingerprint(race)
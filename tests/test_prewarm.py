@@ -0,0 +1,82 @@
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+import pytest
+import pytz
+
+import prewarm
+from models import RaceWeekend, SessionEvent
+
+NOW = datetime(2025, 5, 21, 12, 0, tzinfo=pytz.UTC)
+
+
+def weekend(slug, first_start):
+    return RaceWeekend(f'https://www.formula1.com/en/racing/2025/{slug}', [
+        SessionEvent('Practice 1', first_start),
+        SessionEvent('Race', first_start + timedelta(days=2)),
+    ], 78)
+
+
+@pytest.fixture
+def races():
+    return [
+        weekend('emilia-romagna', NOW - timedelta(days=5)),
+        weekend('monaco', NOW + timedelta(days=1, hours=11)),
+        weekend('spain', NOW + timedelta(days=8)),
+    ]
+
+
+def test_upcoming_weekends(races):
+    """Test only the weekend starting within the lead time is selected"""
+    upcoming = prewarm.upcoming_weekends(races, NOW, timedelta(hours=48))
+
+    assert [race.slug for race in upcoming] == ['monaco']
+
+
+def test_upcoming_weekends_includes_weekend_under_way(races):
+    during = NOW + timedelta(days=2, hours=11)
+
+    assert [race.slug for race in prewarm.upcoming_weekends(races, during, timedelta(hours=48))] == ['monaco']
+
+
+def test_match_meeting(races):
+    meetings = [
+        {'meeting_key': 1, 'date_start': '2025-05-16T11:30:00+00:00'},
+        {'meeting_key': 2, 'date_start': '2025-05-22T23:30:00+00:00'},
+        {'meeting_key': 3, 'date_start': None},
+    ]
+
+    assert prewarm.match_meeting(meetings, races[1])['meeting_key'] == 2
+    assert prewarm.match_meeting(meetings, races[2]) is None
+
+
+def test_prewarm_refreshes_upcoming_weekend(races):
+    """Test every cache the weekend needs is refreshed, and only for that weekend"""
+    meetings = [{'meeting_key': 1256, 'date_start': '2025-05-22T23:00:00+00:00'}]
+    with patch('prewarm.scrape_race_data', return_value=races), \
+            patch('prewarm.settings', {'YEAR': 2025, 'PREWARM_LEAD_HOURS': 48}), \
+            patch('prewarm.get_race_urls') as mock_urls, \
+            patch('prewarm.scrape_dates') as mock_dates, \
+            patch('prewarm.update_circuit_metadata') as mock_circuit, \
+            patch('prewarm.get_meetings', return_value=meetings) as mock_meetings, \
+            patch('prewarm.get_meeting_sessions') as mock_sessions, \
+            patch('prewarm.build_driver_lookup') as mock_drivers:
+        summary = prewarm.prewarm(NOW)
+
+    assert summary == {'weekends': ['monaco'], 'meetings': [1256]}
+    mock_urls.assert_called_once_with(refresh=True)
+    mock_dates.assert_called_once_with('https://www.formula1.com/en/racing/2025/monaco', refresh=True)
+    mock_circuit.assert_called_once_with('https://www.formula1.com/en/racing/2025/monaco')
+    mock_meetings.assert_called_once_with(2025, refresh=True)
+    mock_sessions.assert_called_once_with(1256, refresh=True)
+    mock_drivers.assert_called_once_with(1256, refresh=True)
+
+
+def test_prewarm_nothing_upcoming(races):
+    with patch('prewarm.scrape_race_data', return_value=races[:1]), \
+            patch('prewarm.settings', {'YEAR': 2025}), \
+            patch('prewarm.get_meetings') as mock_meetings:
+        summary = prewarm.prewarm(NOW)
+
+    assert summary == {'weekends': [], 'meetings': []}
+    mock_meetings.assert_not_called()
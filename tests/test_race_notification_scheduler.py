@@ -3,7 +3,11 @@ import pytest
 from unittest.mock import patch, MagicMock
 from datetime import datetime, timedelta
 import pytz
-from race_notification_scheduler import lambda_handler
+import requests
+from models import RaceWeekend, SessionEvent
+from botocore.exceptions import ClientError
+from race_notification_scheduler import (lambda_handler, load_schedule_state, reminder_offsets, reminder_schedule,
+                                         save_schedule_state)
 
 
 @pytest.fixture
@@ -20,28 +24,16 @@ def mock_context():
 def sample_race_data():
     now = datetime.now(pytz.UTC)
     return [
-        {
-            'url': 'https://example.com/monaco-grand-prix',
-            'laps': 78,
-            'date': [
-                {
-                    'date': now + timedelta(hours=2),  # Soon event
-                    'event': 'Practice 1'
-                },
-                {
-                    'date': now + timedelta(hours=26),  # Beyond 24hr window
-                    'event': 'Practice 2'
-                },
-                {
-                    'date': now - timedelta(hours=2),  # Past event
-                    'event': 'Past Session'
-                },
-                {
-                    'date': now + timedelta(minutes=3),  # Too soon for notification
-                    'event': 'Almost Now Session'
-                }
+        RaceWeekend(
+            'https://example.com/monaco-grand-prix',
+            laps=78,
+            sessions=[
+                SessionEvent('Practice 1', now + timedelta(hours=2)),  # Soon event
+                SessionEvent('Practice 2', now + timedelta(hours=26)),  # Beyond 24hr window
+                SessionEvent('Past Session', now - timedelta(hours=2)),  # Past event
+                SessionEvent('Almost Now Session', now + timedelta(minutes=3)),  # Too soon for notification
             ]
-        }
+        )
     ]
 
 
@@ -72,20 +64,14 @@ class TestRaceNotificationScheduler:
         # Setup
         now = datetime.now(pytz.UTC)
         mock_datetime.now.return_value = now
-        mock_scrape.return_value = [{
-            'url': 'https://example.com/past-grand-prix',
-            'laps': 50,
-            'date': [
-                {
-                    'date': now - timedelta(hours=2),
-                    'event': 'Past Session 1'
-                },
-                {
-                    'date': now - timedelta(hours=1),
-                    'event': 'Past Session 2'
-                }
+        mock_scrape.return_value = [RaceWeekend(
+            'https://example.com/past-grand-prix',
+            laps=50,
+            sessions=[
+                SessionEvent('Past Session 1', now - timedelta(hours=2)),
+                SessionEvent('Past Session 2', now - timedelta(hours=1))
             ]
-        }]
+        )]
         mock_stepfunctions = MagicMock()
         mock_boto3.return_value = mock_stepfunctions
 
@@ -103,29 +89,19 @@ class TestRaceNotificationScheduler:
     def test_events_within_24_hours(self, mock_datetime, mock_boto3, mock_scrape, mock_event, mock_context):
         # Setup
         now = datetime.now(pytz.UTC)
-        mock_now = MagicMock(wraps=now)
-        mock_now.__ge__ = lambda self, other: now >= other
-        mock_now.__gt__ = lambda self, other: now > other
-        mock_now.__le__ = lambda self, other: now <= other
-        mock_now.__lt__ = lambda self, other: now < other
-        mock_now.isoformat.return_value = now.isoformat()
-
-        mock_datetime.now.return_value = mock_now
+        mock_datetime.now.return_value = now
 
         # Event in 6 hours
         event_time = now + timedelta(hours=6)
         notification_time = event_time - timedelta(minutes=5)
 
-        mock_scrape.return_value = [{
-            'url': 'https://example.com/upcoming-grand-prix',
-            'laps': 55,
-            'date': [
-                {
-                    'date': event_time,
-                    'event': 'Qualifying'
-                }
+        mock_scrape.return_value = [RaceWeekend(
+            'https://example.com/upcoming-grand-prix',
+            laps=55,
+            sessions=[
+                SessionEvent('Qualifying', event_time)
             ]
-        }]
+        )]
 
         mock_stepfunctions = MagicMock()
         mock_stepfunctions.start_execution.return_value = {
@@ -149,7 +125,8 @@ class TestRaceNotificationScheduler:
         assert input_payload['event']['event_name'] == 'Qualifying'
         assert input_payload['event']['circuit'] == 'Upcoming Grand Prix'
         assert input_payload['event']['laps'] == 55
-        assert input_payload['wait_seconds'] < 86400  # Less than 24 hours
+        first_reminder = datetime.strptime(input_payload['reminders'][0]['timestamp'], '%Y-%m-%dT%H:%M:%S%z')
+        assert first_reminder - mock_datetime.now.return_value < timedelta(hours=24)
 
     @patch('race_notification_scheduler.scrape_race_data')
     @patch('race_notification_scheduler.boto3.client')
@@ -157,28 +134,18 @@ class TestRaceNotificationScheduler:
     def test_events_beyond_24_hours(self, mock_datetime, mock_boto3, mock_scrape, mock_event, mock_context):
         # Setup
         now = datetime.now(pytz.UTC)
-        mock_now = MagicMock(wraps=now)
-        mock_now.__ge__ = lambda self, other: now >= other
-        mock_now.__gt__ = lambda self, other: now > other
-        mock_now.__le__ = lambda self, other: now <= other
-        mock_now.__lt__ = lambda self, other: now < other
-        mock_now.isoformat.return_value = now.isoformat()
-
-        mock_datetime.now.return_value = mock_now
+        mock_datetime.now.return_value = now
 
         # Event in 48 hours
         event_time = now + timedelta(hours=48)
 
-        mock_scrape.return_value = [{
-            'url': 'https://example.com/future-grand-prix',
-            'laps': 60,
-            'date': [
-                {
-                    'date': event_time,
-                    'event': 'Future Race'
-                }
+        mock_scrape.return_value = [RaceWeekend(
+            'https://example.com/future-grand-prix',
+            laps=60,
+            sessions=[
+                SessionEvent('Future Race', event_time)
             ]
-        }]
+        )]
 
         mock_stepfunctions = MagicMock()
         mock_boto3.return_value = mock_stepfunctions
@@ -202,16 +169,13 @@ class TestRaceNotificationScheduler:
         # Event in 3 minutes (notification time already passed)
         event_time = now + timedelta(minutes=3)
 
-        mock_scrape.return_value = [{
-            'url': 'https://example.com/imminent-grand-prix',
-            'laps': 45,
-            'date': [
-                {
-                    'date': event_time,
-                    'event': 'Imminent Session'
-                }
+        mock_scrape.return_value = [RaceWeekend(
+            'https://example.com/imminent-grand-prix',
+            laps=45,
+            sessions=[
+                SessionEvent('Imminent Session', event_time)
             ]
-        }]
+        )]
 
         mock_stepfunctions = MagicMock()
         mock_boto3.return_value = mock_stepfunctions
@@ -231,14 +195,7 @@ class TestRaceNotificationScheduler:
                                    sample_race_data):
         # Setup
         now = datetime.now(pytz.UTC)
-        mock_now = MagicMock(wraps=now)
-        mock_now.__ge__ = lambda self, other: now >= other
-        mock_now.__gt__ = lambda self, other: now > other
-        mock_now.__le__ = lambda self, other: now <= other
-        mock_now.__lt__ = lambda self, other: now < other
-        mock_now.isoformat.return_value = now.isoformat()
-
-        mock_datetime.now.return_value = mock_now
+        mock_datetime.now.return_value = now
         mock_scrape.return_value = sample_race_data
 
         mock_stepfunctions = MagicMock()
@@ -267,25 +224,20 @@ class TestRaceNotificationScheduler:
     def test_execution_name_truncation(self, mock_datetime, mock_boto3, mock_scrape, mock_event, mock_context):
         # Setup
         now = datetime.now(pytz.UTC)
-        mock_now = MagicMock(wraps=now)
-        mock_now.isoformat.return_value = now.isoformat()
-        mock_datetime.now.return_value = mock_now
+        mock_datetime.now.return_value = now
 
         # Event with a very long name
         event_time = now + timedelta(hours=6)
 
         very_long_event_name = "This is an extremely long event name that would definitely exceed the Step Functions 80 character limit when combined with the timestamp and prefix"
 
-        mock_scrape.return_value = [{
-            'url': 'https://example.com/long-name-grand-prix',
-            'laps': 55,
-            'date': [
-                {
-                    'date': event_time,
-                    'event': very_long_event_name
-                }
+        mock_scrape.return_value = [RaceWeekend(
+            'https://example.com/long-name-grand-prix',
+            laps=55,
+            sessions=[
+                SessionEvent(very_long_event_name, event_time)
             ]
-        }]
+        )]
 
         mock_stepfunctions = MagicMock()
         mock_stepfunctions.start_execution.return_value = {
@@ -302,4 +254,247 @@ class TestRaceNotificationScheduler:
 
         # Verify name was truncated to 80 chars
         call_args = mock_stepfunctions.start_execution.call_args[1]
-        assert len(call_args['name']) <= 80
\ No newline at end of file
+        assert len(call_args['name']) <= 80
+
+
+def test_reminder_schedule_absolute_times():
+    """Test every reminder carries its own absolute time, independent of the others"""
+    now = datetime(2025, 5, 24, 12, 0, tzinfo=pytz.UTC)
+    race_start = datetime(2025, 5, 25, 13, 0, tzinfo=pytz.UTC)
+
+    reminders = reminder_schedule(race_start, [1440, 60, 5], now)
+
+    assert reminders == [
+        {'timestamp': '2025-05-24T13:00:00Z', 'minutes_before': 1440},
+        {'timestamp': '2025-05-25T12:00:00Z', 'minutes_before': 60},
+        {'timestamp': '2025-05-25T12:55:00Z', 'minutes_before': 5},
+    ]
+
+
+def test_reminder_schedule_drops_past_reminders():
+    now = datetime(2025, 5, 25, 12, 30, tzinfo=pytz.UTC)
+    race_start = datetime(2025, 5, 25, 13, 0, tzinfo=pytz.UTC)
+
+    assert reminder_schedule(race_start, [1440, 60, 5], now) == [{'timestamp': '2025-05-25T12:55:00Z', 'minutes_before': 5}]
+
+
+def test_reminder_offsets_per_event_type():
+    offsets = {'default': [5], 'race': [5, 1440, 60]}
+    with patch('race_notification_scheduler.settings', {'REMINDER_OFFSETS': offsets}):
+        assert reminder_offsets('race') == [1440, 60, 5]
+        assert reminder_offsets('practice') == [5]
+
+
+@patch('race_notification_scheduler.scrape_race_data')
+@patch('race_notification_scheduler.boto3.client')
+@patch('race_notification_scheduler.datetime')
+def test_one_execution_per_session_with_all_reminders(mock_datetime, mock_boto3, mock_scrape):
+    """Test a race within a day of its first reminder gets a single chained execution"""
+    now = datetime.now(pytz.UTC)
+    mock_datetime.now.return_value = now
+    mock_scrape.return_value = [RaceWeekend(
+        'https://example.com/monaco',
+        laps=78,
+        sessions=[SessionEvent('Race', now + timedelta(hours=30))]
+    )]
+    mock_stepfunctions = MagicMock()
+    mock_stepfunctions.start_execution.return_value = {'executionArn': 'test-arn'}
+    mock_boto3.return_value = mock_stepfunctions
+
+    offsets = {'default': [5], 'race': [1440, 60, 5]}
+    with patch('race_notification_scheduler.settings', {'REMINDER_OFFSETS': offsets, 'SCHEDULE_HORIZON_HOURS': 24}):
+        lambda_handler({}, MagicMock())
+
+    mock_stepfunctions.start_execution.assert_called_once()
+    input_payload = json.loads(mock_stepfunctions.start_execution.call_args[1]['input'])
+    assert [reminder['minutes_before'] for reminder in input_payload['reminders']] == [1440, 60, 5]
+    last_reminder = datetime.strptime(input_payload['reminders'][-1]['timestamp'], '%Y-%m-%dT%H:%M:%S%z')
+    assert last_reminder == (now + timedelta(hours=30) - timedelta(minutes=5)).replace(microsecond=0)
+
+
+class TestScheduleChangeDetection:
+
+    def run(self, mock_scrape, sessions, now):
+        mock_scrape.return_value = [RaceWeekend('https://example.com/monaco', laps=78, sessions=sessions)]
+        return lambda_handler({}, MagicMock())
+
+    @patch('race_notification_scheduler.send_session_moved')
+    @patch('race_notification_scheduler.scrape_race_data')
+    @patch('race_notification_scheduler.boto3.client')
+    @patch('race_notification_scheduler.datetime')
+    def test_unchanged_race_is_skipped(self, mock_datetime, mock_boto3, mock_scrape, mock_moved):
+        """Test a second run over the same schedule starts nothing and sends nothing"""
+        now = datetime.now(pytz.UTC)
+        mock_datetime.now.return_value = now
+        mock_stepfunctions = MagicMock()
+        mock_stepfunctions.start_execution.return_value = {'executionArn': 'arn-qualifying'}
+        mock_boto3.return_value = mock_stepfunctions
+        sessions = [SessionEvent('Qualifying', now + timedelta(hours=6))]
+
+        first = self.run(mock_scrape, sessions, now)
+        second = self.run(mock_scrape, list(sessions), now)
+
+        assert "Scheduled 1 event notifications" in first['body']
+        assert "Scheduled 0 event notifications" in second['body']
+        mock_stepfunctions.start_execution.assert_called_once()
+        mock_moved.assert_not_called()
+
+    @patch('race_notification_scheduler.send_session_moved')
+    @patch('race_notification_scheduler.scrape_race_data')
+    @patch('race_notification_scheduler.boto3.client')
+    @patch('race_notification_scheduler.datetime')
+    def test_moved_session_is_rescheduled(self, mock_datetime, mock_boto3, mock_scrape, mock_moved):
+        """Test a moved session stops its old reminders, notifies and schedules new ones"""
+        now = datetime.now(pytz.UTC)
+        mock_datetime.now.return_value = now
+        mock_stepfunctions = MagicMock()
+        mock_stepfunctions.start_execution.side_effect = [{'executionArn': 'arn-old'}, {'executionArn': 'arn-practice'},
+                                                            {'executionArn': 'arn-new'}]
+        mock_boto3.return_value = mock_stepfunctions
+        practice = SessionEvent('Practice 1', now + timedelta(hours=2))
+        old_qualifying = SessionEvent('Qualifying', now + timedelta(hours=6))
+        new_qualifying = SessionEvent('Qualifying', now + timedelta(hours=8))
+
+        with patch('race_notification_scheduler.settings', {'REMINDER_OFFSETS': {'default': [5]}}):
+            self.run(mock_scrape, [old_qualifying], now)
+            result = self.run(mock_scrape, [practice, new_qualifying], now)
+
+        assert "Scheduled 2 event notifications" in result['body']
+        mock_stepfunctions.stop_execution.assert_called_once_with(executionArn='arn-old', cause='Session moved')
+        race, session, old_start = mock_moved.call_args[0]
+        assert session == new_qualifying
+        assert old_start == old_qualifying.start.replace(microsecond=0)
+
+    @patch('race_notification_scheduler.send_session_moved', side_effect=requests.ConnectionError('Pushover is down'))
+    @patch('race_notification_scheduler.scrape_race_data')
+    @patch('race_notification_scheduler.boto3.client')
+    @patch('race_notification_scheduler.datetime')
+    def test_failed_moved_notification_still_reschedules(self, mock_datetime, mock_boto3, mock_scrape, mock_moved):
+        """Test a Pushover outage while notifying a move does not leave the session without reminders"""
+        now = datetime.now(pytz.UTC)
+        mock_datetime.now.return_value = now
+        mock_stepfunctions = MagicMock()
+        mock_stepfunctions.start_execution.side_effect = [{'executionArn': 'arn-old'}, {'executionArn': 'arn-new'}]
+        mock_boto3.return_value = mock_stepfunctions
+
+        with patch('race_notification_scheduler.settings', {'REMINDER_OFFSETS': {'default': [5]}}):
+            self.run(mock_scrape, [SessionEvent('Qualifying', now + timedelta(hours=6))], now)
+            result = self.run(mock_scrape, [SessionEvent('Qualifying', now + timedelta(hours=8))], now)
+            again = self.run(mock_scrape, [SessionEvent('Qualifying', now + timedelta(hours=8))], now)
+
+        assert "Scheduled 1 event notifications" in result['body']
+        assert "Scheduled 0 event notifications" in again['body']
+        mock_moved.assert_called_once()
+        mock_stepfunctions.stop_execution.assert_called_once()
+
+    @patch('race_notification_scheduler.scrape_race_data')
+    @patch('race_notification_scheduler.boto3.client')
+    @patch('race_notification_scheduler.datetime')
+    def test_session_entering_horizon_is_scheduled(self, mock_datetime, mock_boto3, mock_scrape):
+        """Test an unchanged race is revisited once a later session reaches the horizon"""
+        now = datetime.now(pytz.UTC)
+        mock_datetime.now.return_value = now
+        mock_stepfunctions = MagicMock()
+        mock_stepfunctions.start_execution.return_value = {'executionArn': 'test-arn'}
+        mock_boto3.return_value = mock_stepfunctions
+        sessions = [SessionEvent('Practice 1', now + timedelta(hours=30))]
+
+        with patch('race_notification_scheduler.settings', {'REMINDER_OFFSETS': {'default': [5]}}):
+            self.run(mock_scrape, sessions, now)
+            mock_datetime.now.return_value = now + timedelta(hours=7)
+            result = self.run(mock_scrape, sessions, now)
+
+        assert "Scheduled 1 event notifications" in result['body']
+
+
+class TestScheduleState:
+
+    def test_state_kept_in_s3_bucket(self):
+        """Test the state is read from and written to the configured bucket"""
+        s3 = MagicMock()
+        s3.get_object.return_value = {'Body': MagicMock(read=MagicMock(return_value=b'{"monaco": {}}'))}
+        with patch('race_notification_scheduler.settings', {'SCHEDULE_STATE_BUCKET': 'f1-state'}), \
+                patch('race_notification_scheduler.boto3.client', return_value=s3):
+            state = load_schedule_state()
+            save_schedule_state({'monaco': {'next_due': None}})
+
+        assert state == {'monaco': {}}
+        s3.get_object.assert_called_once_with(Bucket='f1-state', Key='schedule_state.json')
+        assert json.loads(s3.put_object.call_args.kwargs['Body']) == {'monaco': {'next_due': None}}
+
+    def test_missing_state_object_is_a_first_run(self):
+        s3 = MagicMock()
+        s3.get_object.side_effect = ClientError({'Error': {'Code': 'NoSuchKey'}}, 'GetObject')
+        with patch('race_notification_scheduler.settings', {'SCHEDULE_STATE_BUCKET': 'f1-state'}), \
+                patch('race_notification_scheduler.boto3.client', return_value=s3):
+            assert load_schedule_state() == {}
+
+    @patch('race_notification_scheduler.scrape_race_data')
+    def test_durable_state_required_without_bucket(self, mock_scrape):
+        """Test production refuses to schedule from container-local state"""
+        with patch('race_notification_scheduler.settings', {'REQUIRE_DURABLE_STATE': True}):
+            with pytest.raises(RuntimeError):
+                lambda_handler({}, MagicMock())
+
+        mock_scrape.assert_not_called()
+
+
+@patch('race_notification_scheduler.send_session_moved')
+@patch('race_notification_scheduler.scrape_race_data')
+@patch('race_notification_scheduler.boto3.client')
+@patch('race_notification_scheduler.datetime')
+def test_session_moved_back_gets_new_execution(mock_datetime, mock_boto3, mock_scrape, mock_moved):
+    """Test a session moved A -> B -> A is not left without reminders by the stopped execution named for A"""
+    now = datetime.now(pytz.UTC)
+    mock_datetime.now.return_value = now
+    already_exists = ClientError({'Error': {'Code': 'ExecutionAlreadyExists'}}, 'StartExecution')
+    mock_stepfunctions = MagicMock()
+    mock_stepfunctions.start_execution.side_effect = [
+        {'executionArn': 'arn-a'}, {'executionArn': 'arn-b'}, already_exists, {'executionArn': 'arn-a2'}]
+    mock_stepfunctions.describe_execution.return_value = {'status': 'ABORTED'}
+    mock_boto3.return_value = mock_stepfunctions
+    original = SessionEvent('Qualifying', now + timedelta(hours=6))
+    moved = SessionEvent('Qualifying', now + timedelta(hours=8))
+
+    with patch('race_notification_scheduler.settings', {'REMINDER_OFFSETS': {'default': [5]}}):
+        for sessions in ([original], [moved], [original]):
+            mock_scrape.return_value = [RaceWeekend('https://example.com/monaco', laps=78, sessions=sessions)]
+            lambda_handler({}, MagicMock())
+
+    first_name = mock_stepfunctions.start_execution.call_args_list[0].kwargs['name']
+    retried_name = mock_stepfunctions.start_execution.call_args_list[3].kwargs['name']
+    assert mock_stepfunctions.start_execution.call_args_list[2].kwargs['name'] == first_name
+    assert retried_name.startswith(first_name) and retried_name != first_name
+    assert len(retried_name) <= 80
+    assert mock_stepfunctions.stop_execution.call_count == 2
+
+
+@patch('race_notification_scheduler.scrape_race_data')
+@patch('race_notification_scheduler.boto3.client')
+@patch('race_notification_scheduler.datetime')
+def test_running_execution_is_reused(mock_datetime, mock_boto3, mock_scrape):
+    """Test an execution still running from a run whose state was lost is not duplicated"""
+    now = datetime.now(pytz.UTC)
+    mock_datetime.now.return_value = now
+    mock_stepfunctions = MagicMock()
+    mock_stepfunctions.start_execution.side_effect = ClientError(
+        {'Error': {'Code': 'ExecutionAlreadyExists'}}, 'StartExecution')
+    mock_stepfunctions.describe_execution.return_value = {'status': 'RUNNING'}
+    mock_boto3.return_value = mock_stepfunctions
+    mock_scrape.return_value = [RaceWeekend('https://example.com/monaco', laps=78,
+                                            sessions=[SessionEvent('Qualifying', now + timedelta(hours=6))])]
+
+    result = lambda_handler({}, MagicMock())
+
+    assert "Scheduled 1 event notifications" in result['body']
+    mock_stepfunctions.start_execution.assert_called_once()
+
+
+@patch('race_notification_scheduler.scrape_race_data', return_value=[])
+@patch('race_notification_scheduler.boto3.client')
+def test_race_pages_read_with_short_cache_age(mock_boto3, mock_scrape):
+    """Test the scheduler does not read race pages from the page cache's 12 hour copies"""
+    with patch('race_notification_scheduler.settings', {'SCHEDULE_PAGE_CACHE_MINUTES': 10}):
+        lambda_handler({}, MagicMock())
+
+    mock_scrape.assert_called_once_with(race_page_max_age=600)
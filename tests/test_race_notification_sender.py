@@ -3,6 +3,11 @@ import json
 import os
 from datetime import datetime
 from unittest.mock import patch, MagicMock
+
+import requests
+
+from subscribers import SubscriberStore
+import delivery
 import race_notification_sender  # Assuming this is the name of the module
 
 
@@ -18,11 +23,9 @@ def valid_event():
 
 @pytest.fixture
 def mock_env_variables():
-    """Set up mock environment variables"""
-    with patch.dict(os.environ, {
-        'PUSHOVER_TOKEN': 'test_token',
-        'PUSHOVER_USER_KEY': 'test_user_key'
-    }):
+    """Set up mock Pushover settings"""
+    with patch('delivery.settings', {'PUSHOVER_TOKEN': 'test_token'}), \
+            patch('race_notification_sender.settings', {'PUSHOVER_USER_KEY': 'test_user_key'}):
         yield
 
 
@@ -46,7 +49,7 @@ def mock_failed_response():
 
 def test_send_notification_success(mock_env_variables, mock_successful_response):
     """Test successful notification sending to Pushover"""
-    with patch('requests.post', return_value=mock_successful_response) as mock_post:
+    with patch('requests.Session.post', return_value=mock_successful_response) as mock_post:
         status_code = race_notification_sender.send_notification(
             "Test message", "Test title"
         )
@@ -66,7 +69,7 @@ def test_send_notification_success(mock_env_variables, mock_successful_response)
 
 def test_send_notification_failure(mock_env_variables, mock_failed_response):
     """Test failed notification sending to Pushover"""
-    with patch('requests.post', return_value=mock_failed_response) as mock_post:
+    with patch('requests.Session.post', return_value=mock_failed_response) as mock_post:
         status_code = race_notification_sender.send_notification(
             "Test message", "Test title"
         )
@@ -80,7 +83,7 @@ def test_send_notification_failure(mock_env_variables, mock_failed_response):
 
 def test_lambda_handler_success(valid_event, mock_env_variables, mock_successful_response):
     """Test successful lambda execution"""
-    with patch('requests.post', return_value=mock_successful_response) as mock_post:
+    with patch('requests.Session.post', return_value=mock_successful_response) as mock_post:
         response = race_notification_sender.lambda_handler(valid_event, {})
 
         # Verify the response
@@ -107,7 +110,7 @@ def test_lambda_handler_missing_circuit_laps(mock_env_variables, mock_successful
         'event_time': '2023-05-28T14:00:00Z'
     }
 
-    with patch('requests.post', return_value=mock_successful_response) as mock_post:
+    with patch('requests.Session.post', return_value=mock_successful_response) as mock_post:
         response = race_notification_sender.lambda_handler(event, {})
 
         assert response['statusCode'] == 200
@@ -147,7 +150,7 @@ def test_lambda_handler_invalid_date_format():
 
 def test_pushover_api_error(valid_event, mock_env_variables, mock_failed_response):
     """Test handling of Pushover API errors"""
-    with patch('requests.post', return_value=mock_failed_response) as mock_post:
+    with patch('requests.Session.post', return_value=mock_failed_response) as mock_post:
         response = race_notification_sender.lambda_handler(valid_event, {})
 
         # Should return the Pushover API status code
@@ -163,7 +166,7 @@ def test_message_formatting(mock_env_variables, mock_successful_response):
         'laps': 78
     }
 
-    with patch('requests.post', return_value=mock_successful_response) as mock_post:
+    with patch('requests.Session.post', return_value=mock_successful_response) as mock_post:
         race_notification_sender.lambda_handler(event, {})
 
         # Verify the message format
@@ -181,7 +184,7 @@ def test_message_formatting(mock_env_variables, mock_successful_response):
 def test_lambda_handler_missing_env_variables(valid_event):
     """Test missing environment variables"""
     with patch.dict(os.environ, {}, clear=True):
-        with patch('requests.post') as mock_post:
+        with patch('requests.Session.post') as mock_post:
             response = race_notification_sender.lambda_handler(valid_event, {})
 
             # Should fail due to missing environment variables
@@ -189,4 +192,168 @@ def test_lambda_handler_missing_env_variables(valid_event):
             assert 'Error' in response['body']
 
             # Verify no API call was attempted
-            mock_post.assert_not_called()
\ No newline at end of file
+            mock_post.assert_not_called()
+
+class LocalQueue:
+    """Minimal SQS stand-in: failed records stay on the queue for redelivery"""
+
+    def __init__(self, bodies):
+        self.messages = {f"msg-{index}": json.dumps(body) for index, body in enumerate(bodies)}
+
+    def receive_batch(self, size=10):
+        return {
+            'Records': [
+                {'messageId': message_id, 'body': body}
+                for message_id, body in list(self.messages.items())[:size]
+            ]
+        }
+
+    def settle(self, batch, response):
+        failed = {failure['itemIdentifier'] for failure in response['batchItemFailures']}
+        for record in batch['Records']:
+            if record['messageId'] not in failed:
+                del self.messages[record['messageId']]
+
+
+def test_sqs_batch_handler_all_delivered(valid_event):
+    """Test a full batch is sent and the queue is drained"""
+    queue = LocalQueue([valid_event, {'event': valid_event}, valid_event])
+    with patch('race_notification_sender.send_notification', return_value=200) as mock_send:
+        batch = queue.receive_batch()
+        response = race_notification_sender.sqs_batch_handler(batch, {})
+        queue.settle(batch, response)
+
+    assert response == {'batchItemFailures': []}
+    assert mock_send.call_count == 3
+    assert not queue.messages
+
+
+def test_sqs_batch_handler_partial_failure(valid_event):
+    """Test only the failed deliveries are reported and left for retry, malformed records are consumed"""
+    bad_event = {'event_time': '2023-05-28T14:00:00Z'}
+    failing_event = dict(valid_event, event_name='Sprint')
+    queue = LocalQueue([valid_event, bad_event, failing_event])
+
+    def fake_send(message, title):
+        return 500 if 'Sprint' in title else 200
+
+    with patch('race_notification_sender.send_notification', side_effect=fake_send):
+        batch = queue.receive_batch()
+        response = race_notification_sender.sqs_batch_handler(batch, {})
+        queue.settle(batch, response)
+
+    assert response['batchItemFailures'] == [{'itemIdentifier': 'msg-2'}]
+    assert set(queue.messages) == {'msg-2'}
+
+
+def test_sqs_batch_handler_consumes_unparseable_body():
+    """Test a body that isn't JSON is dropped instead of being redelivered forever"""
+    records = {'Records': [{'messageId': 'msg-0', 'body': 'not json'}]}
+    with patch('race_notification_sender.send_notification') as mock_send:
+        assert race_notification_sender.sqs_batch_handler(records, {}) == {'batchItemFailures': []}
+
+    mock_send.assert_not_called()
+
+
+def test_sqs_batch_handler_empty_batch():
+    """Test an empty batch reports no failures"""
+    assert race_notification_sender.sqs_batch_handler({'Records': []}, {}) == {'batchItemFailures': []}
+
+
+def test_send_notification_retries_rate_limit(mock_successful_response):
+    """Test 429 responses are retried, honouring Retry-After"""
+    rate_limited = MagicMock(status_code=429, text='rate limited', headers={'Retry-After': '2'})
+    with patch('delivery.settings', {'PUSHOVER_TOKEN': 'token'}), \
+            patch('race_notification_sender.settings', {'PUSHOVER_USER_KEY': 'user'}), \
+            patch('delivery.time.sleep') as mock_sleep, \
+            patch('requests.Session.post', side_effect=[rate_limited, mock_successful_response]) as mock_post:
+        status_code = race_notification_sender.send_notification("Test message", "Test title")
+
+    assert status_code == 200
+    assert mock_post.call_count == 2
+    mock_sleep.assert_called_once_with(2)
+
+
+def test_send_notification_gives_up_after_max_retries():
+    server_error = MagicMock(status_code=503, text='unavailable', headers={})
+    with patch('delivery.settings', {'PUSHOVER_TOKEN': 'token'}), \
+            patch('race_notification_sender.settings', {'PUSHOVER_USER_KEY': 'user'}), \
+            patch('delivery.time.sleep'), \
+            patch('requests.Session.post', return_value=server_error) as mock_post:
+        status_code = race_notification_sender.send_notification("Test message", "Test title")
+
+    assert status_code == 503
+    assert mock_post.call_count == delivery.MAX_RETRIES + 1
+
+
+class RecordingSink(delivery.DeliverySink):
+    """Local stand-in channel that records each send"""
+
+    def __init__(self, name, status=200):
+        super().__init__()
+        self.name = name
+        self.status = status
+        self.sent = []
+
+    def send(self, message, title, address):
+        self.sent.append((title, address))
+        return self.status
+
+
+def test_send_to_matching_uses_every_channel():
+    """Test a subscriber with several channels is notified on all of them"""
+    pushover, webhook = RecordingSink('pushover'), RecordingSink('webhook', status=502)
+    delivery.register_sink(pushover)
+    delivery.register_sink(webhook)
+    store = SubscriberStore()
+    store.add('alice', 'alice-key')
+    store.add('bob', None, event_types=['race'],
+              channels={'pushover': 'bob-key', 'webhook': 'https://example.com/hook'})
+
+    with patch('race_notification_sender.load_subscribers', return_value=store):
+        status = race_notification_sender.send_to_matching("Test message", "Test title", 'race')
+
+    assert status == 502
+    assert sorted(address for _, address in pushover.sent) == ['alice-key', 'bob-key']
+    assert webhook.sent == [('Test title', 'https://example.com/hook')]
+
+
+def test_sqs_retry_only_resends_failed_deliveries(valid_event):
+    """Test one failed channel sends the record back without notifying the other subscribers twice"""
+    pushover, webhook = RecordingSink('pushover'), RecordingSink('webhook', status=502)
+    delivery.register_sink(pushover)
+    delivery.register_sink(webhook)
+    store = SubscriberStore()
+    store.add('alice', 'alice-key')
+    store.add('bob', None, channels={'pushover': 'bob-key', 'webhook': 'https://example.com/hook'})
+    record = {'messageId': 'msg-0', 'body': json.dumps({'event': valid_event})}
+
+    with patch('race_notification_sender.load_subscribers', return_value=store):
+        assert race_notification_sender.process_record(record) is False
+        webhook.status = 200
+        assert race_notification_sender.process_record(record) is True
+
+    assert sorted(address for _, address in pushover.sent) == ['alice-key', 'bob-key']
+    assert len(webhook.sent) == 2
+
+
+@pytest.mark.parametrize('minutes, expected', [(5, '5 MINUTES'), (1, '1 MINUTE'), (60, '1 HOUR'),
+                                               (120, '2 HOURS'), (90, '90 MINUTES'), (1440, '1 DAY')])
+def test_format_lead_time(minutes, expected):
+    assert race_notification_sender.format_lead_time(minutes) == expected
+
+
+def test_build_message_from_reminder_envelope(valid_event):
+    """Test the Map iteration envelope carries the reminder offset into the message"""
+    event = race_notification_sender.unwrap_event({'event': valid_event, 'minutes_before': 1440})
+
+    message, title = race_notification_sender.build_message(event)
+
+    assert 'Monaco Grand Prix STARTING IN 1 DAY' in message
+    assert title == 'F1 REMINDER: Monaco Grand Prix in 1 day'
+
+
+def test_send_notification_reports_connection_error(mock_env_variables):
+    """Test a Pushover outage is reported as a status code instead of raising into the caller"""
+    with patch('requests.Session.post', side_effect=requests.ConnectionError('Pushover is down')):
+        assert race_notification_sender.send_notification("Test message", "Test title") == delivery.TIMEOUT_STATUS
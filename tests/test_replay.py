@@ -0,0 +1,91 @@
+import os
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
+
+import pytest
+import pytz
+
+from live_updates import LiveUpdatePipeline
+from replay import VirtualClock, load_session, replay
+
+SESSION_DIR = os.path.join(os.path.dirname(__file__), 'fixtures', 'replay_session')
+START = datetime(2025, 5, 25, 13, 0, tzinfo=pytz.UTC)
+
+
+class FakeTime:
+    """Wall clock stand-in that only moves when slept"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def test_load_session_merges_streams_in_time_order():
+    drivers, records = load_session(SESSION_DIR)
+
+    assert drivers[4]['name_acronym'] == 'NOR'
+    moments = [moment for moment, _, _ in records]
+    assert moments == sorted(moments)
+    assert {stream for _, stream, _ in records} == {'position', 'laps', 'pit', 'race_control'}
+
+
+def test_load_session_skips_missing_streams(tmp_path):
+    (tmp_path / 'pit.json').write_text('[{"date": "2025-05-25T13:02:00+00:00", "driver_number": 16}]')
+
+    drivers, records = load_session(str(tmp_path))
+
+    assert drivers == {}
+    assert [stream for _, stream, _ in records] == ['pit']
+
+
+def test_virtual_clock_runs_at_speed():
+    fake = FakeTime()
+    clock = VirtualClock(START, speed=100, monotonic=fake.monotonic, sleep=fake.sleep)
+
+    clock.sleep_until(START + timedelta(minutes=10))
+
+    assert fake.now == pytest.approx(6.0)
+    assert clock.now() == START + timedelta(minutes=10)
+
+
+@pytest.mark.parametrize('speed', [0.5, 1001])
+def test_virtual_clock_speed_limits(speed):
+    with pytest.raises(ValueError):
+        VirtualClock(START, speed=speed)
+
+
+def test_replay_recorded_session():
+    """Test the recorded session raises its overtakes, pit stop and safety car through notify"""
+    drivers, records = load_session(SESSION_DIR)
+    notify = MagicMock()
+    fake = FakeTime()
+    clock = VirtualClock(records[0][0], speed=1000, monotonic=fake.monotonic, sleep=fake.sleep)
+
+    report = replay(records, LiveUpdatePipeline(notify=notify, drivers=drivers), speed=1000, clock=clock)
+
+    assert report.events == len(records)
+    assert report.alerts == {'overtake': 2, 'pit': 1, 'safety_car': 1}
+    assert notify.call_count == 4
+    assert report.session_seconds == 211
+    assert fake.now == pytest.approx(0.211)
+    assert len(report.latencies) == 4
+    assert report.max_lag == 0
+
+
+def test_replay_measures_throughput_in_real_time():
+    _, records = load_session(SESSION_DIR)
+
+    report = replay(records, LiveUpdatePipeline(), speed=1000)
+
+    assert 0.2 <= report.elapsed < 2
+    assert report.events_per_second > 0
+    assert report.summary()['alerts'] == {'overtake': 2, 'pit': 1, 'safety_car': 1}
+
+
+def test_replay_empty_session():
+    assert replay([], LiveUpdatePipeline()).events == 0
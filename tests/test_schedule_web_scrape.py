@@ -0,0 +1,118 @@
+import os
+from datetime import datetime
+from unittest.mock import patch, MagicMock
+
+import pytest
+import pytz
+from bs4 import BeautifulSoup
+
+from schedule_web_scrape import SESSION_FIELDS, extract_sessions, parse_date, parse_schedule_page, scrape_dates
+
+FIXTURE = os.path.join(os.path.dirname(__file__), 'fixtures', 'race_schedule.html')
+CLASSES = {field: classes for (_, classes), field in SESSION_FIELDS.items()}
+
+
+@pytest.fixture
+def race_page():
+    with open(FIXTURE, 'rb') as f:
+        return f.read()
+
+
+def card(event=None, day=None, month=None, time=None):
+    parts = []
+    if day is not None:
+        parts.append(f'<p class="{CLASSES["day"]}">{day}</p>')
+    if month is not None:
+        parts.append(f'<span class="{CLASSES["month"]}">{month}</span>')
+    if event is not None:
+        parts.append(f'<span class="{CLASSES["event"]}">{event}</span>')
+    if time is not None:
+        parts.append(f'<p class="{CLASSES["time"]}">{time}</p>')
+    return f"<li>{''.join(parts)}</li>"
+
+
+def test_parse_date():
+    assert parse_date('2025', 'Mar', '05', '14:30 - 15:30') == datetime(2025, 3, 5, 14, 30)
+
+
+@pytest.mark.parametrize('month, day, time', [('M', '05', '14:30'), ('Foo', '05', '14:30'),
+                                              ('Mar', 'x', '14:30'), ('Mar', '05', 'TBC'),
+                                              ('Feb', '31', '14:30')])
+def test_parse_date_invalid(month, day, time):
+    with pytest.raises(ValueError):
+        parse_date('2025', month, day, time)
+
+
+def test_extract_sessions_aligned(race_page):
+    """Test each card's fields stay together in one document pass"""
+    rows = extract_sessions(BeautifulSoup(race_page, 'html.parser'))
+
+    assert rows[0] == ('Race', '16', 'Mar', '04:00')
+    assert rows[-1] == ('Practice 1', '14', 'Mar', '01:30 - 02:30')
+    assert len(rows) == 5
+
+
+def test_extract_sessions_skips_incomplete_card():
+    """Test a card missing a field does not shift the following sessions"""
+    html = card('Practice 1', '14', 'Mar', '01:30') + card('Practice 2', '14', 'Mar') + card('Race', '16', 'Mar', '04:00')
+
+    rows = extract_sessions(BeautifulSoup(html, 'html.parser'))
+
+    assert rows == [('Practice 1', '14', 'Mar', '01:30'), ('Race', '16', 'Mar', '04:00')]
+
+
+def test_extract_sessions_skips_card_missing_leading_field():
+    """Test a card missing its first field is not merged into the next card"""
+    html = card('Practice 1', '14', 'Mar', '01:30') + card('Practice 2', None, 'Mar', '05:00') + card('Race', '16', 'Mar', '04:00')
+
+    rows = extract_sessions(BeautifulSoup(html, 'html.parser'))
+
+    assert rows == [('Practice 1', '14', 'Mar', '01:30'), ('Race', '16', 'Mar', '04:00')]
+
+
+def test_parse_schedule_page(race_page):
+    sessions = parse_schedule_page(race_page, 2025)
+
+    assert [session.name for session in sessions] == ['Race', 'Qualifying', 'Practice 3', 'Practice 2', 'Practice 1']
+    assert sessions[0].start == datetime(2025, 3, 16, 4, 0, tzinfo=pytz.UTC)
+
+
+def test_parse_schedule_page_skips_invalid_rows():
+    html = card('Practice 1', '14', 'Mar', 'TBC') + card('Race', '16', 'Mar', '04:00')
+
+    assert [session.name for session in parse_schedule_page(html, 2025)] == ['Race']
+
+
+def test_scrape_dates_no_sessions():
+    response = MagicMock(status_code=200, headers={}, content=b'<html></html>')
+    with patch('requests.get', return_value=response):
+        assert scrape_dates('https://www.formula1.com/en/racing/2025/australia') is None
+
+
+def test_fetch_page_served_from_cache(race_page):
+    """Test a page is fetched once and then read from the page cache until refreshed"""
+    url = 'https://www.formula1.com/en/racing/2025/australia'
+    response = MagicMock(status_code=200, headers={}, content=race_page)
+    with patch('requests.get', return_value=response) as mock_get:
+        first = scrape_dates(url)
+        second = scrape_dates(url)
+        assert mock_get.call_count == 1
+
+        scrape_dates(url, refresh=True)
+        assert mock_get.call_count == 2
+
+    assert first == second
+    assert len(first) == 5
+
+
+def test_fetch_page_max_age_overrides_page_cache_hours(race_page):
+    """Test a shorter max_age (the scheduler's) re-fetches a page the page cache still holds"""
+    url = 'https://www.formula1.com/en/racing/2025/australia'
+    response = MagicMock(status_code=200, headers={}, content=race_page)
+    with patch('requests.get', return_value=response) as mock_get:
+        scrape_dates(url)
+        scrape_dates(url, max_age=3600)
+        assert mock_get.call_count == 1
+
+        scrape_dates(url, max_age=-1)
+        assert mock_get.call_count == 2
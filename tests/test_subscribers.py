@@ -0,0 +1,92 @@
+from unittest.mock import patch
+
+import pytest
+
+import subscribers
+from subscribers import SubscriberStore, event_type, load_subscribers, save_subscribers
+
+
+@pytest.fixture
+def store():
+    store = SubscriberStore()
+    store.add('everything', 'key-everything')
+    store.add('races', 'key-races', event_types=['race'])
+    store.add('quali-monaco', 'key-quali-monaco', event_types=['qualifying'], meetings=['monaco'])
+    store.add('hamilton', 'key-hamilton', drivers=[44])
+    store.add('sprint-norris', 'key-sprint-norris', event_types=['sprint'], drivers=[4])
+    return store
+
+
+@pytest.mark.parametrize('name, expected', [
+    ('Practice 1', 'practice'),
+    ('Sprint Qualifying', 'sprint_qualifying'),
+    ('Sprint', 'sprint'),
+    ('Qualifying', 'qualifying'),
+    ('Race', 'race'),
+])
+def test_event_type(name, expected):
+    assert event_type(name) == expected
+
+
+def test_match_event_type(store):
+    assert store.match('race') == {'everything', 'races', 'hamilton'}
+
+
+def test_match_meeting(store):
+    assert store.match('qualifying', meeting='monaco') == {'everything', 'quali-monaco', 'hamilton'}
+    assert store.match('qualifying', meeting='spain') == {'everything', 'hamilton'}
+
+
+def test_match_driver(store):
+    """Test driver specific events only reach subscribers following that driver or all drivers"""
+    assert store.match('sprint', driver_number=4) == {'everything', 'sprint-norris'}
+    assert store.match('race', driver_number=44, meeting='monaco') == {'everything', 'races', 'hamilton'}
+
+
+def test_remove_and_replace(store):
+    store.remove('races')
+    store.add('hamilton', 'key-hamilton', event_types=['qualifying'])
+
+    assert store.match('race') == {'everything'}
+    assert store.user_keys(['hamilton']) == ['key-hamilton']
+
+
+def test_matches_linear_scan(store):
+    """Test the index gives the same answer as checking every subscriber"""
+    def accepts(record, field, value):
+        return value is None or not record[field] or value in record[field]
+
+    for query in [('race', None, None), ('sprint', 4, 'china'), ('qualifying', 44, 'monaco'), (None, 1, None)]:
+        expected = {
+            sid for sid, record in store.subscribers.items()
+            if all(accepts(record, field, value)
+                   for field, value in zip(('event_types', 'drivers', 'meetings'), query))
+        }
+        assert store.match(*query) == expected
+
+
+def test_save_and_load_round_trip(store, tmp_path):
+    path = str(tmp_path / 'subscribers.json')
+    save_subscribers(store, path)
+
+    loaded = load_subscribers(path)
+
+    assert loaded.match('race') == store.match('race')
+
+
+def test_load_missing_file(tmp_path):
+    assert len(load_subscribers(str(tmp_path / 'missing.json'))) == 0
+
+
+def test_explicit_path_does_not_replace_configured_store(store, tmp_path):
+    """Test loading another file by path leaves the container's configured store in place"""
+    configured = str(tmp_path / 'configured.json')
+    other = str(tmp_path / 'other.json')
+    save_subscribers(store, configured)
+    save_subscribers(SubscriberStore(), other)
+
+    with patch('subscribers.settings', {'SUBSCRIBERS_FILE': configured}), \
+            patch.object(subscribers, '_store', None):
+        first = load_subscribers()
+        assert len(load_subscribers(other)) == 0
+        assert load_subscribers() is first